@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+# Measure the throughput of HttpFD against a local HTTP server.
+# The file is downloaded with the current read loop and with the previous
+# one, which reads every block into a new bytes object and lets the block
+# size shrink to any size.
+
+import optparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl import YoutubeDL
+from youtube_dl.compat import compat_http_server, compat_print
+from youtube_dl.downloader.http import HttpFD
+from youtube_dl.utils import format_bytes
+
+
+class LegacyHttpFD(HttpFD):
+    _MIN_RESIZED_BLOCK_SIZE = 1
+
+    @staticmethod
+    def _block_reader(data):
+        return data.read
+
+
+def make_handler(content):
+    class Handler(compat_http_server.BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            view = memoryview(content)
+            for i in range(0, len(content), 1024 * 1024):
+                self.wfile.write(view[i:i + 1024 * 1024])
+    return Handler
+
+
+def run(fd_class, url, filename, params):
+    ydl = YoutubeDL({'quiet': True})
+    fd = fd_class(ydl, dict(params, noprogress=True, quiet=True))
+    start = time.time()
+    fd.download(filename, {'url': url})
+    elapsed = time.time() - start
+    os.remove(filename)
+    return elapsed
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--size', dest='size', type=int, default=512,
+        help='Size of the downloaded file in MiB (default is %default)')
+    parser.add_option(
+        '--runs', dest='runs', type=int, default=3,
+        help='Number of downloads with each read loop (default is %default)')
+    parser.add_option(
+        '--buffer-size', dest='buffersize', type=int, default=1024,
+        help='Initial block size in bytes (default is %default, as youtube-dl)')
+    opts, args = parser.parse_args()
+
+    content = os.urandom(opts.size * 1024 * 1024)
+    httpd = compat_http_server.HTTPServer(('localhost', 0), make_handler(content))
+    url = 'http://localhost:%d/file' % httpd.socket.getsockname()[1]
+    server_thread = threading.Thread(target=httpd.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    tmpdir = tempfile.mkdtemp()
+    filename = os.path.join(tmpdir, 'file')
+    params = {'buffersize': opts.buffersize}
+    try:
+        for name, fd_class in (('read', LegacyHttpFD), ('readinto', HttpFD)):
+            best = min(run(fd_class, url, filename, params) for _ in range(opts.runs))
+            compat_print('%-9s %s/s' % (name, format_bytes(len(content) / best)))
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+from __future__ import unicode_literals
+
+# Measure the wall time of common command line invocations, each of them
+# in a new process, with the lazy extractors and with all the extractor
+# modules imported on startup. The videos are served by a local HTTP
+# server, so that the network does not count.
+
+import optparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_dl.compat import compat_http_server, compat_print
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_EXTRACTORS = os.path.join(ROOT_DIR, 'youtube_dl', 'extractor', 'lazy_extractors.py')
+
+CONTENT = b'\x00\x00\x00\x18ftypmp42' + b'\x00' * 1000
+
+
+class Handler(compat_http_server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_headers(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(CONTENT)))
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._send_headers()
+
+    def do_GET(self):
+        self._send_headers()
+        self.wfile.write(CONTENT)
+
+
+def run(args, env):
+    start = time.time()
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.check_call(
+            [sys.executable, '-m', 'youtube_dl', '--ignore-config'] + args,
+            cwd=ROOT_DIR, env=env, stdout=devnull)
+    return time.time() - start
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [OPTIONS]')
+    parser.add_option(
+        '--runs', dest='runs', type=int, default=10,
+        help='Number of runs of each invocation (default is %default)')
+    opts, args = parser.parse_args()
+
+    httpd = compat_http_server.HTTPServer(('localhost', 0), Handler)
+    url = 'http://localhost:%d/video.mp4' % httpd.socket.getsockname()[1]
+    server_thread = threading.Thread(target=httpd.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    invocations = [
+        ['--version'],
+        ['--get-url', url],
+        ['--dump-json', url],
+        ['--get-url', '--force-generic-extractor', url],
+    ]
+    modes = [('eager', dict(os.environ, YOUTUBE_DL_NO_LAZY_EXTRACTORS='1'))]
+    if os.path.exists(LAZY_EXTRACTORS):
+        modes.append(('lazy', dict(os.environ)))
+    else:
+        compat_print(
+            'Lazy extractors not found, build them with "make lazy-extractors"')
+
+    try:
+        for invocation in invocations:
+            compat_print(' '.join(invocation).replace(url, 'URL'))
+            for name, env in modes:
+                times = sorted(run(invocation, env) for _ in range(opts.runs))
+                compat_print('    %-6s min %4dms  median %4dms' % (
+                    name, times[0] * 1000, times[len(times) // 2] * 1000))
+    finally:
+        httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,36 @@ from __future__ import unicode_literals
 
 import re
 
+from .common import InfoExtractor
 
-class LazyLoadExtractor(object):
+
+class LazyLoadMetaClass(type):
+    def __getattr__(cls, name):
+        # Only what is needed to match URLs is defined in the lazy classes,
+        # anything else comes from the real extractor
+        return getattr(cls._get_real_class(), name)
+
+
+class LazyLoadExtractor(LazyLoadMetaClass(str('LazyLoadBase'), (object,), {})):
     _module = None
 
+    # The same method, so that the URL patterns can be indexed as usual
+    suitable = InfoExtractor.__dict__['suitable']
+
     @classmethod
     def ie_key(cls):
         return cls.__name__[:-2]
 
+    @classmethod
+    def _get_real_class(cls):
+        # Not inherited, every lazy class has its own real class
+        if '_real_class' not in cls.__dict__:
+            mod = __import__(cls._module, fromlist=(cls.__name__,))
+            cls._real_class = getattr(mod, cls.__name__)
+        return cls._real_class
+
     def __new__(cls, *args, **kwargs):
-        mod = __import__(cls._module, fromlist=(cls.__name__,))
-        real_cls = getattr(mod, cls.__name__)
+        real_cls = cls._get_real_class()
         instance = real_cls.__new__(real_cls)
         instance.__init__(*args, **kwargs)
         return instance
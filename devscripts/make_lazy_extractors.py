@@ -5,22 +5,23 @@ import os
 from os.path import dirname as dirn
 import sys
 
-print('WARNING: Lazy loading extractors is an experimental feature that may not always work', file=sys.stderr)
-
 sys.path.insert(0, dirn(dirn((os.path.abspath(__file__)))))
 
 lazy_extractors_filename = sys.argv[1]
 if os.path.exists(lazy_extractors_filename):
     os.remove(lazy_extractors_filename)
+# Import the extractors themselves, not a stale compiled lazy_extractors
+os.environ['YOUTUBE_DL_NO_LAZY_EXTRACTORS'] = '1'
 
 from youtube_dl.extractor import _ALL_CLASSES
 from youtube_dl.extractor.common import InfoExtractor, SearchInfoExtractor
+from youtube_dl.extractor.dispatch import pattern_keys
 
 with open('devscripts/lazy_load_template.py', 'rt') as f:
     module_template = f.read()
 
 module_contents = [
-    module_template + '\n' + getsource(InfoExtractor.suitable) + '\n',
+    module_template,
     'class LazyLoadSearchExtractor(LazyLoadExtractor):\n    pass\n']
 
 ie_template = '''
@@ -29,6 +30,9 @@ class {name}({bases}):
     _module = '{module}'
 '''
 
+valid_url_keys_template = '''    _VALID_URL_KEYS = {keys!r}
+'''
+
 make_valid_template = '''
     @classmethod
     def _make_valid_url(cls):
@@ -54,6 +58,11 @@ def build_lazy_ie(ie, name):
         module=ie.__module__)
     if ie.suitable.__func__ is not InfoExtractor.suitable.__func__:
         s += '\n' + getsource(ie.suitable)
+    elif valid_url:
+        # Spare the analysis of all the patterns when the index is built
+        keys = pattern_keys(valid_url)
+        if keys is not None:
+            s += valid_url_keys_template.format(keys=keys)
     if hasattr(ie, '_make_valid_url'):
         # search extractors
         s += make_valid_template.format(valid_url=ie._make_valid_url())
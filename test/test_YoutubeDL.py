@@ -9,6 +9,8 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import copy
+import threading
+import time
 
 from test.helper import FakeYDL, assertRegexpMatches
 from youtube_dl import YoutubeDL
@@ -16,7 +18,13 @@ from youtube_dl.compat import compat_str, compat_urllib_error
 from youtube_dl.extractor import YoutubeIE
 from youtube_dl.extractor.common import InfoExtractor
 from youtube_dl.postprocessor.common import PostProcessor
-from youtube_dl.utils import ExtractorError, match_filter_func
+from youtube_dl.utils import (
+    ExtractorError,
+    match_filter_func,
+    InAdvancePagedList,
+    MaxDownloadsReached,
+    OnDemandPagedList,
+)
 
 TEST_URL = 'http://localhost/sample.mp4'
 
@@ -34,6 +42,40 @@ class YDL(FakeYDL):
         self.msgs.append(msg)
 
 
+class OutputLogger(object):
+    """Logger keeping all the messages, in order"""
+
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, msg):
+        self.messages.append(msg)
+
+    warning = error = debug
+
+
+class SleepIE(InfoExtractor):
+    """Extracts sleep:<id> URLs, the last ones first
+
+    Video 3 is unavailable. The ids extracted are kept in extracted.
+    """
+
+    _VALID_URL = r'sleep:(?P<id>\d+)'
+
+    def __init__(self, downloader=None):
+        super(SleepIE, self).__init__(downloader)
+        self.extracted = []
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        self.extracted.append(video_id)
+        time.sleep(0.01 * (10 - int(video_id)))
+        self.to_screen('%s: Extracting' % video_id)
+        if video_id == '3':
+            raise ExtractorError('Video 3 is unavailable', expected=True)
+        return _make_result([{'url': TEST_URL}], id=video_id)
+
+
 def _make_result(formats, **kwargs):
     res = {
         'formats': formats,
@@ -535,6 +577,20 @@ class TestYoutubeDL(unittest.TestCase):
         # Replace missing fields with 'NA'
         self.assertEqual(fname('%(uploader_date)s-%(id)s.%(ext)s'), 'NA-1234.mp4')
 
+    def test_prepare_filename_playlist_index(self):
+        def fname(n_entries):
+            ydl = YoutubeDL({'outtmpl': '%(playlist_index)s-%(id)s.%(ext)s'})
+            return ydl.prepare_filename({
+                'id': 'x',
+                'ext': 'mp4',
+                'playlist_index': 3,
+                'n_entries': n_entries,
+            })
+        self.assertEqual(fname(5), '3-x.mp4')
+        self.assertEqual(fname(120), '003-x.mp4')
+        # The number of entries of a lazy playlist is unknown
+        self.assertEqual(fname(None), '3-x.mp4')
+
     def test_format_note(self):
         ydl = YoutubeDL()
         self.assertEqual(ydl._format_note({}), '')
@@ -695,6 +751,98 @@ class TestYoutubeDL(unittest.TestCase):
         result = get_ids({'playlist_items': '10'})
         self.assertEqual(result, [])
 
+    def test_lazy_playlist(self):
+        def make_playlist(paged):
+            def get_entries(start, end):
+                for i in range(start, end):
+                    listed.append(i)
+                    yield {
+                        'id': compat_str(i),
+                        'title': compat_str(i),
+                        'url': TEST_URL,
+                    }
+            if paged:
+                entries = OnDemandPagedList(
+                    lambda n: get_entries(n * 3 + 1, min(n * 3 + 4, 11)), 3)
+            else:
+                entries = get_entries(1, 11)
+            return {
+                '_type': 'playlist',
+                'id': 'test',
+                'entries': entries,
+                'extractor': 'test:playlist',
+                'extractor_key': 'test:playlist',
+                'webpage_url': 'http://example.com',
+            }
+
+        class LazyYDL(YDL):
+            def process_info(self, info_dict):
+                # Entries listed when the video is downloaded
+                info_dict['listed'] = len(listed)
+                super(LazyYDL, self).process_info(info_dict)
+
+        def get_downloads(paged, params):
+            listed[:] = []
+            ydl = LazyYDL(params)
+            ydl.process_ie_result(make_playlist(paged))
+            return [
+                (int(v['id']), v['playlist_index'], v['listed'])
+                for v in ydl.downloaded_info_dicts]
+
+        listed = []
+        for paged in (False, True):
+            res = get_downloads(paged, {'lazy_playlist': True})
+            self.assertEqual([r[:2] for r in res], [(i, i) for i in range(1, 11)])
+            self.assertTrue(res[0][2] < 10)
+            self.assertEqual(res[0][2], 3 if paged else 1)
+
+            for params in ({'playliststart': 3, 'playlistend': 5},
+                           {'playlist_items': '2,4-5,9'},
+                           {'playlist_items': '4,2'},
+                           {'playlistreverse': True}):
+                expected = get_downloads(paged, params)
+                res = get_downloads(paged, dict(params, lazy_playlist=True))
+                self.assertEqual([r[:2] for r in res], [r[:2] for r in expected])
+
+            res = get_downloads(paged, {'playlist_items': '2,4-5,9', 'lazy_playlist': True})
+            self.assertEqual(res[-1][2], 9)
+
+    def test_concurrent_pages(self):
+        def get_page(pagenum):
+            fetched_in.append(threading.current_thread())
+            for i in range(pagenum * 3 + 1, min(pagenum * 3 + 4, 11)):
+                yield {
+                    'id': compat_str(i),
+                    'title': compat_str(i),
+                    'url': TEST_URL,
+                }
+
+        def get_ids(entries, params):
+            fetched_in[:] = []
+            ydl = YDL(params)
+            ydl.process_ie_result({
+                '_type': 'playlist',
+                'id': 'test',
+                'entries': entries,
+                'extractor': 'test:playlist',
+                'extractor_key': 'test:playlist',
+                'webpage_url': 'http://example.com',
+            })
+            return [int(v['id']) for v in ydl.downloaded_info_dicts]
+
+        fetched_in = []
+        for params in ({}, {'lazy_playlist': True}):
+            for make_entries in (lambda: OnDemandPagedList(get_page, 3),
+                                 lambda: InAdvancePagedList(get_page, 4, 3)):
+                self.assertEqual(get_ids(make_entries(), params), list(range(1, 11)))
+                self.assertEqual(set(fetched_in), set([threading.current_thread()]))
+
+                res = get_ids(make_entries(), dict(params, concurrent_pages=4))
+                self.assertEqual(res, list(range(1, 11)))
+                self.assertEqual(len(fetched_in), 4)
+                # The pages are fetched in the background
+                self.assertTrue(any(t is not threading.current_thread() for t in fetched_in))
+
     def test_urlopen_no_file_protocol(self):
         # see https://github.com/rg3/youtube-dl/issues/8227
         ydl = YDL()
@@ -736,6 +884,76 @@ class TestYoutubeDL(unittest.TestCase):
         downloaded = ydl.downloaded_info_dicts[0]
         self.assertEqual(downloaded['url'], TEST_URL)
 
+    def test_concurrent_extractions(self):
+        def download(urls, **params):
+            logger = OutputLogger()
+            params.update({
+                'simulate': True,
+                'forceid': True,
+                'ignoreerrors': True,
+                'logger': logger,
+            })
+            ydl = YoutubeDL(params, auto_init=False)
+            ydl.add_info_extractor(SleepIE(ydl))
+            try:
+                retcode = ydl.download(urls)
+            except MaxDownloadsReached:
+                retcode = None
+            return retcode, logger.messages
+
+        urls = ['sleep:%d' % i for i in range(1, 10)]
+        retcode, output = download(urls)
+        self.assertEqual(retcode, 1)
+        self.assertEqual(output[:4], ['[Sleep] 1: Extracting', '1', '[Sleep] 2: Extracting', '2'])
+        self.assertEqual(download(urls, concurrent_extractions=4), (retcode, output))
+
+        expected = download(urls, max_downloads=4)
+        self.assertEqual(expected[0], None)
+        self.assertEqual(download(urls, max_downloads=4, concurrent_extractions=4), expected)
+
+    def test_concurrent_playlist_extractions(self):
+        class PlaylistIE(InfoExtractor):
+            _VALID_URL = r'playlist:'
+
+            def _real_extract(self, url):
+                return self.playlist_result([
+                    self.url_result('sleep:%d' % i, 'Sleep', compat_str(i))
+                    for i in range(1, 10)], 'playlist')
+
+        def download(**params):
+            logger = OutputLogger()
+            params.update({
+                'simulate': True,
+                'forceid': True,
+                'ignoreerrors': True,
+                'outtmpl': '%(id)s',
+                'download_archive': archive,
+                'logger': logger,
+            })
+            ydl = YoutubeDL(params, auto_init=False)
+            ydl.add_info_extractor(PlaylistIE(ydl))
+            sleep_ie = SleepIE(ydl)
+            ydl.add_info_extractor(sleep_ie)
+            try:
+                res = ydl.extract_info('playlist:')
+            except MaxDownloadsReached:
+                res = None
+            if res is not None:
+                res = [e and (e['id'], e['playlist_index']) for e in res['entries']]
+            return (res, logger.messages), sleep_ie.extracted
+
+        archive = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_archive.txt')
+        with open(archive, 'w') as f:
+            f.write('sleep 5\n')
+        try:
+            for params in ({}, {'playlistreverse': True}, {'playlist_items': '2-6'}, {'max_downloads': 3}):
+                expected, extracted = download(**params)
+                self.assertNotIn('5', extracted)
+                res, extracted = download(concurrent_extractions=3, **params)
+                self.assertEqual(res, expected)
+                self.assertNotIn('5', extracted)
+        finally:
+            os.remove(archive)
 
 if __name__ == '__main__':
     unittest.main()
@@ -8,9 +8,11 @@ import sys
 import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_decrypt_text
+from youtube_dl import aes
+from youtube_dl.aes import aes_decrypt, aes_encrypt, aes_cbc_decrypt, aes_cbc_decrypt_bytes, aes_decrypt_text, key_expansion
 from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
 import base64
+import random
 
 # the encrypted data can be generate with 'devscripts/generate_aes_testdata.py'
 
@@ -34,6 +36,37 @@ class TestAES(unittest.TestCase):
         decrypted = intlist_to_bytes(aes_cbc_decrypt(data, self.key, self.iv))
         self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
 
+    def test_cbc_decrypt_bytes(self):
+        data = b"\x97\x92+\xe5\x0b\xc3\x18\x91ky9m&\xb3\xb5@\xe6'\xc2\x96.\xc8u\x88\xab9-[\x9e|\xf1\xcd"
+        key = intlist_to_bytes(self.key)
+        iv = intlist_to_bytes(self.iv)
+        for cipher in (data, bytearray(data), memoryview(data)):
+            decrypted = aes_cbc_decrypt_bytes(cipher, key, iv)
+            self.assertEqual(decrypted.rstrip(b'\x08'), self.secret_msg)
+
+    def test_cbc_decrypt_tables(self):
+        # Compare the table driven implementation with the block functions
+        crypto_aes, aes._CryptoAES = aes._CryptoAES, None
+        try:
+            rng = random.Random(0)
+            for key_size in (16, 24, 32):
+                key = [rng.randint(0, 255) for _ in range(key_size)]
+                iv = [rng.randint(0, 255) for _ in range(16)]
+                data = [rng.randint(0, 255) for _ in range(16 * 20)]
+                expanded_key = key_expansion(key)
+                expected = []
+                previous = iv
+                for i in range(0, len(data), 16):
+                    block = data[i:i + 16]
+                    expected += [x ^ y for x, y in zip(aes_decrypt(block, expanded_key), previous)]
+                    previous = block
+                self.assertEqual(
+                    aes_cbc_decrypt_bytes(intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv)),
+                    intlist_to_bytes(expected))
+                self.assertEqual(aes_cbc_decrypt(data, key, iv), expected)
+        finally:
+            aes._CryptoAES = crypto_aes
+
     def test_decrypt_text(self):
         password = intlist_to_bytes(self.key).decode('utf-8')
         encrypted = base64.b64encode(
@@ -17,17 +17,24 @@ from youtube_dl.extractor import (
     gen_extractors,
     YoutubeIE,
 )
+from youtube_dl.extractor.common import InfoExtractor
+from youtube_dl.extractor.dispatch import (
+    ExtractorIndex,
+    pattern_keys,
+)
 
 
 class TestAllURLsMatching(unittest.TestCase):
     def setUp(self):
         self.ies = gen_extractors()
 
-    def matching_ies(self, url):
-        return [ie.IE_NAME for ie in self.ies if ie.suitable(url) and ie.IE_NAME != 'generic']
+    def matching_ies(self, url, ies=None):
+        return [ie.IE_NAME for ie in ies or self.ies if ie.suitable(url) and ie.IE_NAME != 'generic']
 
     def assertMatch(self, url, ie_list):
         self.assertEqual(self.matching_ies(url), ie_list)
+        self.assertEqual(
+            self.matching_ies(url, ExtractorIndex(self.ies).candidates(url)), ie_list)
 
     def test_youtube_playlist_matching(self):
         assertPlaylist = lambda url: self.assertMatch(url, ['youtube:playlist'])
@@ -97,6 +104,43 @@ class TestAllURLsMatching(unittest.TestCase):
                         ie.suitable(url),
                         '%s should not match URL %r . That URL belongs to %s.' % (type(ie).__name__, url, tc['name']))
 
+    def test_extractor_index(self):
+        ies = gen_extractors()
+        index = ExtractorIndex(ies)
+        # The other extractors do not match, see test_no_duplicates
+        for tc in gettestcases(include_onlymatching=True):
+            url = tc['url']
+            candidates = [type(ie).__name__ for ie in index.candidates(url)]
+            self.assertTrue(
+                tc['name'] + 'IE' in candidates, 'The index misses %sIE for URL %r' % (tc['name'], url))
+            self.assertEqual(candidates[-1], 'GenericIE')
+
+        for url in [
+                'HTTPS://WWW.YOUTUBE.COM/watch?v=BaW_jenozKc',
+                'https://www.youtube.com:443/watch?v=BaW_jenozKc',
+                '//www.youtube.com/watch?v=BaW_jenozKc',
+                'youtube.com/watch?v=BaW_jenozKc',
+                'BaW_jenozKc',
+                'ytsearch5:youtube-dl test video',
+                'http://www.dailymotion.co.uk/video/x5kesuj',
+                'http://abcnews.go.com/ThisWeek/video/week-exclusive-irans-foreign-minister-zarif-20411932',
+                'http://abcnews/go.com/ThisWeek/video/week-exclusive-irans-foreign-minister-zarif-20411932',
+                'http://user.bandcamp.com/track/a?b',
+                'http://example.com/a/b.bandcamp.com/track/a',
+                'rtmp://example.com/live/stream',
+                'http://example.com/video.mp4']:
+            self.assertEqual(self.matching_ies(url, index.candidates(url)), self.matching_ies(url))
+
+    def test_extractor_index_literal_dollar(self):
+        # A literal "$" is not the end of the pattern
+        class DollarIE(InfoExtractor):
+            _VALID_URL = r'https?://ex\$ample\.com/(?P<id>\d+)'
+
+        self.assertEqual(pattern_keys(DollarIE._VALID_URL), [('suffix', 'ex$ample.com')])
+        url = 'http://ex$ample.com/42'
+        self.assertTrue(DollarIE.suitable(url))
+        self.assertTrue(DollarIE in ExtractorIndex([DollarIE]).candidates(url))
+
     def test_keywords(self):
         self.assertMatch(':ytsubs', ['youtube:subscriptions'])
         self.assertMatch(':ytsubscriptions', ['youtube:subscriptions'])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import time
+
+from test.helper import try_rm
+from youtube_dl.archive import (
+    DownloadArchive,
+    open_download_archive,
+    SQLiteDownloadArchive,
+)
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestDownloadArchive(unittest.TestCase):
+    def setUp(self):
+        self.fn = os.path.join(TEST_DIR, 'test_archive.txt')
+        try_rm(self.fn)
+
+    def tearDown(self):
+        try_rm(self.fn)
+
+    def test_text(self):
+        archive = open_download_archive(self.fn)
+        self.assertTrue(isinstance(archive, DownloadArchive))
+        self.assertFalse('youtube a' in archive)
+        archive.add('youtube a')
+        self.assertTrue('youtube a' in archive)
+        with io.open(self.fn, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'youtube a\n')
+
+        # Appended by another process, the last line is not complete yet
+        with io.open(self.fn, 'a', encoding='utf-8') as f:
+            f.write('youtube b\nyoutube ü\nyoutube c')
+        self.assertTrue('youtube b' in archive)
+        self.assertTrue('youtube ü' in archive)
+        self.assertFalse('youtube c' in archive)
+        with io.open(self.fn, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        self.assertTrue('youtube c' in archive)
+
+        # Replaced by another process
+        with io.open(self.fn + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('youtube d\n')
+        os.remove(self.fn)
+        os.rename(self.fn + '.tmp', self.fn)
+        self.assertTrue('youtube d' in archive)
+        self.assertFalse('youtube a' in archive)
+
+        os.remove(self.fn)
+        self.assertFalse('youtube d' in archive)
+
+    def test_sqlite(self):
+        archive = open_download_archive(self.fn, 'sqlite')
+        self.assertTrue(isinstance(archive, SQLiteDownloadArchive))
+        archive.add('youtube a')
+        self.assertTrue('youtube a' in archive)
+        self.assertFalse('youtube b' in archive)
+        archive.add('youtube a')
+        for i in range(SQLiteDownloadArchive._BATCH_SIZE):
+            archive.add('youtube %d' % i)
+
+        # A batch was written, what is still pending is written on close
+        other = open_download_archive(self.fn, 'sqlite')
+        self.assertTrue('youtube a' in other)
+        self.assertTrue('youtube 97' in other)
+        self.assertFalse('youtube 98' in other)
+        archive.close()
+        self.assertTrue('youtube 99' in other)
+        other.close()
+
+    def test_sqlite_interval(self):
+        class ShortIntervalArchive(SQLiteDownloadArchive):
+            _BATCH_INTERVAL = 0.1
+
+        archive = ShortIntervalArchive(self.fn)
+        other = SQLiteDownloadArchive(self.fn)
+        archive.add('youtube a')
+        self.assertFalse('youtube a' in other)
+        # Written by the timer, without any other call
+        time.sleep(0.5)
+        self.assertTrue('youtube a' in other)
+        archive.close()
+        other.close()
+
+    def test_sqlite_text_file(self):
+        with io.open(self.fn, 'w', encoding='utf-8') as f:
+            f.write('youtube a\nyoutube b\n')
+        self.assertRaises(ValueError, open_download_archive, self.fn, 'sqlite')
+        # The text archive is left as it was
+        self.assertTrue('youtube b' in open_download_archive(self.fn))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,8 +12,13 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+import threading
+
 from test.helper import FakeYDL
+from test.test_http import http_server_port
 from youtube_dl.cache import Cache
+from youtube_dl.compat import compat_http_server, compat_urllib_request
+from youtube_dl.extractor.common import InfoExtractor
 
 
 def _is_empty(d):
@@ -54,6 +59,153 @@ class TestCache(unittest.TestCase):
         self.assertFalse(os.path.exists(self.test_dir))
         self.assertEqual(c.load('test_cache', 'k.'), None)
 
+    def test_prune(self):
+        ydl = FakeYDL({
+            'cachedir': self.test_dir,
+        })
+        c = Cache(ydl)
+        c.prune('test_cache', 2)
+        for i in range(4):
+            c.store('test_cache', 'k%d' % i, i)
+            fn = c._get_cache_fn('test_cache', 'k%d' % i, 'json')
+            os.utime(fn, (1000 + i, 1000 + i))
+        c.store('test_cache2', 'k', 0)
+        c.prune('test_cache', 2)
+        self.assertEqual([c.load('test_cache', 'k%d' % i) for i in range(4)], [None, None, 2, 3])
+        self.assertEqual(c.load('test_cache2', 'k'), 0)
+
+
+class CachingRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('If-None-Match')))
+        headers = {
+            '/max-age': {'Cache-Control': 'max-age=100'},
+            '/expired': {'Cache-Control': 'max-age=0'},
+            '/etag': {'Cache-Control': 'no-cache', 'ETag': '"v1"'},
+            '/no-store': {'Cache-Control': 'no-store, max-age=100'},
+            '/cookie': {'Cache-Control': 'max-age=100', 'Set-Cookie': 'foo=bar; Path=/'},
+            '/vary': {'Cache-Control': 'max-age=100', 'Vary': 'User-Agent'},
+            '/vary-all': {'Cache-Control': 'max-age=100', 'Vary': '*'},
+        }.get(self.path.partition('?')[0], {})
+        if headers.get('ETag') and self.headers.get('If-None-Match') == headers['ETag']:
+            self.send_response(304)
+            self.end_headers()
+            return
+        content = ('content of %s' % self.path).encode('utf-8') * 100
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.test_dir = os.path.join(TEST_DIR, 'testdata', 'http_cache_test')
+        self.tearDown()
+        self.httpd = compat_http_server.HTTPServer(
+            ('localhost', 0), CachingRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        CachingRequestHandler.requests = []
+
+    def tearDown(self):
+        if hasattr(self, 'httpd'):
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def _url(self, path):
+        return 'http://localhost:%d/%s' % (self.port, path)
+
+    def _ydl(self, **params):
+        params.update({
+            'cachedir': self.test_dir,
+            'http_cache': True,
+        })
+        return FakeYDL(params)
+
+    def _fetch_twice(self, path, ttl=None, **params):
+        CachingRequestHandler.requests = []
+        ydl = self._ydl(**params)
+        for _ in range(2):
+            content = ydl.http_cache.urlopen(self._url(path), ttl).read()
+            self.assertEqual(content, ('content of /%s' % path).encode('utf-8') * 100)
+        return [p for p, _ in CachingRequestHandler.requests]
+
+    def test_max_age(self):
+        self.assertEqual(self._fetch_twice('max-age'), ['/max-age'])
+        self.assertEqual(self._fetch_twice('expired'), ['/expired'] * 2)
+        self.assertEqual(self._fetch_twice('no-store'), ['/no-store'] * 2)
+
+    def test_revalidation(self):
+        self._fetch_twice('etag')
+        self.assertEqual(
+            CachingRequestHandler.requests, [('/etag', None), ('/etag', '"v1"')])
+
+    def test_ttl(self):
+        self.assertEqual(self._fetch_twice('plain', ttl=100), ['/plain'])
+        self.assertEqual(self._fetch_twice('max-age', ttl=0), ['/max-age'] * 2)
+
+    def test_bypass(self):
+        ydl = self._ydl()
+        for _ in range(2):
+            req = compat_urllib_request.Request(self._url('max-age'))
+            req.add_header('Youtubedl-no-cache', 'True')
+            ydl.http_cache.urlopen(req).read()
+        self.assertEqual(len(CachingRequestHandler.requests), 2)
+
+    def test_cookies(self):
+        ydl = self._ydl()
+        ydl.http_cache.urlopen(self._url('cookie')).read()
+        self.assertEqual([c.value for c in ydl.cookiejar], ['bar'])
+        # The request is sent with the cookie now, e.g. after logging in
+        ydl.http_cache.urlopen(self._url('cookie')).read()
+        self.assertEqual(len(CachingRequestHandler.requests), 2)
+        # Without it the first response is used, its cookie is not set again
+        ydl.cookiejar.clear()
+        ydl.http_cache.urlopen(self._url('cookie')).read()
+        self.assertEqual(len(CachingRequestHandler.requests), 2)
+        self.assertEqual(list(ydl.cookiejar), [])
+
+    def test_vary(self):
+        self.assertEqual(self._fetch_twice('vary-all'), ['/vary-all'] * 2)
+        ydl = self._ydl()
+        for user_agent in ('a', 'b', 'a'):
+            req = compat_urllib_request.Request(self._url('vary'))
+            req.add_header('User-Agent', user_agent)
+            ydl.http_cache.urlopen(req).read()
+        self.assertEqual(
+            [p for p, _ in CachingRequestHandler.requests], ['/vary-all'] * 2 + ['/vary'] * 2)
+
+    def test_eviction(self):
+        # Every response takes about 2500 bytes, only 3 of them fit
+        ydl = self._ydl(http_cache_max_size=9000)
+        for path in ('max-age?1', 'max-age?2', 'max-age?1', 'max-age?3', 'max-age?4'):
+            ydl.http_cache.urlopen(self._url(path)).read()
+        CachingRequestHandler.requests = []
+        for path in ('max-age?1', 'max-age?3', 'max-age?4', 'max-age?2'):
+            ydl.http_cache.urlopen(self._url(path)).read()
+        # The least recently used one was evicted
+        self.assertEqual(CachingRequestHandler.requests, [('/max-age?2', None)])
+
+    def test_extractor(self):
+        ydl = self._ydl()
+        ie = InfoExtractor(ydl)
+        for _ in range(2):
+            ie._download_webpage(self._url('max-age'), None)
+        self.assertEqual(len(CachingRequestHandler.requests), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
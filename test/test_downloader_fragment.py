@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import re
+import threading
+import time
+
+from test.helper import FakeYDL, try_rm
+from test.test_http import http_server_port
+from youtube_dl.aes import aes_encrypt, key_expansion
+from youtube_dl.compat import (
+    compat_http_server,
+    compat_struct_pack,
+    compat_urllib_error,
+)
+from youtube_dl.downloader.dash import DashSegmentsFD
+from youtube_dl.downloader.fragment import FragmentBufferDownloader
+from youtube_dl.downloader.hls import HlsFD
+from youtube_dl.utils import bytes_to_intlist, intlist_to_bytes
+
+try:
+    import socketserver as compat_socketserver
+except ImportError:  # Python 2
+    import SocketServer as compat_socketserver
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FRAGMENT_COUNT = 20
+
+
+def fragment_content(i):
+    return ('[fragment %d]' % i).encode('ascii') * (i + 1)
+
+
+ENCRYPTION_KEY = list(range(16))
+
+
+def encrypted_fragment_content(i):
+    # AES-128 in CBC mode with the media sequence as IV, padded with zeros
+    content = bytes_to_intlist(fragment_content(i))
+    content += [0] * (-len(content) % 16)
+    expanded_key = key_expansion(ENCRYPTION_KEY)
+    previous = [0] * 8 + bytes_to_intlist(compat_struct_pack('>q', i))
+    encrypted = []
+    for j in range(0, len(content), 16):
+        previous = aes_encrypt([x ^ y for x, y in zip(content[j:j + 16], previous)], expanded_key)
+        encrypted += previous
+    return intlist_to_bytes(encrypted)
+
+
+class ThreadingHTTPServer(compat_socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class FragmentRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    # Fragments that fail with HTTP 403
+    broken_fragments = set()
+    requested_fragments = []
+    live_refreshes = [0]
+    requested_ranges = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, content, content_type='application/octet-stream'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == '/index.m3u8':
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10', '#EXT-X-MEDIA-SEQUENCE:0']
+            for i in range(FRAGMENT_COUNT):
+                lines.extend(['#EXTINF:10,', 'frag%d.ts' % i])
+            lines.append('#EXT-X-ENDLIST')
+            self._send('\n'.join(lines).encode('utf-8'), 'application/vnd.apple.mpegurl')
+            return
+        if self.path == '/live.m3u8':
+            # A sliding window of 3 fragments that moves on every refresh
+            first = self.live_refreshes[0]
+            self.live_refreshes[0] += 1
+            lines = [
+                '#EXTM3U', '#EXT-X-TARGETDURATION:0.05',
+                '#EXT-X-MEDIA-SEQUENCE:%d' % first]
+            for i in range(first, min(first + 3, FRAGMENT_COUNT)):
+                lines.extend(['#EXTINF:0.05,', 'frag%d.ts' % i])
+            if first + 3 >= FRAGMENT_COUNT:
+                lines.append('#EXT-X-ENDLIST')
+            self._send('\n'.join(lines).encode('utf-8'), 'application/vnd.apple.mpegurl')
+            return
+        if self.path == '/encrypted.m3u8':
+            lines = [
+                '#EXTM3U', '#EXT-X-TARGETDURATION:10', '#EXT-X-MEDIA-SEQUENCE:0',
+                '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"']
+            for i in range(FRAGMENT_COUNT):
+                lines.extend(['#EXTINF:10,', 'encrypted%d.ts' % i])
+            lines.append('#EXT-X-ENDLIST')
+            self._send('\n'.join(lines).encode('utf-8'), 'application/vnd.apple.mpegurl')
+            return
+        if self.path == '/key.bin':
+            self._send(intlist_to_bytes(ENCRYPTION_KEY))
+            return
+        mobj = re.match(r'^/encrypted(\d+)\.ts$', self.path)
+        if mobj:
+            self._send(encrypted_fragment_content(int(mobj.group(1))))
+            return
+        if self.path == '/byterange.m3u8':
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10']
+            offset = 0
+            for i in range(FRAGMENT_COUNT):
+                length = len(fragment_content(i))
+                # Only some of the byte ranges have an explicit offset
+                lines.extend([
+                    '#EXTINF:10,',
+                    '#EXT-X-BYTERANGE:%d%s' % (length, '@%d' % offset if i % 3 == 0 else ''),
+                    'all.ts'])
+                offset += length
+            lines.append('#EXT-X-ENDLIST')
+            self._send('\n'.join(lines).encode('utf-8'), 'application/vnd.apple.mpegurl')
+            return
+        if self.path == '/all.ts':
+            content = b''.join(fragment_content(i) for i in range(FRAGMENT_COUNT))
+            mobj = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+            self.requested_ranges.append(mobj.groups())
+            start, end = int(mobj.group(1)), int(mobj.group(2))
+            content = content[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('Content-Range', 'bytes %d-%d/*' % (start, end))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        mobj = re.match(r'^/frag(\d+)\.ts$', self.path)
+        if mobj:
+            i = int(mobj.group(1))
+            self.requested_fragments.append(i)
+            if i in self.broken_fragments:
+                self.send_response(403)
+                self.end_headers()
+                return
+            # Make fragments complete out of order
+            time.sleep(random.random() * 0.02)
+            self._send(fragment_content(i))
+            return
+        self.send_response(404)
+        self.end_headers()
+
+
+class TestFragmentDownload(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('localhost', 0), FragmentRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = os.path.join(TEST_DIR, 'fragment_test.ts')
+        FragmentRequestHandler.broken_fragments = set()
+        FragmentRequestHandler.requested_fragments = []
+        FragmentRequestHandler.live_refreshes = [0]
+        FragmentRequestHandler.requested_ranges = []
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        try_rm(self.filename)
+        try_rm(self.filename + '.part')
+        try_rm(self.filename + '.part.ytdl')
+
+    def _url(self, path):
+        return 'http://localhost:%d/%s' % (self.port, path)
+
+    def _download(self, fd_class, info_dict, concurrency, **params):
+        ydl = FakeYDL()
+        ydl.to_screen = lambda *args, **kwargs: None
+        params.update({
+            'concurrent_fragment_downloads': concurrency,
+            'noprogress': True,
+        })
+        progress = []
+        fd = fd_class(ydl, params)
+        fd.add_progress_hook(progress.append)
+        self.assertTrue(fd.real_download(self.filename, info_dict))
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        self.assertEqual(progress[-1]['status'], 'finished')
+        return content, progress
+
+    def _expected_content(self):
+        return b''.join(fragment_content(i) for i in range(FRAGMENT_COUNT))
+
+    def test_hls(self):
+        for concurrency in (1, 4):
+            content, _ = self._download(
+                HlsFD, {'url': self._url('index.m3u8')}, concurrency)
+            self.assertEqual(content, self._expected_content())
+
+    def test_hls_live(self):
+        content, _ = self._download(
+            HlsFD, {'url': self._url('live.m3u8'), 'is_live': True}, 2)
+        self.assertEqual(content, self._expected_content())
+        self.assertEqual(
+            sorted(FragmentRequestHandler.requested_fragments), list(range(FRAGMENT_COUNT)))
+
+    def test_hls_aes128(self):
+        content, _ = self._download(
+            HlsFD, {'url': self._url('encrypted.m3u8')}, 4)
+        expected = b''.join(
+            fragment_content(i) + b'\x00' * (-len(fragment_content(i)) % 16)
+            for i in range(FRAGMENT_COUNT))
+        self.assertEqual(content, expected)
+
+    def test_hls_byterange(self):
+        content, progress = self._download(
+            HlsFD, {'url': self._url('byterange.m3u8')}, 1)
+        self.assertEqual(content, self._expected_content())
+        # All the byte ranges are adjacent and merged into a single request
+        self.assertEqual(
+            FragmentRequestHandler.requested_ranges, [('0', str(len(content) - 1))])
+        downloading = [s for s in progress if s['status'] == 'downloading']
+        self.assertEqual(downloading[-1]['frag_index'], FRAGMENT_COUNT)
+
+    def test_dash(self):
+        info_dict = {
+            'url': self._url(''),
+            'segment_urls': ['frag%d.ts' % i for i in range(FRAGMENT_COUNT)],
+        }
+        for concurrency in (1, 4):
+            content, progress = self._download(DashSegmentsFD, info_dict, concurrency)
+            self.assertEqual(content, self._expected_content())
+            downloading = [s for s in progress if s['status'] == 'downloading']
+            self.assertEqual(downloading[-1]['frag_index'], FRAGMENT_COUNT)
+            self.assertEqual(downloading[-1]['downloaded_bytes'], len(content))
+
+    def test_fragment_buffer_size(self):
+        # 0 writes fragments to files, 50 makes the larger fragments spill
+        # over to temporary files
+        for buffer_size in (0, 50):
+            for fd_class, info_dict in (
+                    (HlsFD, {'url': self._url('index.m3u8')}),
+                    (DashSegmentsFD, {
+                        'url': self._url(''),
+                        'segment_urls': ['frag%d.ts' % i for i in range(FRAGMENT_COUNT)],
+                    })):
+                content, _ = self._download(
+                    fd_class, info_dict, 4, fragment_buffer_size=buffer_size)
+                self.assertEqual(content, self._expected_content())
+                try_rm(self.filename)
+
+    def test_resume(self):
+        for fd_class, info_dict in (
+                (HlsFD, {'url': self._url('index.m3u8')}),
+                (DashSegmentsFD, {
+                    'url': self._url(''),
+                    'segment_urls': ['frag%d.ts' % i for i in range(FRAGMENT_COUNT)],
+                })):
+            FragmentRequestHandler.broken_fragments = set([12])
+            self.assertRaises(
+                compat_urllib_error.HTTPError,
+                self._download, fd_class, info_dict, 1)
+            self.assertTrue(os.path.exists(self.filename + '.part.ytdl'))
+
+            FragmentRequestHandler.broken_fragments = set()
+            FragmentRequestHandler.requested_fragments = []
+            content, _ = self._download(fd_class, info_dict, 4)
+            self.assertEqual(content, self._expected_content())
+            self.assertEqual(
+                sorted(FragmentRequestHandler.requested_fragments),
+                list(range(12, FRAGMENT_COUNT)))
+            self.assertFalse(os.path.exists(self.filename + '.part.ytdl'))
+            try_rm(self.filename)
+
+    def test_resume_state_saves(self):
+        saved = []
+
+        class SparseStateHlsFD(HlsFD):
+            _RESUME_STATE_FRAGMENTS = 5
+            _RESUME_STATE_INTERVAL = float('inf')
+
+            def _write_resume_state(self, ctx):
+                if ctx['resume_state'] is not None:
+                    saved.append(ctx['resume_state']['fragment_index'])
+                super(SparseStateHlsFD, self)._write_resume_state(ctx)
+
+        info_dict = {'url': self._url('index.m3u8')}
+        FragmentRequestHandler.broken_fragments = set([12])
+        self.assertRaises(
+            compat_urllib_error.HTTPError,
+            self._download, SparseStateHlsFD, info_dict, 1)
+        # The state of the last fragments is saved when the download stops
+        self.assertEqual(saved, [5, 10, 12])
+
+        FragmentRequestHandler.broken_fragments = set()
+        FragmentRequestHandler.requested_fragments = []
+        content, _ = self._download(SparseStateHlsFD, info_dict, 1)
+        self.assertEqual(content, self._expected_content())
+        self.assertEqual(
+            FragmentRequestHandler.requested_fragments, list(range(12, FRAGMENT_COUNT)))
+        try_rm(self.filename)
+
+    def test_buffers_closed_on_error(self):
+        streams = []
+        get_stream = FragmentBufferDownloader.get_stream
+
+        def recording_get_stream(dl):
+            stream = get_stream(dl)
+            streams.append(stream)
+            return stream
+
+        FragmentBufferDownloader.get_stream = recording_get_stream
+        try:
+            FragmentRequestHandler.broken_fragments = set([12])
+            self.assertRaises(
+                compat_urllib_error.HTTPError,
+                self._download, DashSegmentsFD, {
+                    'url': self._url(''),
+                    'segment_urls': ['frag%d.ts' % i for i in range(FRAGMENT_COUNT)],
+                }, 4)
+        finally:
+            FragmentBufferDownloader.get_stream = get_stream
+        # Fragments after the broken one were downloaded ahead
+        self.assertTrue(len(streams) > 12)
+        self.assertEqual([s for s in streams if not s.closed], [])
+
+    def test_dash_no_segments(self):
+        ydl = FakeYDL()
+        ydl.to_screen = lambda *args, **kwargs: None
+        fd = DashSegmentsFD(ydl, {'noprogress': True})
+        try:
+            fd.real_download(self.filename, {'url': self._url(''), 'segment_urls': []})
+        except Exception as err:
+            # FakeYDL raises the reported error
+            self.assertTrue('No segments found' in str(err))
+        else:
+            self.fail('The download did not fail')
+
+    def test_fragment_files_removed(self):
+        self._download(HlsFD, {'url': self._url('index.m3u8')}, 4, fragment_buffer_size=0)
+        leftovers = [
+            fn for fn in os.listdir(TEST_DIR)
+            if fn.startswith(os.path.basename(self.filename) + '.part')]
+        self.assertEqual(leftovers, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
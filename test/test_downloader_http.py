@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import threading
+
+from test.helper import FakeYDL, try_rm
+from test.test_http import http_server_port
+from youtube_dl.compat import compat_http_server, compat_urllib_error
+from youtube_dl.downloader.http import HttpFD
+from youtube_dl.utils import write_json_file
+
+try:
+    import socketserver as compat_socketserver
+except ImportError:  # Python 2
+    import SocketServer as compat_socketserver
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TEST_SIZE = 3 * 1024 * 1024 + 123
+CHUNK_SIZE = -(-TEST_SIZE // 3)
+TEST_CONTENT = bytes(bytearray(i * 7 % 251 for i in range(TEST_SIZE)))
+
+
+class ThreadingHTTPServer(compat_socketserver.ThreadingMixIn, compat_http_server.HTTPServer):
+    daemon_threads = True
+
+
+class RangeRequestHandler(compat_http_server.BaseHTTPRequestHandler):
+    # Range requests starting at these offsets fail with HTTP 403
+    broken_offsets = set()
+    served_bytes = [0]
+    requested_ranges = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        mobj = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if self.path == '/ranges' and mobj:
+            start = int(mobj.group(1))
+            end = int(mobj.group(2)) if mobj.group(2) else TEST_SIZE - 1
+            self.requested_ranges.append((start, end))
+            if start in self.broken_offsets:
+                self.send_response(403)
+                self.end_headers()
+                return
+            content = TEST_CONTENT[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, end, TEST_SIZE))
+        elif self.path in ('/ranges', '/noranges'):
+            content = TEST_CONTENT
+            self.send_response(200)
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        self.served_bytes[0] += len(content)
+
+
+class TestHttpFD(unittest.TestCase):
+    def setUp(self):
+        self.httpd = ThreadingHTTPServer(
+            ('localhost', 0), RangeRequestHandler)
+        self.port = http_server_port(self.httpd)
+        self.server_thread = threading.Thread(target=self.httpd.serve_forever)
+        self.server_thread.daemon = True
+        self.server_thread.start()
+        self.filename = os.path.join(TEST_DIR, 'http_test.bin')
+        RangeRequestHandler.broken_offsets = set()
+        RangeRequestHandler.served_bytes = [0]
+        RangeRequestHandler.requested_ranges = []
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        try_rm(self.filename)
+        try_rm(self.filename + '.part')
+        try_rm(self.filename + '.part.ytdl')
+
+    def _download(self, path, http_connections, **params):
+        ydl = FakeYDL()
+        ydl.to_screen = lambda *args, **kwargs: None
+        params.update({
+            'http_connections': http_connections,
+            'noprogress': True,
+            'retries': 0,
+        })
+        fd = HttpFD(ydl, params)
+        progress = []
+        fd.add_progress_hook(progress.append)
+        self.assertTrue(fd.real_download(
+            self.filename, {'url': 'http://localhost:%d/%s' % (self.port, path)}))
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        self.assertEqual(progress[-1]['status'], 'finished')
+        self.assertEqual(progress[-1]['total_bytes'], TEST_SIZE)
+        self.progress = progress
+        return content
+
+    def test_multiple_connections(self):
+        self.assertEqual(self._download('ranges', 3), TEST_CONTENT)
+        # The probe for the first byte and one request per chunk
+        self.assertEqual(len(RangeRequestHandler.requested_ranges), 4)
+        self.assertFalse(os.path.exists(self.filename + '.part.ytdl'))
+
+    def test_no_range_support(self):
+        self.assertEqual(self._download('noranges', 3), TEST_CONTENT)
+
+    def test_progress_rate(self):
+        self._download('noranges', 1, buffersize=1024, noresizebuffer=True, progress_rate=0)
+        self.assertEqual(len(self.progress), TEST_SIZE // 1024 + 2)
+
+        # Only the first update and the last one before the download
+        # finished are delivered
+        self._download('noranges', 1, progress_rate=0.001)
+        self.assertEqual(
+            [(s['status'], s['downloaded_bytes']) for s in self.progress],
+            [('downloading', 1024), ('downloading', TEST_SIZE), ('finished', TEST_SIZE)])
+
+    def test_resume(self):
+        # The second chunk fails and stops the download
+        RangeRequestHandler.broken_offsets = set([CHUNK_SIZE])
+        self.assertRaises(
+            compat_urllib_error.HTTPError, self._download, 'ranges', 3)
+        self.assertTrue(os.path.exists(self.filename + '.part.ytdl'))
+
+        RangeRequestHandler.broken_offsets = set()
+        RangeRequestHandler.requested_ranges = []
+        self.assertEqual(self._download('ranges', 3), TEST_CONTENT)
+        self.assertIn((CHUNK_SIZE, 2 * CHUNK_SIZE - 1), RangeRequestHandler.requested_ranges)
+        self.assertFalse(os.path.exists(self.filename + '.part.ytdl'))
+
+    def test_resume_chunks(self):
+        # The first chunk is complete, half of the second one is downloaded
+        with open(self.filename + '.part', 'wb') as f:
+            f.write(TEST_CONTENT[:CHUNK_SIZE + CHUNK_SIZE // 2])
+            f.truncate(TEST_SIZE)
+        write_json_file({
+            'http_chunks': {
+                'total_bytes': TEST_SIZE,
+                'chunks': [{
+                    'start': 0, 'end': CHUNK_SIZE, 'downloaded': CHUNK_SIZE,
+                }, {
+                    'start': CHUNK_SIZE, 'end': 2 * CHUNK_SIZE, 'downloaded': CHUNK_SIZE // 2,
+                }, {
+                    'start': 2 * CHUNK_SIZE, 'end': TEST_SIZE, 'downloaded': 0,
+                }],
+            },
+        }, self.filename + '.part.ytdl')
+
+        self.assertEqual(self._download('ranges', 3), TEST_CONTENT)
+        self.assertEqual(
+            sorted(RangeRequestHandler.requested_ranges[1:]),
+            [(CHUNK_SIZE + CHUNK_SIZE // 2, 2 * CHUNK_SIZE - 1), (2 * CHUNK_SIZE, TEST_SIZE - 1)])
+        self.assertEqual(
+            RangeRequestHandler.served_bytes[0], 1 + TEST_SIZE - CHUNK_SIZE - CHUNK_SIZE // 2)
+        self.assertFalse(os.path.exists(self.filename + '.part.ytdl'))
+
+    def test_resume_single_connection(self):
+        # Left by a download with a single connection, without state
+        with open(self.filename + '.part', 'wb') as f:
+            f.write(TEST_CONTENT[:CHUNK_SIZE // 2])
+
+        self.assertEqual(self._download('ranges', 3), TEST_CONTENT)
+        self.assertEqual(
+            RangeRequestHandler.served_bytes[0], 1 + TEST_SIZE - CHUNK_SIZE // 2)
+        self.assertEqual(
+            min(start for start, _ in RangeRequestHandler.requested_ranges[1:]), CHUNK_SIZE // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
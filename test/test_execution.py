@@ -5,6 +5,7 @@ from __future__ import unicode_literals
 
 import unittest
 
+import glob
 import sys
 import os
 import subprocess
@@ -39,5 +40,43 @@ class TestExecution(unittest.TestCase):
         _, stderr = p.communicate()
         self.assertFalse(stderr)
 
+    def test_lazy_extractors(self):
+        extractor_dir = os.path.join(rootDir, 'youtube_dl', 'extractor')
+        lazy_extractors = os.path.join(extractor_dir, 'lazy_extractors.py')
+        existed = os.path.exists(lazy_extractors)
+        # A compiled lazy_extractors left behind would be imported by
+        # everything else run from this checkout
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+        try:
+            subprocess.check_call(
+                [sys.executable, 'devscripts/make_lazy_extractors.py', lazy_extractors],
+                cwd=rootDir, stdout=_DEV_NULL, env=env)
+            # Matching a URL only imports the module of the extractor
+            subprocess.check_call([sys.executable, '-c', '''if True:
+                import sys
+                from youtube_dl import YoutubeDL
+                from youtube_dl.extractor import _LAZY_LOADER
+                assert _LAZY_LOADER
+                ydl = YoutubeDL({'quiet': True})
+                url = 'https://vimeo.com/56015672'
+                ie = next(ie for ie in ydl._suitable_ies(url) if ie.suitable(url))
+                assert 'youtube_dl.extractor.vimeo' not in sys.modules
+                assert ydl.get_info_extractor(ie.ie_key()).IE_NAME == 'vimeo'
+                assert 'youtube_dl.extractor.vimeo' in sys.modules
+                assert 'youtube_dl.extractor.youtube' not in sys.modules
+            '''], cwd=rootDir, env=env)
+            subprocess.check_call(
+                [sys.executable, 'test/test_all_urls.py'], cwd=rootDir, stderr=_DEV_NULL, env=env)
+        finally:
+            if not existed:
+                compiled = (
+                    glob.glob(os.path.join(extractor_dir, 'lazy_extractors.py[co]')) +
+                    glob.glob(os.path.join(extractor_dir, '__pycache__', 'lazy_extractors.*')))
+                for fn in [lazy_extractors] + compiled:
+                    if os.path.exists(fn):
+                        os.remove(fn)
+
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding: utf-8
+from __future__ import unicode_literals
+
+# Allow direct execution
+import os
+import sys
+import unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+
+from test.helper import FakeYDL
+from youtube_dl.compat import (
+    compat_str,
+    compat_urllib_response,
+)
+from youtube_dl.extractor.generic import GenericIE
+from youtube_dl.utils import ExtractorError
+
+
+# One embed of each kind looked for by GenericIE
+EMBEDS = [
+    '<meta property="og:video" content="http://c.brightcove.com/services/viewer/federated_f9?playerID=1&amp;videoId=2">',
+    '<object class="BrightcoveExperience"><param name="playerID" value="1"/><param name="@videoPlayer" value="2"/></object>',
+    '<iframe src="//players.brightcove.net/929656772001/e41d32dc-ec74-459e-a845-6c69f7b724ea_default/index.html?videoId=4463358922001"></iframe>',
+    '<iframe src="//player.theplatform.com/p/7wvmTC/MSNBCEmbeddedOffSite?guid=n_hardball_5biden_140207"></iframe>',
+    '<iframe src="https://www.vessel.com/embed/G4U7gUJ6a?w=615&amp;h=346"></iframe>',
+    '<iframe src="//www.rtl.nl/system/videoplayer/derden/rtlnieuws/video_embed.html#uuid=abc"></iframe>',
+    '<iframe src="https://player.vimeo.com/video/18366444"></iframe>',
+    '<iframe src="https://vid.me/e/Wmur"></iframe>',
+    '<iframe src="https://www.youtube.com/embed/BaW_jenozKc"></iframe>',
+    '<div class="lazyYT" data-youtube-id="BaW_jenozKc"></div>',
+    '<div class="yvii_single_video_player" data-video_id="BaW_jenozKc" data-x="1"></div>',
+    '<iframe src="//www.dailymotion.com/embed/video/x2wmgad"></iframe>',
+    '<iframe src="//www.dailymotion.com/widget/jukebox?list[]=%2Fplaylist%2Fxv4bw_nqtv_sport%2F1&amp;skin=slayer"></iframe>',
+    '<iframe src="//fast.wistia.net/embed/iframe/807fafadvk"></iframe>',
+    '<div id="wistia_807fafadvk"></div>',
+    '<script src="//fast.wistia.com/assets/external/E-v1.js"></script><div class="wistia_embed wistia_async_807fafadvk"></div>',
+    '<iframe src="http://www.svt.se/wd?widgetId=23991&amp;sectionId=541&amp;articleId=2900353&amp;type=embed"></iframe>',
+    '<iframe src="http://player.cnevids.com/embed/56f4f8a0b"></iframe>',
+    '<meta property="og:url" content="http://mpallante.bandcamp.com/track/the-costa-del-sol">',
+    '<iframe src="//cache.vevo.com/m/html/embed.html?video=USUV71400682"></iframe>',
+    '<iframe src="//www.viddler.com/embed/4d03aad9/"></iframe>',
+    '<iframe src="//graphics8.nytimes.com/bcvideo/1.0/iframe/embed.html?videoId=100000002847155&amp;playerType=embed"></iframe>',
+    '<iframe src="//html5-player.libsyn.com/embed/episode/id/3377616/"></iframe>',
+    '<script src="//player.ooyala.com/player.js?embedCode=FkOHh6YzE6ZP5-Uaw_9g9wXb1Hn5aI4R"></script>',
+    '<script>OO.Player.create(\'x\', \'FkOHh6YzE6ZP5-Uaw_9g9wXb1Hn5aI4R\');</script>',
+    '<script>SBN.VideoLinkset.entryGroup([{"video_embed": "<iframe src=\\"https://www.youtube.com/embed/BaW_jenozKc\\"></iframe>"}])</script>',
+    '<iframe src="http://www.aparat.com/video/video/embed/videohash/95FYA/vt/frame"></iframe>',
+    '<iframe src="http://mpora.com/videos/AAdo8okx4wiz/embed"></iframe>',
+    '<iframe src="http://www.novamov.com/embed.php?v=1234"></iframe>',
+    '<iframe src="https://www.facebook.com/video/embed?video_id=10153996085179715"></iframe>',
+    '<iframe src="https://vk.com/video_ext.php?oid=-1&amp;id=2&amp;hash=3"></iframe>',
+    '<iframe src="https://ok.ru/videoembed/20079905452"></iframe>',
+    '<embed src="http://www.ivi.ru/video/player?videoId=53141"/>',
+    '<iframe src="https://embed.live.huffingtonpost.com/HPLEmbedPlayer/?segmentId=5"></iframe>',
+    '<a class="embedly-card" href="https://www.youtube.com/watch?v=BaW_jenozKc"></a>',
+    '<iframe src="http://www.funnyordie.com/embed/3a5b6d6a9f"></iframe>',
+    '<script>setPlaylist("http://www.bbc.co.uk/iplayer/playlist/p01q7xm5")</script>',
+    '<iframe src="http://player.rutv.ru/iframe/video/id/772175/start_zoom/true/showZoomBtn/false/sid/russiatv/"></iframe>',
+    '<iframe src="http://www.tvc.ru/video/iframe/id/74622/isPlay/false/id_stat/channel/?acc_video_id=/channel/brand/id/17/show/episodes/episode_id/39702"></iframe>',
+    '<iframe src="http://news.sportbox.ru/vdl/player/ci/211355"></iframe>',
+    '<iframe src="https://www.pornhub.com/embed/123456"></iframe>',
+    '<iframe src="https://xhamster.com/xembed.php?video=3328539"></iframe>',
+    '<iframe src="https://player.tnaflix.com/video/6538"></iframe>',
+    '<iframe src="//cloud.tvigle.ru/video/5267604/"></iframe>',
+    '<iframe src="https://embed.ted.com/talks/austin_kleon_steal_like_an_artist"></iframe>',
+    '<iframe src="http://www.ustream.tv/embed/recorded/59307601"></iframe>',
+    '<iframe src="http://www.arte.tv/playerv2/embed.php?json_url=x"></iframe>',
+    '<iframe src="http://embed.francetv.fr/?ue=7fd581a2ccf59d2fc5719c5c13cf6961"></iframe>',
+    '<embed src="http://pics.smotri.com/player.swf?file=v1234567890&amp;bufferTime=3"/>',
+    '<iframe src="//myvi.ru/player/embed/html/oOy4euHA6LVwNNAjhD9_Jq5Ha2Qf0rtVMVFMAZav8wObeRTZaCATzucDQIDph8hQU0"></iframe>',
+    '<iframe src="https://w.soundcloud.com/player/?url=https%3A//api.soundcloud.com/tracks/62986583"></iframe>',
+    '<iframe src="http://media.mtvnservices.com/embed/mgid:uma:video:mtv.com:1043906/cp~vid%3D1043906%26uri%3Dmgid%3Auma%3Avideo%3Amtv.com%3A1043906"></iframe>',
+    '<iframe src="https://screen.yahoo.com/foo-bar-123.html?format=embed"></iframe>',
+    '<iframe src="http://www.sbs.com.au/ondemand/video/single/2522555437"></iframe>',
+    '<iframe src="http://player.cinchcast.com/?platformId=1&amp;assetType=single&amp;assetId=7141703"></iframe>',
+    '<iframe src="http://m.mlb.com/shared/video/embed/embed.html?content_id=35692085&amp;topic_id=6479266"></iframe>',
+    '<iframe src="//player.cnevids.com/embedjs/55f9cf8b61646d1acf00000c/5511d76261646d5566020000.js"></iframe>',
+    '<iframe src="https://new.livestream.com/accounts/1/events/2/player?width=960"></iframe>',
+    '<iframe src="https://www.zapiks.fr/index.php?action=playerIframe&amp;media_id=118046"></iframe>',
+    '<script>kWidget.embed({"wid": "_1645161", "entry_id": "0_xxx",});</script>',
+    '<iframe src="//rgvideo.media.eagleplatform.com/index/player?record_id=66046&amp;player_template_id=5201"></iframe>',
+    '<iframe src="https://media.clipyou.ru/index/player?record_id=20702&amp;w=640"></iframe>',
+    '<iframe src="//out.pladform.ru/player?pl=18079&amp;type=html5&amp;videoid=100183293"></iframe>',
+    '<object data="http://videomore.ru/player.swf?x=1&amp;config=http://videomore.ru/video/tracks/367617.xml" type="x"></object>',
+    '<script data-config="//config.playwire.com/14907/videos/v2/3353705/zeus.json"></script>',
+    '<meta property="og:video" content="https://embed.5min.com/518726732/">',
+    '<iframe src="//embed.crooksandliars.com/embed/8RUoRhRi"></iframe>',
+    '<iframe src="https://vplayer.nbcsports.com/p/BxmELC/nbcsports_share/select/9CsDKds0kvHI"></iframe>',
+    '<iframe src="//www.nbcnews.com/widget/video-embed/701714499682"></iframe>',
+    '<iframe src="https://drive.google.com/file/d/0ByeS4oOUV-49Zzh4R1J6R09zazQ/preview"></iframe>',
+    '<iframe src="//video.udn.com/embed/news/300040"></iframe>',
+    '<iframe src="http://www.senate.gov/isvp/?comm=judiciary&amp;type=live"></iframe>',
+    '<iframe src="http://api.dmcloud.net/player/embed/4e7343f894a6f677b10006b4/559545469473996d31429f06"></iframe>',
+    '<iframe src="http://www.onionstudios.com/embed?id=2855&amp;autoplay=true"></iframe>',
+    '<iframe src="//embed.snagfilms.com/embed/player?filmId=74849a00"></iframe>',
+    '<script src="//content.jwplatform.com/players/nPripu9l"></script>',
+    '<iframe src="http://player.screenwavemedia.com/play/iframe.php?id=Cinemassacre-19911"></iframe>',
+    '<iframe src="//www.ultimedia.com/deliver/generic/iframe/mdtk/01601930/zone/1/src/qzvsx"></iframe>',
+    '<iframe src="//play.arkena.com/embed/avp/v2/player/media/b41dda37"></iframe>',
+    '<script>LimelightPlayer.doLoadMedia("a3e00274d4564ec4a9b29b9466432335")</script>',
+    '<iframe src="https://video.tv.adobe.com/v/2456/"></iframe>',
+    '<iframe src="https://vine.co/v/MYxVapFvz2z/embed/simple"></iframe>',
+    '<iframe src="//instagram.com/p/BQ0eAlwhDrw/embed/"></iframe>',
+    '<iframe src="http://www.liveleak.com/ll_embed?i=ab065df993c1"></iframe>',
+    '<iframe src="https://playout.3qsdn.com/0280d6b9-1215-11e6-b427-0cc47a188158?autoplay=true"></iframe>',
+]
+
+# Pages without any of the embeds
+PAGES = [
+    '',
+    '<p>Nothing to see here</p>',
+    '<p>Mentions of youtube, vimeo.com/, Brightcove, OOYALA and facebook, but no embed</p>',
+]
+
+
+class PageIE(GenericIE):
+    """GenericIE serving the same page for every URL"""
+
+    def __init__(self, webpage):
+        super(PageIE, self).__init__(FakeYDL({'test': True}))
+        self._webpage = webpage
+
+    def _request_webpage(self, url_or_request, video_id, *args, **kwargs):
+        url = url_or_request if isinstance(url_or_request, compat_str) else url_or_request.get_full_url()
+        return compat_urllib_response.addinfourl(
+            io.BytesIO(self._webpage.encode('utf-8')),
+            {'Content-Type': 'text/html; charset=utf-8'}, url)
+
+
+class UnfilteredPageIE(PageIE):
+    """PageIE looking for every embed, whatever the keywords in the page"""
+
+    @staticmethod
+    def _embed_keywords_finder(webpage):
+        return lambda *keywords: True
+
+
+def extract(ie_class, webpage):
+    try:
+        return ie_class(webpage).extract('http://example.com/video')
+    except ExtractorError as ee:
+        return 'ERROR: %s' % ee
+
+
+def html(body):
+    return '<html><head><title>Page</title></head><body>%s</body></html>' % body
+
+
+class TestGenericEmbeds(unittest.TestCase):
+    def assertSameResult(self, webpage):
+        self.assertEqual(
+            extract(PageIE, webpage), extract(UnfilteredPageIE, webpage),
+            'Different results for %r' % webpage)
+
+    def test_embeds(self):
+        for embed in EMBEDS:
+            webpage = html(embed)
+            res = extract(PageIE, webpage)
+            self.assertFalse(
+                isinstance(res, compat_str) and 'Unsupported URL' in res,
+                'No embed found in %r' % embed)
+            self.assertSameResult(webpage)
+
+    def test_pages_without_embeds(self):
+        for body in PAGES:
+            res = extract(PageIE, html(body))
+            self.assertTrue(isinstance(res, compat_str) and 'Unsupported URL' in res)
+            self.assertSameResult(html(body))
+
+    def test_precedence(self):
+        # When there are several embeds, the first one looked for wins
+        for first, second in zip(EMBEDS, EMBEDS[1:]):
+            self.assertSameResult(html(second + first))
+        self.assertSameResult(html(''.join(reversed(EMBEDS))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@ import unittest
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from youtube_dl.jsinterp import JSInterpreter
+from youtube_dl.utils import ExtractorError
 
 
 class TestJSInterpreter(unittest.TestCase):
@@ -73,8 +74,6 @@ class TestJSInterpreter(unittest.TestCase):
         self.assertEqual(jsi.call_function('f'), -11)
 
     def test_comments(self):
-        'Skipping: Not yet fully implemented'
-        return
         jsi = JSInterpreter('''
         function x() {
             var x = /* 1 + */ 2;
@@ -104,6 +103,55 @@ class TestJSInterpreter(unittest.TestCase):
         }''')
         self.assertEqual(jsi.call_function('x'), [20, 20, 30, 40, 50])
 
+        jsi = JSInterpreter('function f(){return 10 - 2 + 3 - 4 / 2;}')
+        self.assertEqual(jsi.call_function('f'), 9)
+
+    def test_strings(self):
+        jsi = JSInterpreter('''function f(a){return a + 'b\\'c' + "d\\u0065";}''')
+        self.assertEqual(jsi.call_function('f', 'a'), "ab'cde")
+
+    def test_call(self):
+        jsi = JSInterpreter('''
+        function x() { return 2; }
+        function y(a) { return x() + a; }
+        function z() { return y(3) + y(x() * 2); }
+        ''')
+        self.assertEqual(jsi.call_function('z'), 11)
+
+    def test_signature(self):
+        jsi = JSInterpreter('''
+        var Xy={wS:function(a){a.reverse()},
+        K9:function(a,b){a.splice(0,b)},Vj:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b]=c}};
+        function Wt(a){a=a.split("");Xy.K9(a,2);Xy.wS(a,64);Xy.Vj(a,1);a=a.slice(1);return a.join("")}
+        ''')
+        self.assertEqual(jsi.call_function('Wt', 'abcdefgh'), 'hfedc')
+        # Compiled functions do not keep state between calls
+        self.assertEqual(jsi.call_function('Wt', '0123456789'), '9765432')
+
+    def test_definitions(self):
+        jsi = JSInterpreter('''
+        if(x){var Xy={b:1};var f=function(a){}}var f=function(a){return Xy.wS(a)+g(1)};
+        function g(a){return a}
+        var Xy={wS:function(a){return a*2}};
+        ''')
+        self.assertEqual(jsi.call_function('f', 3), 7)
+        self.assertRaises(ExtractorError, jsi.call_function, 'h')
+
+        # Every place an assignment may be
+        for prefix in ('', 'x;', 'var x,', 'if(x){}', 'for(', 'x=', 'var ', 'return '):
+            code = (
+                prefix + 'Xy={wS:function(a){return a*2}};'
+                'function g(){}' + prefix + 'f=function(a){return Xy.wS(a)};')
+            self.assertEqual(JSInterpreter(code).call_function('f', 3), 6, code)
+        # Properties are not variables
+        jsi = JSInterpreter('x.f=function(a){return a};this.Xy={wS:function(a){return a}};')
+        self.assertRaises(ExtractorError, jsi.call_function, 'f')
+        self.assertRaises(ExtractorError, jsi.extract_object, 'Xy')
+
+    def test_unsupported(self):
+        jsi = JSInterpreter('function f(){return a ? b : c;}')
+        self.assertRaises(ExtractorError, jsi.call_function, 'f')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -13,6 +13,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Various small unit tests
 import io
 import json
+import threading
+import time
 import xml.etree.ElementTree
 
 from youtube_dl.utils import (
@@ -42,6 +44,7 @@ from youtube_dl.utils import (
     ohdave_rsa_encrypt,
     OnDemandPagedList,
     orderedSet,
+    parallel_map,
     parse_duration,
     parse_filesize,
     parse_count,
@@ -82,6 +85,7 @@ from youtube_dl.utils import (
     cli_valueless_option,
     cli_bool_option,
     parse_codecs,
+    RateLimiter,
 )
 from youtube_dl.compat import (
     compat_chr,
@@ -500,6 +504,49 @@ class TestUtil(unittest.TestCase):
         testPL(5, 2, (2, 99), [2, 3, 4])
         testPL(5, 2, (20, 99), [])
 
+    def test_paged_list_prefetch(self):
+        def get_page(pagenum):
+            fetched.append(pagenum)
+            return range(pagenum * 2, min(pagenum * 2 + 2, 5))
+
+        for sliceargs, expected_fetched in (((), [0, 1, 2]), ((0, 4), [0, 1])):
+            fetched = []
+            entries = OnDemandPagedList(get_page, 2, prefetch=True).iterslice(*sliceargs)
+            self.assertEqual(next(entries), 0)
+            # The next page is fetched while the first one is consumed
+            time.sleep(0.05)
+            self.assertEqual(fetched, [0, 1])
+            self.assertEqual(list(entries), list(range(1, 5))[:len(expected_fetched) * 2 - 1])
+            # No page after the last one
+            time.sleep(0.05)
+            self.assertEqual(fetched, expected_fetched)
+
+    def test_paged_list_items(self):
+        def get_page(pagenum):
+            fetched.append(pagenum)
+            return range(pagenum * 50, min(pagenum * 50 + 50, 520))
+
+        for pl in (OnDemandPagedList(get_page, 50),
+                   InAdvancePagedList(get_page, 11, 50)):
+            fetched = []
+            self.assertEqual(pl.getitems(list(range(500))), list(range(500)))
+            self.assertEqual(sorted(fetched), list(range(10)))
+
+            fetched = []
+            self.assertEqual(
+                pl.getitems([120, 3, 0, 121, 519, 520, 2000, -1]), [120, 3, 0, 121, 519])
+            self.assertEqual(sorted(fetched), [0, 2, 10])
+
+    def test_paged_list_concurrency(self):
+        def get_page(pagenum):
+            time.sleep(0.1)
+            return range(pagenum * 10, pagenum * 10 + 10)
+
+        start = time.time()
+        self.assertEqual(
+            InAdvancePagedList(get_page, 8, 10, concurrency=4).getslice(5, 75), list(range(5, 75)))
+        self.assertTrue(time.time() - start < 0.5)
+
     def test_read_batch_urls(self):
         f = io.StringIO('''\xef\xbb\xbf foo
             bar\r
@@ -1024,5 +1071,107 @@ The first line
         self.assertEqual(get_element_by_class('foo', html), 'nice')
         self.assertEqual(get_element_by_class('no-such-class', html), None)
 
+    def test_rate_limiter(self):
+        def consume(limiter, host, byte_count, threads):
+            start = time.time()
+            workers = [
+                threading.Thread(target=lambda: [
+                    limiter.consume(1000, host) for _ in range(byte_count // 1000 // threads)])
+                for _ in range(threads)]
+            for t in workers:
+                t.start()
+            for t in workers:
+                t.join()
+            return time.time() - start
+
+        # The limit applies to all the transfers together
+        limiter = RateLimiter(1000000)
+        self.assertTrue(0.15 < consume(limiter, 'example.com', 200000, 4) < 0.5)
+
+        limiter = RateLimiter(host_rates={'example.com': 1000000})
+        self.assertTrue(0.15 < consume(limiter, 'www.example.com', 200000, 2) < 0.5)
+        self.assertTrue(consume(limiter, 'example.org', 10000000, 2) < 0.15)
+        self.assertEqual(limiter.reserve('example.org'), None)
+        self.assertTrue(limiter.is_limited('www.example.com'))
+        self.assertFalse(limiter.is_limited('example.org'))
+
+    def test_rate_limiter_reserve(self):
+        limiter = RateLimiter(16000, {'example.com': 8000})
+        # All but a 16th of the rate when nothing else is downloading
+        self.assertEqual(limiter.reserve(), 15000)
+        limiter.release(15000)
+        self.assertEqual(limiter.reserve('example.com'), 7500)
+        # Half of what is left otherwise
+        self.assertEqual(limiter.reserve(), 3750)
+        limiter.release(7500, 'example.com')
+        self.assertEqual(limiter.reserve('example.com'), 5625)
+
+        # Too little is left, a quarter of what is not reserved
+        limiter = RateLimiter(16000)
+        self.assertEqual(limiter.reserve(), 15000)
+        self.assertEqual(limiter.reserve(), 250)
+        limiter.release(15000)
+        self.assertEqual(limiter.reserve(), 7375)
+
+    def test_rate_limiter_concurrent_reservations(self):
+        limiter = RateLimiter(16000)
+        rates = []
+
+        def download():
+            rate = limiter.reserve()
+            rates.append(rate)
+            time.sleep(0.2)
+            limiter.release(rate)
+
+        workers = [threading.Thread(target=download) for _ in range(2)]
+        start = time.time()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        # Both run at the same time, within the limit
+        self.assertTrue(time.time() - start < 0.35)
+        self.assertEqual(len(rates), 2)
+        self.assertTrue(all(rate > 0 for rate in rates))
+        self.assertTrue(sum(rates) < 16000)
+
+    def test_parallel_map(self):
+        def func(i):
+            # The last items are done first
+            time.sleep(0.001 * (20 - i))
+            if i == 5:
+                raise ValueError(i)
+            return i * 2
+
+        results = list(parallel_map(func, range(20), 4))
+        self.assertEqual([r for r, _ in results], [i * 2 if i != 5 else None for i in range(20)])
+        self.assertEqual([i for i, (_, e) in enumerate(results) if e is not None], [5])
+        self.assertTrue(isinstance(results[5][1], ValueError))
+        self.assertEqual(list(parallel_map(func, [], 4)), [])
+
+        # Items are taken lazily, only up to the window ahead of the consumer
+        taken = []
+
+        def items():
+            for i in range(100):
+                taken.append(i)
+                yield i
+
+        results = parallel_map(func, items(), 2, window=3)
+        self.assertEqual(next(results), (0, None))
+        time.sleep(0.1)
+        self.assertEqual(len(taken), 4)
+        results.close()
+        self.assertEqual(len(taken), 4)
+
+        # The results that were not yielded are discarded
+        discarded = []
+        results = parallel_map(func, range(20), 2, window=3, discard=discarded.append)
+        self.assertEqual(next(results), (0, None))
+        time.sleep(0.1)
+        results.close()
+        self.assertEqual(sorted(discarded), [2, 4, 6])
+
+
 if __name__ == '__main__':
     unittest.main()
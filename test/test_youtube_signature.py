@@ -10,6 +10,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import io
 import re
+import shutil
 import string
 
 from test.helper import FakeYDL
@@ -73,6 +74,17 @@ _TESTS = [
     )
 ]
 
+# Player code available offline, in test/testdata/jsinterp, with the
+# signatures the interpreter computed before it compiled the functions
+_SNIPPET_TESTS = [
+    ('player-helper-object.js', 83, '3456789abcdefghijk0?nopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!"#$%&\'(>*+,-./:;<=)'),
+    ('player-helper-object.js', 86, '3456789abcdefghijk0mno\\qrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!"#$%&\'()*+[-./:;<=>?@,'),
+    ('player-helper-object.js', 88, '3456789abcdefghijk0mnopq^stuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ!"#$%&\'()*+,-]/:;<=>?@[\\.'),
+    ('player-functions.js', 83, '51234Z6789a=cdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXY0!"#$%&\'()*+,-./:;'),
+    ('player-functions.js', 86, '51234Z6789abcd@fghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXY0!"#$%&\'()*+,-./:;<=>'),
+    ('player-functions.js', 88, '51234Z6789abcdef\\hijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXY0!"#$%&\'()*+,-./:;<=>?@'),
+]
+
 
 class TestSignature(unittest.TestCase):
     def setUp(self):
@@ -82,6 +94,55 @@ class TestSignature(unittest.TestCase):
             os.mkdir(self.TESTDATA_DIR)
 
 
+class TestPlayerSnippets(unittest.TestCase):
+    def test_snippets(self):
+        testdata_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), 'testdata', 'jsinterp')
+        ie = YoutubeIE(FakeYDL())
+        for fn, sig_input, expected_sig in _SNIPPET_TESTS:
+            with io.open(os.path.join(testdata_dir, fn), encoding='utf-8') as f:
+                func = ie._parse_sig_js(f.read())
+            self.assertEqual(
+                func(compat_str(string.printable[:sig_input])), expected_sig,
+                '%s (%d)' % (fn, sig_input))
+
+
+class TestPlayerCache(unittest.TestCase):
+    PLAYER_URL = 'https://s.ytimg.com/yts/jsbin/html5player-en_US-vflTEST1/html5player.js'
+    PLAYER = (
+        'var Xy={wS:function(a){a.reverse()},K9:function(a,b){a.splice(0,b)}};'
+        'var x=1;function Wt(a){a=a.split("");Xy.K9(a,2);Xy.wS(a,64);return a.join("")}'
+        'g.sig||Wt(g.s);')
+
+    def setUp(self):
+        TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+        self.cache_dir = os.path.join(TEST_DIR, 'testdata', 'player_cache_test')
+        self.tearDown()
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_player_cache(self):
+        downloads = []
+
+        def download_webpage(url, *args, **kwargs):
+            downloads.append(url)
+            return self.PLAYER
+
+        def decrypt(sig):
+            ie = YoutubeIE(FakeYDL({'cachedir': self.cache_dir}))
+            ie._download_webpage = download_webpage
+            return ie._decrypt_signature(sig, 'test', self.PLAYER_URL)
+
+        self.assertEqual(decrypt('0123.45678'), '87654.32')
+        self.assertEqual(downloads, [self.PLAYER_URL])
+        # Another signature length, the player is not downloaded again
+        self.assertEqual(decrypt('0123.456789'), '987654.32')
+        self.assertEqual(decrypt('0123456'), '65432')
+        self.assertEqual(len(downloads), 1)
+
+
 def make_tfunc(url, stype, sig_input, expected_sig):
     m = re.match(r'.*-([a-zA-Z0-9_-]+)(?:/watch_as3|/html5player)?\.[a-z]+$', url)
     assert m, '%r should follow URL format' % url
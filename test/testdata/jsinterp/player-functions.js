@@ -0,0 +1,3 @@
+var yt=yt||{};yt.player=yt.player||{};function fh(a,b){for(var c=1;c<arguments.length;c+=2){var d=arguments[c],e=arguments[c+1];a.style[d]=e}}
+function bi(a){a=a.split("");a=ci(a,61);a=ci(a,5);a=a.reverse();a=a.slice(2);a=ci(a,69);a=a.slice(2);a=a.reverse();return a.join("")}function ci(a,b){var c=a[0];a[0]=a[b%a.length];a[b]=c;return a};
+function di(a){var b={};a&&(b.url=a.url,b.sig=a.sig||bi(a.s));return b}var ei={};ei.ABC=function(a){return{f:a}};
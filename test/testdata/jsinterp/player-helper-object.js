@@ -0,0 +1,7 @@
+var _yt_player={};(function(g){var window=this;var aa=function(a){var b=0;return function(){return b<a.length?{done:!1,value:a[b++]}:{done:!0}}},ba="function"==typeof Object.defineProperties?Object.defineProperty:function(a,b,c){a!=Array.prototype&&a!=Object.prototype&&(a[b]=c.value)};
+var Hr={Gx:function(a){return a.replace(/[\s\xa0]+$/,"")},xc:function(a,b){return-1!=a.indexOf(b)}};
+var Zr={VR:function(a,b){a.splice(0,b)},
+cH:function(a){a.reverse()},IC:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};var $r=function(a){a=a.split("");Zr.IC(a,21);Zr.VR(a,3);Zr.cH(a,48);Zr.IC(a,60);Zr.VR(a,1);Zr.IC(a,11);Zr.cH(a,14);return a.join("")};
+g.Wq=function(a,b){this.j=a;this.B=b||{};this.o="}";for(var c in this.B)this.B.hasOwnProperty(c)&&(this.o+=c)};
+var as=function(a,b,c){var d=b.sp||"signature";if(b.s){var e=b.sig||$r(b.s);a.set(d,e)}else b.sig&&a.set(d,b.sig);return c};
+g.bs=function(a){return"string"===typeof a?Hr.Gx(a):a};})(_yt_player);
@@ -21,6 +21,7 @@ import shutil
 import subprocess
 import socket
 import sys
+import threading
 import time
 import tokenize
 import traceback
@@ -55,16 +56,18 @@ from .utils import (
     ExtractorError,
     format_bytes,
     formatSeconds,
-    locked_file,
+    int_or_none,
     make_HTTPS_handler,
     MaxDownloadsReached,
     PagedList,
+    parallel_map,
     parse_filesize,
     PerRequestProxyHandler,
     platform_name,
     PostProcessingError,
     preferredencoding,
     prepend_extension,
+    RateLimiter,
     register_socks_protocols,
     render_table,
     replace_extension,
@@ -83,8 +86,10 @@ from .utils import (
     YoutubeDLCookieProcessor,
     YoutubeDLHandler,
 )
-from .cache import Cache
+from .archive import open_download_archive
+from .cache import Cache, ResponseCache
 from .extractor import get_info_extractor, gen_extractor_classes, _LAZY_LOADER
+from .extractor.dispatch import ExtractorIndex
 from .downloader import get_suitable_downloader
 from .downloader.rtmp import rtmpdump_version
 from .postprocessor import (
@@ -151,11 +156,22 @@ class YoutubeDL(object):
     restrictfilenames: Do not allow "&" and spaces in file names
     ignoreerrors:      Do not stop on download errors.
     force_generic_extractor: Force downloader to use the generic extractor
+    concurrent_extractions: Number of URLs of the list given to download
+                       (or of entries of a playlist) whose information is
+                       extracted in parallel. The videos are still
+                       processed and downloaded one by one, in order.
     nooverwrites:      Prevent overwriting files.
     playliststart:     Playlist item to start at.
     playlistend:       Playlist item to end at.
     playlist_items:    Specific indices of playlist to download.
     playlistreverse:   Download playlist items in reverse order.
+    lazy_playlist:     Process the entries of a playlist as the extractor
+                       yields them instead of collecting all of them first
+                       (unless playlistreverse or an unordered
+                       playlist_items needs them). n_entries is None then
+                       and playlist_index is not padded in the filename.
+    concurrent_pages:  Number of pages of a paged playlist to fetch at a
+                       time, ahead of the entries being processed.
     matchtitle:        Download only matching titles.
     rejecttitle:       Reject downloads for matching titles.
     logger:            Log messages to a logging.Logger instance.
@@ -177,6 +193,13 @@ class YoutubeDL(object):
     skip_download:     Skip the actual download of the video file
     cachedir:          Location of the cache files in the filesystem.
                        False to disable filesystem cache.
+    http_cache:        Cache the responses to the requests of the extractors
+                       in the cache directory (experimental)
+    http_cache_ttl:    A dictionary of extractor keys (lowercase, or
+                       "default" for all of them) and numbers of seconds the
+                       cached responses for their requests are used for,
+                       regardless of their headers. 0 disables the cache.
+    http_cache_max_size: Maximum size of the HTTP cache in bytes.
     noplaylist:        Download single video instead of a playlist if in doubt.
     age_limit:         An integer representing the user's age in years.
                        Unsuitable videos for the given age are skipped.
@@ -192,6 +215,8 @@ class YoutubeDL(object):
     download_archive:  File name of a file where all downloads are recorded.
                        Videos already present in the file are not downloaded
                        again.
+    download_archive_format: Format of the download archive, "text" (one
+                       video per line, the default) or "sqlite".
     cookiefile:        File name where cookies should be read from and dumped to.
     nocheckcertificate:Do not verify SSL certificates
     prefer_insecure:   Use HTTP instead of HTTPS to retrieve information.
@@ -247,6 +272,11 @@ class YoutubeDL(object):
                        - "detect_or_warn": check whether we can do anything
                                            about it, warn otherwise (default)
     source_address:    (Experimental) Client-side IP address to bind to.
+    ratelimit:         Download speed limit, in bytes/sec, shared by all the
+                       downloads.
+    host_ratelimits:   A dictionary of host names and download speed limits
+                       in bytes/sec for the downloads from them (and their
+                       subdomains).
     call_home:         Boolean, true iff we are allowed to contact the
                        youtube-dl servers for debugging.
     sleep_interval:    Number of seconds to sleep before each download.
@@ -268,9 +298,11 @@ class YoutubeDL(object):
 
     The following parameters are not used by YoutubeDL itself, they are used by
     the downloader (see youtube_dl/downloader/common.py):
-    nopart, updatetime, buffersize, ratelimit, min_filesize, max_filesize, test,
+    nopart, updatetime, buffersize, min_filesize, max_filesize, test,
     noresizebuffer, retries, continuedl, noprogress, consoletitle,
-    xattr_set_filesize, external_downloader_args, hls_use_mpegts.
+    xattr_set_filesize, external_downloader_args, hls_use_mpegts,
+    fragment_retries, concurrent_fragment_downloads, fragment_buffer_size,
+    http_connections, progress_rate.
 
     The following options are used by the post processors:
     prefer_ffmpeg:     If True, use ffmpeg instead of avconv if both are available,
@@ -285,6 +317,7 @@ class YoutubeDL(object):
     _download_retcode = None
     _num_downloads = None
     _screen_file = None
+    rate_limiter = None
 
     def __init__(self, params=None, auto_init=True):
         """Create a FileDownloader object with the given options."""
@@ -296,6 +329,15 @@ class YoutubeDL(object):
         self._progress_hooks = []
         self._download_retcode = 0
         self._num_downloads = 0
+        # Output of the extractions running in other threads, see download
+        self._output_buffer = threading.local()
+        # Results of the extractors run ahead of time for playlist entries
+        self._prefetched_info = {}
+        self._ies_lock = threading.Lock()
+        # Built on the first lookup of an extractor for a URL
+        self._ie_index = None
+        self._archive_lock = threading.Lock()
+        self._download_archive = None
         self._screen_file = [sys.stdout, sys.stderr][params.get('logtostderr', False)]
         self._err_file = sys.stderr
         self.params = {
@@ -304,6 +346,7 @@ class YoutubeDL(object):
         }
         self.params.update(params)
         self.cache = Cache(self)
+        self.http_cache = ResponseCache(self)
 
         if self.params.get('cn_verification_proxy') is not None:
             self.report_warning('--cn-verification-proxy is deprecated. Use --geo-verification-proxy instead.')
@@ -354,6 +397,10 @@ class YoutubeDL(object):
 
         self._setup_opener()
 
+        if params.get('ratelimit') or params.get('host_ratelimits'):
+            self.rate_limiter = RateLimiter(
+                params.get('ratelimit'), params.get('host_ratelimits'))
+
         if auto_init:
             self.print_debug_header()
             self.add_default_info_extractors()
@@ -389,6 +436,8 @@ class YoutubeDL(object):
     def add_info_extractor(self, ie):
         """Add an InfoExtractor object to the end of the list."""
         self._ies.append(ie)
+        if self._ie_index is not None:
+            self._ie_index.add(ie)
         if not isinstance(ie, type):
             self._ies_instances[ie.ie_key()] = ie
             ie.set_downloader(self)
@@ -399,12 +448,23 @@ class YoutubeDL(object):
         the _ies list, if there's no instance it will create a new one and add
         it to the extractor list.
         """
-        ie = self._ies_instances.get(ie_key)
-        if ie is None:
-            ie = get_info_extractor(ie_key)()
-            self.add_info_extractor(ie)
+        with self._ies_lock:
+            ie = self._ies_instances.get(ie_key)
+            if ie is None:
+                ie = get_info_extractor(ie_key)()
+                self.add_info_extractor(ie)
         return ie
 
+    def _suitable_ies(self, url):
+        """
+        Return the extractors that could be suitable for url, in the order
+        of the _ies list
+        """
+        with self._ies_lock:
+            if self._ie_index is None:
+                self._ie_index = ExtractorIndex(self._ies)
+            return self._ie_index.candidates(url)
+
     def add_default_info_extractors(self):
         """
         Add the InfoExtractors returned by gen_extractors to the end of the list
@@ -438,13 +498,29 @@ class YoutubeDL(object):
         """Print message to stdout if not in quiet mode."""
         return self.to_stdout(message, skip_eol, check_quiet=True)
 
+    def _buffered(self, func, *args):
+        """Call func, unless the output of the thread is buffered
+
+        The call is then kept in the buffer, to be replayed with
+        _replay_output.
+        """
+        output = getattr(self._output_buffer, 'output', None)
+        if output is not None:
+            output.append((func, args))
+            return
+        func(*args)
+
+    def _replay_output(self, output):
+        for func, args in output:
+            func(*args)
+
     def _write_string(self, s, out=None):
-        write_string(s, out=out, encoding=self.params.get('encoding'))
+        self._buffered(write_string, s, out, self.params.get('encoding'))
 
     def to_stdout(self, message, skip_eol=False, check_quiet=False):
         """Print message to stdout if not in quiet mode."""
         if self.params.get('logger'):
-            self.params['logger'].debug(message)
+            self._buffered(self.params['logger'].debug, message)
         elif not check_quiet or not self.params.get('quiet', False):
             message = self._bidi_workaround(message)
             terminator = ['\n', ''][skip_eol]
@@ -456,7 +532,7 @@ class YoutubeDL(object):
         """Print message to stderr."""
         assert isinstance(message, compat_str)
         if self.params.get('logger'):
-            self.params['logger'].error(message)
+            self._buffered(self.params['logger'].error, message)
         else:
             message = self._bidi_workaround(message)
             output = message + '\n'
@@ -496,6 +572,15 @@ class YoutubeDL(object):
         if self.params.get('cookiefile') is not None:
             self.cookiejar.save()
 
+        if self._download_archive is not None:
+            self._download_archive.close()
+            self._download_archive = None
+
+        for handler in self._opener.handlers:
+            connection_pool = getattr(handler, '_connection_pool', None)
+            if connection_pool is not None:
+                connection_pool.close()
+
     def trouble(self, message=None, tb=None):
         """Determine action to take when a download problem appears.
 
@@ -532,7 +617,7 @@ class YoutubeDL(object):
         If stderr is a tty file the 'WARNING:' will be colored
         '''
         if self.params.get('logger') is not None:
-            self.params['logger'].warning(message)
+            self._buffered(self.params['logger'].warning, message)
         else:
             if self.params.get('no_warnings'):
                 return
@@ -574,7 +659,12 @@ class YoutubeDL(object):
             autonumber_templ = '%0' + str(autonumber_size) + 'd'
             template_dict['autonumber'] = autonumber_templ % self._num_downloads
             if template_dict.get('playlist_index') is not None:
-                template_dict['playlist_index'] = '%0*d' % (len(str(template_dict['n_entries'])), template_dict['playlist_index'])
+                # The number of entries is unknown for lazy playlists,
+                # the index is not padded then
+                n_entries = template_dict.get('n_entries')
+                template_dict['playlist_index'] = '%0*d' % (
+                    len(str(n_entries)) if n_entries is not None else 0,
+                    template_dict['playlist_index'])
             if template_dict.get('resolution') is None:
                 if template_dict.get('width') and template_dict.get('height'):
                     template_dict['resolution'] = '%dx%d' % (template_dict['width'], template_dict['height'])
@@ -667,7 +757,7 @@ class YoutubeDL(object):
         if ie_key:
             ies = [self.get_info_extractor(ie_key)]
         else:
-            ies = self._ies
+            ies = self._suitable_ies(url)
 
         for ie in ies:
             if not ie.suitable(url):
@@ -679,7 +769,7 @@ class YoutubeDL(object):
                                     'and will probably not work.')
 
             try:
-                ie_result = ie.extract(url)
+                ie_result = self._run_extractor(ie, url)
                 if ie_result is None:  # Finished already (backwards compatibility; listformats and friends should be moved here)
                     break
                 if isinstance(ie_result, list):
@@ -707,6 +797,55 @@ class YoutubeDL(object):
         else:
             self.report_error('no suitable InfoExtractor for URL %s' % url)
 
+    def _run_extractor(self, ie, url):
+        prefetched = self._prefetched_info.pop((ie.ie_key(), url), None)
+        if prefetched is None:
+            return ie.extract(url)
+        ie_result, err, output = prefetched
+        self._replay_output(output)
+        if err is not None:
+            raise err
+        return ie_result
+
+    def _prefetch_entry(self, entry):
+        """Run the extractor for a playlist entry ahead of its processing
+
+        Returns the entry and the key of the extraction in _prefetched_info
+        with its result, or None if the entry is not a URL or is skipped
+        anyway. The output is collected to be printed once the entry is
+        processed.
+        """
+        try:
+            return entry, self._extract_entry(entry)
+        except Exception:
+            # Left to the processing of the entry
+            return entry, None
+
+    def _extract_entry(self, entry):
+        if entry.get('_type', 'video') not in ('url', 'url_transparent'):
+            return None
+        if self.params.get('extract_flat', False):
+            return None
+        if self._match_entry(entry, incomplete=True) is not None:
+            return None
+        url = sanitize_url(entry['url'])
+        ie_key = entry.get('ie_key')
+        for ie in [self.get_info_extractor(ie_key)] if ie_key else self._suitable_ies(url):
+            if ie.suitable(url):
+                ie = self.get_info_extractor(ie.ie_key())
+                break
+        else:
+            return None
+
+        self._output_buffer.output = output = []
+        try:
+            ie_result, err = ie.extract(url), None
+        except Exception as e:
+            ie_result, err = None, e
+        finally:
+            self._output_buffer.output = None
+        return (ie.ie_key(), url), (ie_result, err, output)
+
     def add_default_extra_info(self, ie_result, ie, url):
         self.add_extra_info(ie_result, {
             'extractor': ie.IE_NAME,
@@ -786,9 +925,21 @@ class YoutubeDL(object):
                                 yield int(item)
                         else:
                             yield int(string_segment)
-                playlistitems = iter_playlistitems(playlistitems_str)
+                playlistitems = list(iter_playlistitems(playlistitems_str))
+
+            # In lazy mode the entries are processed as they are listed,
+            # unless all of them are needed first
+            lazy = (
+                self.params.get('lazy_playlist', False) and
+                not self.params.get('playlistreverse', False) and
+                (not playlistitems or (
+                    playlistitems[0] > 0 and playlistitems == sorted(set(playlistitems)))))
 
             ie_entries = ie_result['entries']
+            if isinstance(ie_entries, PagedList):
+                page_concurrency = int_or_none(self.params.get('concurrent_pages')) or 1
+                if page_concurrency > 1:
+                    ie_entries.set_concurrency(page_concurrency)
             if isinstance(ie_entries, list):
                 n_all_entries = len(ie_entries)
                 if playlistitems:
@@ -801,13 +952,28 @@ class YoutubeDL(object):
                 self.to_screen(
                     '[%s] playlist %s: Collected %d video ids (downloading %d of them)' %
                     (ie_result['extractor'], playlist, n_all_entries, n_entries))
+            elif lazy:
+                if isinstance(ie_entries, PagedList):
+                    if playlistitems:
+                        entries = ie_entries.iteritems([i - 1 for i in playlistitems])
+                    else:
+                        entries = ie_entries.iterslice(playliststart, playlistend)
+                elif playlistitems:
+                    wanted = set(playlistitems)
+                    entries = (
+                        entry for i, entry in enumerate(
+                            itertools.islice(ie_entries, playlistitems[-1]), 1)
+                        if i in wanted)
+                else:
+                    entries = itertools.islice(ie_entries, playliststart, playlistend)
+                n_entries = None
+                self.to_screen(
+                    '[%s] playlist %s: Downloading the videos as they are listed' %
+                    (ie_result['extractor'], playlist))
             elif isinstance(ie_entries, PagedList):
                 if playlistitems:
-                    entries = []
-                    for item in playlistitems:
-                        entries.extend(ie_entries.getslice(
-                            item - 1, item
-                        ))
+                    # Every page is fetched once
+                    entries = ie_entries.getitems([i - 1 for i in playlistitems])
                 else:
                     entries = ie_entries.getslice(
                         playliststart, playlistend)
@@ -830,29 +996,61 @@ class YoutubeDL(object):
             if self.params.get('playlistreverse', False):
                 entries = entries[::-1]
 
-            for i, entry in enumerate(entries, 1):
-                self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
-                extra = {
-                    'n_entries': n_entries,
-                    'playlist': playlist,
-                    'playlist_id': ie_result.get('id'),
-                    'playlist_title': ie_result.get('title'),
-                    'playlist_index': i + playliststart,
-                    'extractor': ie_result['extractor'],
-                    'webpage_url': ie_result['webpage_url'],
-                    'webpage_url_basename': url_basename(ie_result['webpage_url']),
-                    'extractor_key': ie_result['extractor_key'],
-                }
-
-                reason = self._match_entry(entry, incomplete=True)
-                if reason is not None:
-                    self.to_screen('[download] ' + reason)
-                    continue
+            # The extractors of the next entries run in parallel while an
+            # entry is being processed and downloaded
+            concurrency = int_or_none(self.params.get('concurrent_extractions')) or 1
+            prefetched = None
+            if concurrency > 1 and n_entries != 1:
+                prefetched = parallel_map(self._prefetch_entry, entries, concurrency)
+
+                def entries_with_results():
+                    for result, err in prefetched:
+                        if err is not None:
+                            # Raised while getting the entry
+                            raise err
+                        yield result
+            else:
+                def entries_with_results():
+                    for entry in entries:
+                        yield entry, None
+
+            try:
+                for i, (entry, prefetched_entry) in enumerate(entries_with_results(), 1):
+                    if n_entries is None:
+                        self.to_screen('[download] Downloading video %s' % i)
+                    else:
+                        self.to_screen('[download] Downloading video %s of %s' % (i, n_entries))
+                    extra = {
+                        'n_entries': n_entries,
+                        'playlist': playlist,
+                        'playlist_id': ie_result.get('id'),
+                        'playlist_title': ie_result.get('title'),
+                        'playlist_index': i + playliststart,
+                        'extractor': ie_result['extractor'],
+                        'webpage_url': ie_result['webpage_url'],
+                        'webpage_url_basename': url_basename(ie_result['webpage_url']),
+                        'extractor_key': ie_result['extractor_key'],
+                    }
 
-                entry_result = self.process_ie_result(entry,
-                                                      download=download,
-                                                      extra_info=extra)
-                playlist_results.append(entry_result)
+                    reason = self._match_entry(entry, incomplete=True)
+                    if reason is not None:
+                        self.to_screen('[download] ' + reason)
+                        continue
+
+                    if prefetched_entry is not None:
+                        key, result = prefetched_entry
+                        self._prefetched_info[key] = result
+                    try:
+                        entry_result = self.process_ie_result(entry,
+                                                              download=download,
+                                                              extra_info=extra)
+                    finally:
+                        if prefetched_entry is not None:
+                            self._prefetched_info.pop(key, None)
+                    playlist_results.append(entry_result)
+            finally:
+                if prefetched is not None:
+                    prefetched.close()
             ie_result['entries'] = playlist_results
             self.to_screen('[download] Finished downloading playlist: %s' % playlist)
             return ie_result
@@ -1768,6 +1966,10 @@ class YoutubeDL(object):
                 self.params.get('max_downloads') != 1):
             raise SameFileError(outtmpl)
 
+        concurrency = int_or_none(self.params.get('concurrent_extractions')) or 1
+        if concurrency > 1 and len(url_list) > 1:
+            return self._download_concurrently(url_list, concurrency)
+
         for url in url_list:
             try:
                 # It also downloads the videos
@@ -1784,6 +1986,49 @@ class YoutubeDL(object):
 
         return self._download_retcode
 
+    def _extract_buffered(self, url):
+        """Run the extractor for url, returning its result and output
+
+        The messages are collected to be printed when the main thread gets
+        to url, so that the output is the same as with serial extraction.
+        """
+        self._output_buffer.output = output = []
+        try:
+            ie_result = self.extract_info(
+                url, download=False, process=False,
+                force_generic_extractor=self.params.get('force_generic_extractor', False))
+        except Exception as err:
+            return None, output, err
+        finally:
+            self._output_buffer.output = None
+        return ie_result, output, None
+
+    def _download_concurrently(self, url_list, concurrency):
+        # Only the extractors run in the worker threads, the results are
+        # processed (which includes the downloads) here one at a time
+        results = parallel_map(self._extract_buffered, url_list, concurrency)
+        try:
+            for (ie_result, output, err), _ in results:
+                self._replay_output(output)
+                try:
+                    if err is not None:
+                        raise err
+                    res = ie_result
+                    if ie_result is not None:
+                        res = self.process_ie_result(ie_result, download=True)
+                except UnavailableVideoError:
+                    self.report_error('unable to download video')
+                except MaxDownloadsReached:
+                    self.to_screen('[info] Maximum number of downloaded files reached.')
+                    raise
+                else:
+                    if self.params.get('dump_single_json', False):
+                        self.to_stdout(json.dumps(res))
+        finally:
+            results.close()
+
+        return self._download_retcode
+
     def download_with_info_file(self, info_filename):
         with contextlib.closing(fileinput.FileInput(
                 [info_filename], mode='r',
@@ -1840,6 +2085,13 @@ class YoutubeDL(object):
             return None  # Incomplete video information
         return extractor.lower() + ' ' + info_dict['id']
 
+    def _get_download_archive(self, fn):
+        with self._archive_lock:
+            if self._download_archive is None:
+                self._download_archive = open_download_archive(
+                    fn, self.params.get('download_archive_format'))
+            return self._download_archive
+
     def in_download_archive(self, info_dict):
         fn = self.params.get('download_archive')
         if fn is None:
@@ -1849,15 +2101,7 @@ class YoutubeDL(object):
         if vid_id is None:
             return False  # Incomplete video information
 
-        try:
-            with locked_file(fn, 'r', encoding='utf-8') as archive_file:
-                for line in archive_file:
-                    if line.strip() == vid_id:
-                        return True
-        except IOError as ioe:
-            if ioe.errno != errno.ENOENT:
-                raise
-        return False
+        return vid_id in self._get_download_archive(fn)
 
     def record_download_archive(self, info_dict):
         fn = self.params.get('download_archive')
@@ -1865,8 +2109,7 @@ class YoutubeDL(object):
             return
         vid_id = self._make_archive_id(info_dict)
         assert vid_id
-        with locked_file(fn, 'a', encoding='utf-8') as archive_file:
-            archive_file.write(vid_id + '\n')
+        self._get_download_archive(fn).add(vid_id)
 
     @staticmethod
     def format_resolution(format, default='unknown'):
@@ -26,6 +26,7 @@ from .utils import (
     decodeOption,
     DEFAULT_OUTTMPL,
     DownloadError,
+    error_to_compat_str,
     match_filter_func,
     MaxDownloadsReached,
     preferredencoding,
@@ -35,6 +36,7 @@ from .utils import (
     std_headers,
     write_string,
 )
+from .archive import open_download_archive
 from .update import update_self
 from .downloader import (
     FileDownloader,
@@ -135,6 +137,25 @@ def _real_main(argv=None):
         if numeric_limit is None:
             parser.error('invalid rate limit specified')
         opts.ratelimit = numeric_limit
+    host_ratelimits = {}
+    for host_ratelimit in opts.host_ratelimits:
+        host, _, limit = host_ratelimit.partition('=')
+        numeric_limit = FileDownloader.parse_bytes(limit)
+        if not host or numeric_limit is None:
+            parser.error('invalid host rate limit specified')
+        host_ratelimits[host] = numeric_limit
+    http_cache_ttl = {}
+    for ttl in opts.http_cache_ttl:
+        ie_key, _, seconds = ttl.rpartition(':')
+        try:
+            http_cache_ttl[ie_key.lower() or 'default'] = float(seconds)
+        except ValueError:
+            parser.error('invalid HTTP cache TTL specified')
+    if opts.http_cache_max_size is not None:
+        numeric_limit = FileDownloader.parse_bytes(opts.http_cache_max_size)
+        if numeric_limit is None:
+            parser.error('invalid HTTP cache size specified')
+        opts.http_cache_max_size = numeric_limit
     if opts.min_filesize is not None:
         numeric_limit = FileDownloader.parse_bytes(opts.min_filesize)
         if numeric_limit is None:
@@ -159,6 +180,18 @@ def _real_main(argv=None):
         opts.retries = parse_retries(opts.retries)
     if opts.fragment_retries is not None:
         opts.fragment_retries = parse_retries(opts.fragment_retries)
+    if opts.concurrent_fragment_downloads is not None and opts.concurrent_fragment_downloads <= 0:
+        parser.error('concurrent fragments must be positive')
+    if opts.concurrent_extractions is not None and opts.concurrent_extractions <= 0:
+        parser.error('concurrent extractions must be positive')
+    if opts.concurrent_pages is not None and opts.concurrent_pages <= 0:
+        parser.error('concurrent pages must be positive')
+    if opts.download_archive_format not in ('text', 'sqlite'):
+        parser.error('invalid download archive format specified')
+    if opts.http_connections is not None and opts.http_connections <= 0:
+        parser.error('HTTP connections must be positive')
+    if opts.progress_rate is not None and opts.progress_rate < 0:
+        parser.error('progress rate must not be negative')
     if opts.buffersize is not None:
         numeric_buffersize = FileDownloader.parse_bytes(opts.buffersize)
         if numeric_buffersize is None:
@@ -212,6 +245,11 @@ def _real_main(argv=None):
     any_getting = opts.geturl or opts.gettitle or opts.getid or opts.getthumbnail or opts.getdescription or opts.getfilename or opts.getformat or opts.getduration or opts.dumpjson or opts.dump_single_json
     any_printing = opts.print_json
     download_archive_fn = compat_expanduser(opts.download_archive) if opts.download_archive is not None else opts.download_archive
+    if download_archive_fn is not None and opts.download_archive_format == 'sqlite':
+        try:
+            open_download_archive(download_archive_fn, 'sqlite').close()
+        except (ImportError, ValueError) as err:
+            parser.error(error_to_compat_str(err))
 
     # PostProcessors
     postprocessors = []
@@ -305,17 +343,23 @@ def _real_main(argv=None):
         'ignoreerrors': opts.ignoreerrors,
         'force_generic_extractor': opts.force_generic_extractor,
         'ratelimit': opts.ratelimit,
+        'host_ratelimits': host_ratelimits,
         'nooverwrites': opts.nooverwrites,
         'retries': opts.retries,
         'fragment_retries': opts.fragment_retries,
+        'concurrent_fragment_downloads': opts.concurrent_fragment_downloads,
+        'http_connections': opts.http_connections,
         'buffersize': opts.buffersize,
         'noresizebuffer': opts.noresizebuffer,
         'continuedl': opts.continue_dl,
         'noprogress': opts.noprogress,
         'progress_with_newline': opts.progress_with_newline,
+        'progress_rate': opts.progress_rate,
         'playliststart': opts.playliststart,
         'playlistend': opts.playlistend,
         'playlistreverse': opts.playlist_reverse,
+        'lazy_playlist': opts.lazy_playlist,
+        'concurrent_pages': opts.concurrent_pages,
         'noplaylist': opts.noplaylist,
         'logtostderr': opts.outtmpl == '-',
         'consoletitle': opts.consoletitle,
@@ -335,6 +379,7 @@ def _real_main(argv=None):
         'matchtitle': decodeOption(opts.matchtitle),
         'rejecttitle': decodeOption(opts.rejecttitle),
         'max_downloads': opts.max_downloads,
+        'concurrent_extractions': opts.concurrent_extractions,
         'prefer_free_formats': opts.prefer_free_formats,
         'verbose': opts.verbose,
         'dump_intermediate_pages': opts.dump_intermediate_pages,
@@ -347,9 +392,13 @@ def _real_main(argv=None):
         'max_views': opts.max_views,
         'daterange': date,
         'cachedir': opts.cachedir,
+        'http_cache': opts.http_cache,
+        'http_cache_ttl': http_cache_ttl,
+        'http_cache_max_size': opts.http_cache_max_size,
         'youtube_print_sig_code': opts.youtube_print_sig_code,
         'age_limit': opts.age_limit,
         'download_archive': download_archive_fn,
+        'download_archive_format': opts.download_archive_format,
         'cookiefile': opts.cookiefile,
         'nocheckcertificate': opts.no_check_certificate,
         'prefer_insecure': opts.prefer_insecure,
@@ -1,10 +1,20 @@
 from __future__ import unicode_literals
 
 import base64
+import sys
 from math import ceil
 
+from .compat import (
+    compat_struct_pack,
+    compat_struct_unpack,
+)
 from .utils import bytes_to_intlist, intlist_to_bytes
 
+try:
+    from Crypto.Cipher import AES as _CryptoAES
+except ImportError:
+    _CryptoAES = None
+
 BLOCK_SIZE_BYTES = 16
 
 
@@ -18,20 +28,14 @@ def aes_ctr_decrypt(data, key, counter):
                                returns the next counter block
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
+    round_keys = _encryption_round_keys(key)
     block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
 
-    decrypted_data = []
-    for i in range(block_count):
-        counter_block = counter.next_value()
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
-
-        cipher_counter_block = aes_encrypt(counter_block, expanded_key)
-        decrypted_data += xor(block, cipher_counter_block)
-    decrypted_data = decrypted_data[:len(data)]
+    counter_blocks = b''.join(
+        intlist_to_bytes(counter.next_value()) for _ in range(block_count))
+    key_stream = _from_words(_encrypt_words(_to_words(counter_blocks), round_keys))
 
-    return decrypted_data
+    return [x ^ y for x, y in zip(data, bytes_to_intlist(key_stream))]
 
 
 def aes_cbc_decrypt(data, key, iv):
@@ -43,21 +47,40 @@ def aes_cbc_decrypt(data, key, iv):
     @param {int[]} iv          16-Byte IV
     @returns {int[]}           decrypted data
     """
-    expanded_key = key_expansion(key)
-    block_count = int(ceil(float(len(data)) / BLOCK_SIZE_BYTES))
+    decrypted_data = aes_cbc_decrypt_bytes(
+        intlist_to_bytes(data), intlist_to_bytes(key), intlist_to_bytes(iv))
+
+    return bytes_to_intlist(decrypted_data)
 
-    decrypted_data = []
-    previous_cipher_block = iv
-    for i in range(block_count):
-        block = data[i * BLOCK_SIZE_BYTES: (i + 1) * BLOCK_SIZE_BYTES]
-        block += [0] * (BLOCK_SIZE_BYTES - len(block))
 
-        decrypted_block = aes_decrypt(block, expanded_key)
-        decrypted_data += xor(decrypted_block, previous_cipher_block)
-        previous_cipher_block = block
-    decrypted_data = decrypted_data[:len(data)]
+def aes_cbc_decrypt_bytes(data, key, iv):
+    """
+    Decrypt with aes in CBC mode, working on bytes
+
+    Uses PyCrypto (or PyCryptodome) when it is installed and a table driven
+    implementation otherwise. A trailing partial block is decrypted as if it
+    was padded with zeros.
+
+    @param {bytes} data        cipher (bytes, bytearray or memoryview)
+    @param {bytes} key         16/24/32-Byte cipher key
+    @param {bytes} iv          16-Byte IV
+    @returns {bytes}           decrypted data
+    """
+    data = _to_bytes(data)
+    key = _to_bytes(key)
+    iv = _to_bytes(iv)
+    data_len = len(data)
+    if data_len % BLOCK_SIZE_BYTES:
+        data += b'\x00' * (BLOCK_SIZE_BYTES - data_len % BLOCK_SIZE_BYTES)
 
-    return decrypted_data
+    if _CryptoAES is not None:
+        return _CryptoAES.new(key, _CryptoAES.MODE_CBC, iv).decrypt(data)[:data_len]
+
+    round_keys = _decryption_round_keys(bytes_to_intlist(key))
+    decrypted_words = _decrypt_words(_to_words(data), round_keys)
+    # CBC: every decrypted block is xored with the previous cipher block
+    chain = _to_words(iv + data[:-BLOCK_SIZE_BYTES])
+    return _from_words([x ^ y for x, y in zip(decrypted_words, chain)])[:data_len]
 
 
 def key_expansion(data):
@@ -318,6 +341,137 @@ def shift_rows_inv(data):
     return data_shifted
 
 
+def _to_bytes(data):
+    if sys.version_info < (3, 0) and not isinstance(data, bytes):
+        # struct can not unpack bytearrays and memoryviews in Python 2
+        return bytes(bytearray(data))
+    return data if isinstance(data, bytes) else bytes(data)
+
+
+def _to_words(data):
+    return compat_struct_unpack('>%dI' % (len(data) // 4), data)
+
+
+def _from_words(words):
+    return compat_struct_pack('>%dI' % len(words), *words)
+
+
+# The T-tables combine SubBytes, ShiftRows and MixColumns (respectively
+# their inverses) into four lookups per column and round, see section 5.2.1
+# of "The Design of Rijndael" by Daemen and Rijmen. They are only built the
+# first time they are needed, and published at once so that other threads
+# never see them partially built.
+_T_TABLES = None
+
+
+def _t_tables():
+    global _T_TABLES
+    if _T_TABLES is None:
+        def mul(a, b):
+            return rijndael_mul(a, b)
+
+        def ror8(w):
+            return ((w >> 8) | (w << 24)) & 0xFFFFFFFF
+
+        te0 = tuple(
+            (mul(s, 2) << 24) | (s << 16) | (s << 8) | mul(s, 3) for s in SBOX)
+        td0 = tuple(
+            (mul(s, 14) << 24) | (mul(s, 9) << 16) | (mul(s, 13) << 8) | mul(s, 11)
+            for s in SBOX_INV)
+        tables = {}
+        for name, t0 in (('te', te0), ('td', td0)):
+            t1 = tuple(ror8(w) for w in t0)
+            t2 = tuple(ror8(w) for w in t1)
+            t3 = tuple(ror8(w) for w in t2)
+            tables[name] = (t0, t1, t2, t3)
+        _T_TABLES = tables
+    return _T_TABLES
+
+
+def _round_key_words(expanded_key):
+    words = _to_words(intlist_to_bytes(expanded_key))
+    return [words[i:i + 4] for i in range(0, len(words), 4)]
+
+
+def _encryption_round_keys(key):
+    return _round_key_words(key_expansion(key))
+
+
+def _decryption_round_keys(key):
+    """
+    Round keys for the equivalent inverse cipher: in reverse order with
+    InvMixColumns applied to all but the first and the last of them
+    """
+    td0, td1, td2, td3 = _t_tables()['td']
+    round_keys = _round_key_words(key_expansion(key))[::-1]
+    for i in range(1, len(round_keys) - 1):
+        round_keys[i] = tuple(
+            td0[SBOX[w >> 24]] ^ td1[SBOX[(w >> 16) & 0xFF]] ^
+            td2[SBOX[(w >> 8) & 0xFF]] ^ td3[SBOX[w & 0xFF]]
+            for w in round_keys[i])
+    return round_keys
+
+
+def _encrypt_words(words, round_keys):
+    """Encrypt the blocks of a sequence of words independently (ECB)"""
+    te0, te1, te2, te3 = _t_tables()['te']
+    sbox = SBOX
+    first_key, last_key = round_keys[0], round_keys[-1]
+    middle_keys = round_keys[1:-1]
+    encrypted = []
+    for i in range(0, len(words), 4):
+        k0, k1, k2, k3 = first_key
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for k0, k1, k2, k3 in middle_keys:
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ k0,
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ k1,
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ k2,
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ k3)
+        # The last round has no MixColumns
+        k0, k1, k2, k3 = last_key
+        encrypted.extend((
+            ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) |
+             (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ k0,
+            ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) |
+             (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ k1,
+            ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) |
+             (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ k2,
+            ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) |
+             (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ k3))
+    return encrypted
+
+
+def _decrypt_words(words, round_keys):
+    """Decrypt the blocks of a sequence of words independently (ECB)"""
+    td0, td1, td2, td3 = _t_tables()['td']
+    sbox_inv = SBOX_INV
+    first_key, last_key = round_keys[0], round_keys[-1]
+    middle_keys = round_keys[1:-1]
+    decrypted = []
+    for i in range(0, len(words), 4):
+        k0, k1, k2, k3 = first_key
+        s0, s1, s2, s3 = words[i] ^ k0, words[i + 1] ^ k1, words[i + 2] ^ k2, words[i + 3] ^ k3
+        for k0, k1, k2, k3 in middle_keys:
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ k0,
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ k1,
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ k2,
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ k3)
+        # The last round has no InvMixColumns
+        k0, k1, k2, k3 = last_key
+        decrypted.extend((
+            ((sbox_inv[s0 >> 24] << 24) | (sbox_inv[(s3 >> 16) & 0xFF] << 16) |
+             (sbox_inv[(s2 >> 8) & 0xFF] << 8) | sbox_inv[s1 & 0xFF]) ^ k0,
+            ((sbox_inv[s1 >> 24] << 24) | (sbox_inv[(s0 >> 16) & 0xFF] << 16) |
+             (sbox_inv[(s3 >> 8) & 0xFF] << 8) | sbox_inv[s2 & 0xFF]) ^ k1,
+            ((sbox_inv[s2 >> 24] << 24) | (sbox_inv[(s1 >> 16) & 0xFF] << 16) |
+             (sbox_inv[(s0 >> 8) & 0xFF] << 8) | sbox_inv[s3 & 0xFF]) ^ k2,
+            ((sbox_inv[s3 >> 24] << 24) | (sbox_inv[(s2 >> 16) & 0xFF] << 16) |
+             (sbox_inv[(s1 >> 8) & 0xFF] << 8) | sbox_inv[s0 & 0xFF]) ^ k3))
+    return decrypted
+
+
 def inc(data):
     data = data[:]  # copy
     for i in range(len(data) - 1, -1, -1):
@@ -328,4 +482,4 @@ def inc(data):
             break
     return data
 
-__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_decrypt_text']
+__all__ = ['aes_encrypt', 'key_expansion', 'aes_ctr_decrypt', 'aes_cbc_decrypt', 'aes_cbc_decrypt_bytes', 'aes_decrypt_text']
@@ -0,0 +1,148 @@
+from __future__ import unicode_literals
+
+import errno
+import os
+import threading
+
+from .utils import locked_file
+
+try:
+    import sqlite3
+except ImportError:  # Python built without SQLite support
+    sqlite3 = None
+
+
+class DownloadArchive(object):
+    """Archive file with one video id per line
+
+    The ids are loaded once into a set. Lines appended by other processes
+    since then are read before every lookup, the file is read again from
+    the start if it was replaced or truncated.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._ids = set()
+        # Identity of the file and length of the part already read
+        self._file_id = None
+        self._offset = 0
+
+    def _update(self):
+        try:
+            st = os.stat(self.fn)
+        except OSError as ose:
+            if ose.errno != errno.ENOENT:
+                raise
+            self._ids, self._file_id, self._offset = set(), None, 0
+            return
+        file_id = (st.st_dev, st.st_ino)
+        if file_id != self._file_id or st.st_size < self._offset:
+            self._ids, self._file_id, self._offset = set(), file_id, 0
+        if st.st_size == self._offset:
+            return
+        with locked_file(self.fn, 'rb') as archive_file:
+            archive_file.seek(self._offset)
+            data = archive_file.read()
+        # The last line may still be incomplete
+        data = data[:data.rfind(b'\n') + 1]
+        self._offset += len(data)
+        self._ids.update(
+            line.strip() for line in data.decode('utf-8').splitlines())
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            self._update()
+            return vid_id in self._ids
+
+    def add(self, vid_id):
+        with self._lock:
+            with locked_file(self.fn, 'a', encoding='utf-8') as archive_file:
+                archive_file.write(vid_id + '\n')
+            self._ids.add(vid_id)
+
+    def close(self):
+        pass
+
+
+class SQLiteDownloadArchive(object):
+    """Archive stored in an SQLite database
+
+    Lookups use the index of the table, new ids are inserted in batches,
+    each of them in a single transaction: when _BATCH_SIZE ids are pending,
+    from a timer _BATCH_INTERVAL seconds after the first of them was added
+    and on close. Until then the pending ids are not seen by other
+    processes, and they are lost if the process crashes.
+    """
+
+    _BATCH_SIZE = 100
+    _BATCH_INTERVAL = 5
+
+    def __init__(self, fn):
+        if sqlite3 is None:
+            raise ImportError('SQLite archives require the sqlite3 module')
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._conn = sqlite3.connect(fn, timeout=60, check_same_thread=False)
+        try:
+            with self._conn:
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS archive (id TEXT PRIMARY KEY NOT NULL)')
+        except sqlite3.DatabaseError:
+            self._conn.close()
+            self._conn = None
+            raise ValueError(
+                '%s is not an SQLite archive. Text archives are used with '
+                '--download-archive-format text' % fn)
+
+    def _write_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO archive (id) VALUES (?)',
+                [(vid_id,) for vid_id in self._pending])
+        self._pending = []
+
+    def _write_pending_on_timer(self):
+        with self._lock:
+            if self._conn is not None:
+                self._write_pending()
+
+    def __contains__(self, vid_id):
+        with self._lock:
+            if vid_id in self._pending:
+                return True
+            return self._conn.execute(
+                'SELECT 1 FROM archive WHERE id = ?', (vid_id,)).fetchone() is not None
+
+    def add(self, vid_id):
+        with self._lock:
+            self._pending.append(vid_id)
+            if len(self._pending) >= self._BATCH_SIZE:
+                self._write_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(
+                    self._BATCH_INTERVAL, self._write_pending_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            self._write_pending()
+            self._conn.close()
+            self._conn = None
+
+
+def open_download_archive(fn, archive_format=None):
+    """Return the archive object for fn, a text file by default"""
+    if archive_format == 'sqlite':
+        return SQLiteDownloadArchive(fn)
+    return DownloadArchive(fn)
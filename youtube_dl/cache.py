@@ -1,15 +1,32 @@
 from __future__ import unicode_literals
 
+import email
 import errno
+import hashlib
 import io
 import json
 import os
 import re
 import shutil
+import sys
+import threading
+import time
 import traceback
 
-from .compat import compat_expanduser, compat_getenv
-from .utils import write_json_file
+from .compat import (
+    compat_expanduser,
+    compat_getenv,
+    compat_http_client,
+    compat_str,
+    compat_urllib_error,
+)
+from .utils import (
+    sanitized_Request,
+    std_headers,
+    unified_timestamp,
+    write_json_file,
+    YoutubeDLHandler,
+)
 
 
 class Cache(object):
@@ -76,6 +93,24 @@ class Cache(object):
 
         return default
 
+    def prune(self, section, max_entries, dtype='json'):
+        """Remove the entries of section but the max_entries stored last"""
+        assert dtype in ('json',)
+
+        if not self.enabled:
+            return
+
+        section_dir = os.path.dirname(self._get_cache_fn(section, 'key', dtype))
+        try:
+            fns = [
+                os.path.join(section_dir, fn) for fn in os.listdir(section_dir)
+                if fn.endswith('.' + dtype)]
+            fns.sort(key=os.path.getmtime, reverse=True)
+            for fn in fns[max_entries:]:
+                os.remove(fn)
+        except OSError:
+            pass  # No cache available or changed by another process
+
     def remove(self):
         if not self.enabled:
             self._ydl.to_screen('Cache is disabled (Did you combine --no-cache-dir and --rm-cache-dir?)')
@@ -91,3 +126,291 @@ class Cache(object):
             self._ydl.to_screen('.', skip_eol=True)
             shutil.rmtree(cachedir)
         self._ydl.to_screen('.')
+
+
+class _CachingReader(io.RawIOBase):
+    """File-like object passing a response through and storing its body
+
+    store is called with the body once it has been read to its end, unless
+    it grew larger than max_size.
+    """
+
+    def __init__(self, fp, max_size, store):
+        self._fp = fp
+        self._max_size = max_size
+        self._store = store
+        self._blocks = []
+        self._size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._fp.read(len(b))
+        n = len(data)
+        b[:n] = data
+        if self._blocks is not None:
+            if n == 0:
+                self._store(b''.join(self._blocks))
+                self._blocks = None
+            elif self._size + n > self._max_size:
+                self._blocks = None
+            else:
+                self._blocks.append(data)
+                self._size += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        io.RawIOBase.close(self)
+
+
+class ResponseCache(object):
+    """Cache of the responses to the requests of the extractors
+
+    The responses to GET requests are stored under <cachedir>/http and used
+    as long as they are fresh according to their Cache-Control and Expires
+    headers, or ttl when given (which ignores those headers). Stale
+    responses with an ETag or Last-Modified header are revalidated with a
+    conditional request. Requests with a Youtubedl-no-cache header bypass
+    the cache. Responses are stored by the URL and all the headers of the
+    request, including the cookies it is sent with, so that they are only
+    used for requests the server would answer the same way whatever header
+    their Vary header names. Responses with "Vary: *" are not stored, and
+    the cookies set by stored responses are not set again when they are
+    used. When the size of the cache exceeds http_cache_max_size, the
+    least recently used responses are evicted.
+    """
+
+    _DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+    # Share of the cache a single response may take
+    _MAX_ENTRY_SHARE = 0.25
+
+    def __init__(self, ydl):
+        self._ydl = ydl
+        self._lock = threading.Lock()
+        # Size and time of the last use of the stored responses by key,
+        # loaded on first use
+        self._entries = None
+
+    @property
+    def enabled(self):
+        return bool(self._ydl.params.get('http_cache')) and self._ydl.cache.enabled
+
+    @property
+    def max_size(self):
+        max_size = self._ydl.params.get('http_cache_max_size')
+        return self._DEFAULT_MAX_SIZE if max_size is None else max_size
+
+    def _get_root_dir(self):
+        return os.path.join(self._ydl.cache._get_root_dir(), 'http')
+
+    def _get_fn(self, key, ext):
+        return os.path.join(self._get_root_dir(), '%s.%s' % (key, ext))
+
+    def _request_key(self, req):
+        # The headers are those the request is going to be sent with
+        headers = dict((k.lower(), v) for k, v in std_headers.items())
+        headers.update(
+            (k.lower(), v) for k, v in req.header_items()
+            if not k.lower().startswith(('youtubedl-', 'ytdl-')))
+        cookie_req = sanitized_Request(req.get_full_url())
+        self._ydl.cookiejar.add_cookie_header(cookie_req)
+        if cookie_req.has_header('Cookie'):
+            headers['cookie'] = cookie_req.get_header('Cookie')
+        key = json.dumps([req.get_full_url(), sorted(headers.items())])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _is_cacheable(req):
+        return (
+            req.get_method() == 'GET' and req.data is None and
+            not req.has_header('Range') and
+            not req.has_header('Youtubedl-no-cache'))
+
+    @staticmethod
+    def _max_age(headers):
+        """Freshness lifetime of a response from its headers, None if it must
+        not be stored"""
+        cache_control = ','.join(
+            headers.get_all('Cache-Control', []) if hasattr(headers, 'get_all')
+            else headers.getheaders('Cache-Control')).lower()
+        directives = dict(
+            (d.partition('=')[0].strip(), d.partition('=')[2].strip().strip('"'))
+            for d in cache_control.split(','))
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        if 'max-age' in directives:
+            try:
+                return max(int(directives['max-age']), 0)
+            except ValueError:
+                return 0
+        expires = unified_timestamp(headers.get('Expires'))
+        if expires is None:
+            return 0
+        date = unified_timestamp(headers.get('Date'))
+        return max(expires - (date if date is not None else time.time()), 0)
+
+    @staticmethod
+    def _make_headers(header_list):
+        header_text = ''.join('%s: %s\r\n' % (k, v) for k, v in header_list) + '\r\n'
+        if sys.version_info < (3, 0):
+            return compat_http_client.HTTPMessage(io.BytesIO(header_text.encode('latin-1')))
+        return email.message_from_string(header_text, _class=compat_http_client.HTTPMessage)
+
+    def _load_entries(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        try:
+            fns = os.listdir(self._get_root_dir())
+        except OSError:
+            return
+        for fn in fns:
+            key, ext = os.path.splitext(fn)
+            if ext != '.json':
+                continue
+            try:
+                meta_fn = self._get_fn(key, 'json')
+                size = os.path.getsize(meta_fn) + os.path.getsize(self._get_fn(key, 'bin'))
+                self._entries[key] = [size, os.path.getmtime(meta_fn)]
+            except OSError:
+                continue
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        for ext in ('json', 'bin'):
+            try:
+                os.remove(self._get_fn(key, ext))
+            except OSError:
+                pass
+
+    def _load(self, key):
+        try:
+            with io.open(self._get_fn(key, 'json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._get_fn(key, 'bin'), 'rb') as f:
+                body = f.read()
+        except (IOError, OSError, ValueError):
+            return None, None
+        if len(body) != meta.get('size'):
+            return None, None
+        return meta, body
+
+    def _touch(self, key):
+        now = time.time()
+        with self._lock:
+            self._load_entries()
+            if key in self._entries:
+                self._entries[key][1] = now
+        try:
+            os.utime(self._get_fn(key, 'json'), (now, now))
+        except OSError:
+            pass
+
+    def _store(self, key, meta, body, write_body=True):
+        meta = dict(meta, size=len(body))
+        body_fn = self._get_fn(key, 'bin')
+        try:
+            try:
+                os.makedirs(self._get_root_dir())
+            except OSError as ose:
+                if ose.errno != errno.EEXIST:
+                    raise
+            if write_body:
+                with open(body_fn + '.part', 'wb') as f:
+                    f.write(body)
+                if os.path.exists(body_fn):
+                    os.remove(body_fn)
+                os.rename(body_fn + '.part', body_fn)
+            write_json_file(meta, self._get_fn(key, 'json'))
+        except (IOError, OSError):
+            tb = traceback.format_exc()
+            self._ydl.report_warning(
+                'Writing response to the cache failed: %s' % tb)
+            return
+        with self._lock:
+            self._load_entries()
+            self._entries[key] = [len(body) + os.path.getsize(self._get_fn(key, 'json')), time.time()]
+            total_size = sum(size for size, _ in self._entries.values())
+            for old_key, (size, _) in sorted(
+                    self._entries.items(), key=lambda entry: entry[1][1]):
+                if total_size <= self.max_size:
+                    break
+                self._remove(old_key)
+                total_size -= size
+
+    def _cached_response(self, meta, body):
+        headers = self._make_headers(meta['headers'])
+        return YoutubeDLHandler.addinfourl_wrapper(
+            io.BytesIO(body), headers, meta['url'], meta['status'])
+
+    def urlopen(self, req, ttl=None):
+        """Like YoutubeDL.urlopen, using the cache if it is enabled
+
+        ttl is the number of seconds responses are considered fresh for,
+        None to follow their headers.
+        """
+        if isinstance(req, compat_str):
+            req = sanitized_Request(req)
+        if not self.enabled or ttl == 0 or not self._is_cacheable(req):
+            return self._ydl.urlopen(req)
+
+        key = self._request_key(req)
+        meta, body = self._load(key)
+        now = time.time()
+        conditional_req = req
+        if meta is not None:
+            max_age = meta['max_age'] if ttl is None else ttl
+            if now - meta['stored'] < max_age:
+                self._touch(key)
+                return self._cached_response(meta, body)
+            validators = {}
+            if meta.get('etag'):
+                validators['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                validators['If-Modified-Since'] = meta['last_modified']
+            if validators:
+                conditional_req = sanitized_Request(
+                    req.get_full_url(), None, dict(req.header_items(), **validators))
+
+        try:
+            resp = self._ydl.urlopen(conditional_req)
+        except compat_urllib_error.HTTPError as err:
+            if err.code != 304 or conditional_req is req:
+                raise
+            # Not modified, the cached response is fresh again
+            max_age = self._max_age(err.info())
+            meta = dict(meta, stored=now, max_age=max_age or 0)
+            self._store(key, meta, body, write_body=False)
+            return self._cached_response(meta, body)
+
+        headers = resp.info()
+        max_age = self._max_age(headers)
+        if resp.getcode() != 200 or headers.get('Vary', '').strip() == '*' or (ttl is None and (
+                max_age is None or
+                (not max_age and not headers.get('ETag') and not headers.get('Last-Modified')))):
+            return resp
+
+        meta = {
+            'url': resp.geturl(),
+            'status': resp.getcode(),
+            # The cookies were set by the original response
+            'headers': [
+                (k, v) for k, v in headers.items()
+                if k.lower() not in ('set-cookie', 'set-cookie2')],
+            'stored': now,
+            'max_age': max_age or 0,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
+        stream = io.BufferedReader(_CachingReader(
+            resp, self.max_size * self._MAX_ENTRY_SHARE,
+            lambda body: self._store(key, meta, body)))
+        cached_resp = YoutubeDLHandler.addinfourl_wrapper(
+            stream, headers, resp.geturl(), resp.getcode())
+        cached_resp.msg = resp.msg
+        return cached_resp
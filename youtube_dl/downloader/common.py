@@ -11,6 +11,7 @@ from ..utils import (
     error_to_compat_str,
     decodeArgument,
     format_bytes,
+    RateLimiter,
     timeconvert,
 )
 
@@ -29,12 +30,17 @@ class FileDownloader(object):
 
     verbose:            Print additional info to stdout.
     quiet:              Do not print messages to stdout.
-    ratelimit:          Download speed limit, in bytes/sec.
+    ratelimit:          Download speed limit, in bytes/sec. The rate limiter
+                        of ydl is used instead if it has one.
     retries:            Number of times to retry for HTTP error 5xx
     buffersize:         Size of download buffer in bytes.
     noresizebuffer:     Do not automatically resize the download buffer.
     continuedl:         Try to continue downloads if possible.
     noprogress:         Do not print the progress bar.
+    progress_rate:      Maximum number of progress updates per second, 0 for
+                        no limit (default is 10). Updates in between are
+                        dropped, the last one is delivered before the next
+                        update of another status than "downloading".
     logtostderr:        Log messages to stderr instead of stdout.
     consoletitle:       Display progress in console window's titlebar.
     nopart:             Do not use temporary .part files.
@@ -52,6 +58,7 @@ class FileDownloader(object):
     """
 
     _TEST_FILE_SIZE = 10241
+    _DEFAULT_PROGRESS_RATE = 10
     params = None
 
     def __init__(self, ydl, params):
@@ -60,6 +67,13 @@ class FileDownloader(object):
         self._progress_hooks = []
         self.params = params
         self.add_progress_hook(self.report_progress)
+        self.rate_limiter = getattr(ydl, 'rate_limiter', None)
+        if self.rate_limiter is None and params.get('ratelimit'):
+            self.rate_limiter = RateLimiter(params['ratelimit'])
+        # Time before which "downloading" updates are not dispatched
+        self._progress_next_update = 0
+        # Last "downloading" update that was not dispatched
+        self._progress_pending = None
 
     @staticmethod
     def format_seconds(seconds):
@@ -174,6 +188,11 @@ class FileDownloader(object):
         if speed > rate_limit:
             time.sleep(max((byte_counter // rate_limit) - elapsed, 0))
 
+    def consume_bandwidth(self, byte_count, host=None):
+        """Sleep until the rate limit allows to receive byte_count bytes more"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.consume(byte_count, host)
+
     def temp_name(self, filename):
         """Returns a temporary filename for the given filename."""
         if self.params.get('nopart', False) or filename == '-' or \
@@ -181,6 +200,10 @@ class FileDownloader(object):
             return filename
         return filename + '.part'
 
+    def ytdl_filename(self, filename):
+        """Returns the name of the file storing the state of a download"""
+        return filename + '.ytdl'
+
     def undo_temp_name(self, filename):
         if filename.endswith('.part'):
             return filename[:-len('.part')]
@@ -354,6 +377,22 @@ class FileDownloader(object):
         raise NotImplementedError('This method must be implemented by subclasses')
 
     def _hook_progress(self, status):
+        if status.get('status') == 'downloading':
+            rate = self.params.get('progress_rate')
+            if rate is None:
+                rate = self._DEFAULT_PROGRESS_RATE
+            if rate > 0:
+                now = time.time()
+                if now < self._progress_next_update:
+                    self._progress_pending = status
+                    return
+                self._progress_next_update = now + 1.0 / rate
+        elif self._progress_pending is not None:
+            self._dispatch_progress(self._progress_pending)
+        self._progress_pending = None
+        self._dispatch_progress(status)
+
+    def _dispatch_progress(self, status):
         for ph in self._progress_hooks:
             ph(status)
 
@@ -15,17 +15,45 @@ from ..utils import (
     cli_configuration_args,
     encodeFilename,
     encodeArgument,
+    format_bytes,
     handle_youtubedl_headers,
     check_executable,
+    RateLimiter,
 )
 
 
 class ExternalFD(FileDownloader):
+    # Command line option limiting the download rate, None if there is none
+    _RATELIMIT_OPTION = None
+    # Rate reserved for the running download, in bytes/sec
+    _ratelimit = None
+
     def real_download(self, filename, info_dict):
         self.report_destination(filename)
         tmpfilename = self.temp_name(filename)
 
-        retval = self._call_downloader(tmpfilename, info_dict)
+        host = RateLimiter.host_of(info_dict['url'])
+        rate_limiter = self.rate_limiter
+        if rate_limiter is not None and self._RATELIMIT_OPTION is None:
+            # The download could not be held to its share of the rate
+            if rate_limiter.is_limited(host):
+                self.report_warning(
+                    '%s does not support rate limiting, the download rate '
+                    'is not limited' % self.get_basename())
+            rate_limiter = None
+        if rate_limiter is not None:
+            self._ratelimit = rate_limiter.reserve(host)
+            if self._ratelimit is not None:
+                # The share may be far below the limit if other downloads
+                # are running
+                self.to_screen('[%s] Limiting the download rate to %s/s' % (
+                    self.get_basename(), format_bytes(self._ratelimit)))
+        try:
+            retval = self._call_downloader(tmpfilename, info_dict)
+        finally:
+            if rate_limiter is not None:
+                rate_limiter.release(self._ratelimit, host)
+                self._ratelimit = None
         if retval == 0:
             fsize = os.path.getsize(encodeFilename(tmpfilename))
             self.to_screen('\r[%s] Downloaded %s bytes' % (self.get_basename(), fsize))
@@ -72,6 +100,11 @@ class ExternalFD(FileDownloader):
     def _valueless_option(self, command_option, param, expected_value=True):
         return cli_valueless_option(self.params, command_option, param, expected_value)
 
+    def _ratelimit_option(self):
+        if self._ratelimit is None:
+            return []
+        return [self._RATELIMIT_OPTION, '%d' % max(self._ratelimit, 1)]
+
     def _configuration_args(self, default=[]):
         return cli_configuration_args(self.params, 'external_downloader_args', default)
 
@@ -91,6 +124,7 @@ class ExternalFD(FileDownloader):
 
 class CurlFD(ExternalFD):
     AVAILABLE_OPT = '-V'
+    _RATELIMIT_OPTION = '--limit-rate'
 
     def _make_cmd(self, tmpfilename, info_dict):
         cmd = [self.exe, '--location', '-o', tmpfilename]
@@ -99,6 +133,7 @@ class CurlFD(ExternalFD):
         cmd += self._option('--interface', 'source_address')
         cmd += self._option('--proxy', 'proxy')
         cmd += self._valueless_option('--insecure', 'nocheckcertificate')
+        cmd += self._ratelimit_option()
         cmd += self._configuration_args()
         cmd += ['--', info_dict['url']]
         return cmd
@@ -106,11 +141,13 @@ class CurlFD(ExternalFD):
 
 class AxelFD(ExternalFD):
     AVAILABLE_OPT = '-V'
+    _RATELIMIT_OPTION = '--max-speed'
 
     def _make_cmd(self, tmpfilename, info_dict):
         cmd = [self.exe, '-o', tmpfilename]
         for key, val in info_dict['http_headers'].items():
             cmd += ['-H', '%s: %s' % (key, val)]
+        cmd += self._ratelimit_option()
         cmd += self._configuration_args()
         cmd += ['--', info_dict['url']]
         return cmd
@@ -118,6 +155,7 @@ class AxelFD(ExternalFD):
 
 class WgetFD(ExternalFD):
     AVAILABLE_OPT = '--version'
+    _RATELIMIT_OPTION = '--limit-rate'
 
     def _make_cmd(self, tmpfilename, info_dict):
         cmd = [self.exe, '-O', tmpfilename, '-nv', '--no-cookies']
@@ -126,6 +164,7 @@ class WgetFD(ExternalFD):
         cmd += self._option('--bind-address', 'source_address')
         cmd += self._option('--proxy', 'proxy')
         cmd += self._valueless_option('--no-check-certificate', 'nocheckcertificate')
+        cmd += self._ratelimit_option()
         cmd += self._configuration_args()
         cmd += ['--', info_dict['url']]
         return cmd
@@ -133,6 +172,7 @@ class WgetFD(ExternalFD):
 
 class Aria2cFD(ExternalFD):
     AVAILABLE_OPT = '-v'
+    _RATELIMIT_OPTION = '--max-download-limit'
 
     def _make_cmd(self, tmpfilename, info_dict):
         cmd = [self.exe, '-c']
@@ -147,6 +187,7 @@ class Aria2cFD(ExternalFD):
         cmd += self._option('--interface', 'source_address')
         cmd += self._option('--all-proxy', 'proxy')
         cmd += self._bool_option('--check-certificate', 'nocheckcertificate', 'false', 'true', '=')
+        cmd += self._ratelimit_option()
         cmd += ['--', info_dict['url']]
         return cmd
 
@@ -3,7 +3,6 @@ from __future__ import division, unicode_literals
 import base64
 import io
 import itertools
-import os
 import time
 
 from .fragment import FragmentFD
@@ -16,9 +15,7 @@ from ..compat import (
     compat_struct_unpack,
 )
 from ..utils import (
-    encodeFilename,
     fix_xml_ampersands,
-    sanitize_open,
     xpath_text,
 )
 
@@ -359,23 +356,26 @@ class F4mFD(FragmentFD):
             'filename': filename,
             'total_frags': total_frags,
             'live': live,
+            'manifest_url': base_url,
         }
 
         self._prepare_frag_download(ctx)
 
         dest_stream = ctx['dest_stream']
 
-        write_flv_header(dest_stream)
-        if not live:
-            write_metadata_tag(dest_stream, metadata)
+        if ctx['fragment_index']:
+            # The headers were written before the download was interrupted
+            fragments_list = fragments_list[ctx['fragment_index']:]
+        else:
+            write_flv_header(dest_stream)
+            if not live:
+                write_metadata_tag(dest_stream, metadata)
 
         base_url_parsed = compat_urllib_parse_urlparse(base_url)
 
         self._start_frag_download(ctx)
 
-        frags_filenames = []
-        while fragments_list:
-            seg_i, frag_i = fragments_list.pop(0)
+        def build_fragment(seg_i, frag_i):
             name = 'Seg%d-Frag%d' % (seg_i, frag_i)
             query = []
             if base_url_parsed.query:
@@ -385,54 +385,60 @@ class F4mFD(FragmentFD):
             if info_dict.get('extra_param_to_segment_url'):
                 query.append(info_dict['extra_param_to_segment_url'])
             url_parsed = base_url_parsed._replace(path=base_url_parsed.path + name, query='&'.join(query))
-            frag_filename = '%s-%s' % (ctx['tmpfilename'], name)
-            try:
-                success = ctx['dl'].download(frag_filename, {'url': url_parsed.geturl()})
-                if not success:
-                    return False
-                (down, frag_sanitized) = sanitize_open(frag_filename, 'rb')
-                down_data = down.read()
-                down.close()
-                reader = FlvReader(down_data)
-                while True:
-                    try:
-                        _, box_type, box_data = reader.read_box_info()
-                    except DataTruncatedError:
-                        if test:
-                            # In tests, segments may be truncated, and thus
-                            # FlvReader may not be able to parse the whole
-                            # chunk. If so, write the segment as is
-                            # See https://github.com/rg3/youtube-dl/issues/9214
-                            dest_stream.write(down_data)
-                            break
+            return {
+                'url': url_parsed.geturl(),
+                'name': name,
+                'frag_i': frag_i,
+            }
+
+        try:
+            while fragments_list:
+                fragments = [build_fragment(seg_i, frag_i) for seg_i, frag_i in fragments_list]
+                fragments_list = []
+                # Number of fragments written so far, since fragments are
+                # processed in order this is also the index of the failed one
+                # on error
+                done = 0
+                try:
+                    for frag, down_data in self._download_fragments(ctx, fragments):
+                        if down_data is None:
+                            return False
+                        reader = FlvReader(down_data)
+                        while True:
+                            try:
+                                _, box_type, box_data = reader.read_box_info()
+                            except DataTruncatedError:
+                                if test:
+                                    # In tests, segments may be truncated, and thus
+                                    # FlvReader may not be able to parse the whole
+                                    # chunk. If so, write the segment as is
+                                    # See https://github.com/rg3/youtube-dl/issues/9214
+                                    self._append_fragment(ctx, frag, down_data)
+                                    break
+                                raise
+                            if box_type == b'mdat':
+                                self._append_fragment(ctx, frag, box_data)
+                                break
+                        done += 1
+                except (compat_urllib_error.HTTPError, ) as err:
+                    if live and (err.code == 404 or err.code == 410):
+                        # We didn't keep up with the live window. Continue
+                        # with the next available fragment.
+                        msg = 'Fragment %d unavailable' % fragments[done]['frag_i']
+                        self.report_warning(msg)
+                    else:
                         raise
-                    if box_type == b'mdat':
-                        dest_stream.write(box_data)
-                        break
-                if live:
-                    os.remove(encodeFilename(frag_sanitized))
-                else:
-                    frags_filenames.append(frag_sanitized)
-            except (compat_urllib_error.HTTPError, ) as err:
-                if live and (err.code == 404 or err.code == 410):
-                    # We didn't keep up with the live window. Continue
-                    # with the next available fragment.
-                    msg = 'Fragment %d unavailable' % frag_i
-                    self.report_warning(msg)
-                    fragments_list = []
-                else:
-                    raise
-
-            if not fragments_list and not test and live and bootstrap_url:
-                fragments_list = self._update_live_fragments(bootstrap_url, frag_i)
-                total_frags += len(fragments_list)
-                if fragments_list and (fragments_list[0][1] > frag_i + 1):
-                    msg = 'Missed %d fragments' % (fragments_list[0][1] - (frag_i + 1))
-                    self.report_warning(msg)
+                frag_i = fragments[min(done, len(fragments) - 1)]['frag_i']
 
-        self._finish_frag_download(ctx)
+                if not test and live and bootstrap_url:
+                    fragments_list = self._update_live_fragments(bootstrap_url, frag_i)
+                    total_frags += len(fragments_list)
+                    if fragments_list and (fragments_list[0][1] > frag_i + 1):
+                        msg = 'Missed %d fragments' % (fragments_list[0][1] - (frag_i + 1))
+                        self.report_warning(msg)
+        finally:
+            self._write_resume_state(ctx)
 
-        for frag_file in frags_filenames:
-            os.remove(encodeFilename(frag_file))
+        self._finish_frag_download(ctx)
 
         return True
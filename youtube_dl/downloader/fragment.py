@@ -1,13 +1,21 @@
 from __future__ import division, unicode_literals
 
+import io
+import json
 import os
+import shutil
+import tempfile
+import threading
 import time
 
 from .common import FileDownloader
 from .http import HttpFD
+from ..compat import compat_urllib_error
 from ..utils import (
     encodeFilename,
+    parallel_map,
     sanitize_open,
+    write_json_file,
 )
 
 
@@ -16,15 +24,66 @@ class HttpQuietDownloader(HttpFD):
         pass
 
 
+class FragmentBufferDownloader(HttpQuietDownloader):
+    """
+    Downloads a fragment into a buffer instead of a file.
+
+    The buffer is kept in memory and only spills over to a temporary file
+    once the fragment grows larger than max_size bytes.
+    """
+
+    def __init__(self, ydl, params, max_size):
+        super(FragmentBufferDownloader, self).__init__(ydl, params)
+        self._max_size = max_size
+        self.buffer = None
+
+    def _open_stream(self, tmpfilename, open_mode):
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=self._max_size)
+        return self.buffer, tmpfilename
+
+    def _close_stream(self, stream, tmpfilename):
+        # The buffer is read and closed by the fragment downloader
+        pass
+
+    def get_stream(self):
+        """Return the rewound buffer, the caller has to close it"""
+        buffer, self.buffer = self.buffer, None
+        buffer.seek(0)
+        return buffer
+
+    def get_content(self):
+        buffer = self.get_stream()
+        content = buffer.read()
+        buffer.close()
+        return content
+
+
 class FragmentFD(FileDownloader):
     """
     A base file downloader class for fragmented media (e.g. f4m/m3u8 manifests).
 
+    Unless the download is live, the progress is recorded in a
+    <tmpfilename>.ytdl file so that an interrupted download can be resumed
+    from the first fragment that was not completely written. The file is
+    updated every _RESUME_STATE_FRAGMENTS fragments or
+    _RESUME_STATE_INTERVAL seconds, and when the download stops.
+
     Available options:
 
     fragment_retries:   Number of times to retry a fragment for HTTP error (DASH only)
+    concurrent_fragment_downloads:  Number of fragments to download in parallel
+    fragment_buffer_size:  Fragments up to this size in bytes are kept in
+                        memory, larger ones are buffered in a temporary file.
+                        Set it to 0 to write every fragment to a file next to
+                        the output file. Fragments that have to be processed
+                        before they are written (f4m boxes, encrypted or byte
+                        range HLS fragments) are still loaded into memory.
     """
 
+    _DEFAULT_FRAGMENT_BUFFER_SIZE = 10 * 1024 * 1024
+    _RESUME_STATE_FRAGMENTS = 50
+    _RESUME_STATE_INTERVAL = 5
+
     def report_retry_fragment(self, fragment_name, count, retries):
         self.to_screen(
             '[download] Got server HTTP error. Retrying fragment %s (attempt %d of %s)...'
@@ -34,6 +93,57 @@ class FragmentFD(FileDownloader):
         self._prepare_frag_download(ctx)
         self._start_frag_download(ctx)
 
+    def report_resuming_fragment(self, fragment_index, byte_offset):
+        self.to_screen(
+            '[download] Resuming download at fragment %d (byte %d)'
+            % (fragment_index + 1, byte_offset))
+
+    def _read_resume_state(self, ctx, tmpfilename):
+        """Return the saved state of an interrupted download or None
+
+        The state is only used if it was written for the same manifest and
+        the partially downloaded file holds all the bytes it accounts for.
+        If ctx has 'fragments', the media sequence of the last written
+        fragment has to match as well.
+        """
+        state_filename = encodeFilename(self.ytdl_filename(tmpfilename))
+        if not os.path.isfile(state_filename) or not os.path.isfile(encodeFilename(tmpfilename)):
+            return None
+        try:
+            with io.open(state_filename, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            fragment_index = int(state['fragment_index'])
+            byte_offset = int(state['byte_offset'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            self.report_warning('Unable to read the state of the interrupted download, restarting it')
+            return None
+        if state.get('manifest_url') != ctx['manifest_url']:
+            return None
+        if not 0 < fragment_index <= ctx['total_frags']:
+            return None
+        if os.path.getsize(encodeFilename(tmpfilename)) < byte_offset:
+            return None
+        fragments = ctx.get('fragments')
+        if fragments and fragments[fragment_index - 1].get('media_sequence') != state.get('media_sequence'):
+            return None
+        return state
+
+    def _write_resume_state(self, ctx):
+        """Save the state of the last appended fragment, if not saved yet"""
+        resume_state = ctx.get('resume_state')
+        if not ctx.get('resumable') or resume_state is None:
+            return
+        ctx['resume_state'] = None
+        ctx['resume_state_saved'] = (resume_state['fragment_index'], time.time())
+        try:
+            ctx['dest_stream'].flush()
+            write_json_file(
+                dict(resume_state, manifest_url=ctx['manifest_url']),
+                self.ytdl_filename(ctx['tmpfilename']))
+        except (IOError, OSError) as err:
+            self.report_warning('Unable to save the download state: %s' % err)
+            ctx['resumable'] = False
+
     def _prepare_frag_download(self, ctx):
         if 'live' not in ctx:
             ctx['live'] = False
@@ -41,23 +151,43 @@ class FragmentFD(FileDownloader):
             '[%s] Total fragments: %s'
             % (self.FD_NAME, ctx['total_frags'] if not ctx['live'] else 'unknown (live)'))
         self.report_destination(ctx['filename'])
-        dl = HttpQuietDownloader(
-            self.ydl,
-            {
+        tmpfilename = self.temp_name(ctx['filename'])
+        resumable = (
+            ctx.get('manifest_url') is not None and not ctx['live'] and
+            tmpfilename != '-' and
+            self.params.get('continuedl', True) and
+            not self.params.get('test', False))
+        resume_state = self._read_resume_state(ctx, tmpfilename) if resumable else None
+        if resume_state:
+            fragment_index = resume_state['fragment_index']
+            byte_offset = resume_state['byte_offset']
+            self.report_resuming_fragment(fragment_index, byte_offset)
+            dest_stream, tmpfilename = sanitize_open(tmpfilename, 'r+b')
+            dest_stream.truncate(byte_offset)
+            dest_stream.seek(byte_offset)
+        else:
+            fragment_index = byte_offset = 0
+            dest_stream, tmpfilename = sanitize_open(tmpfilename, 'wb')
+        ctx.update({
+            'dl_params': {
                 'continuedl': True,
                 'quiet': True,
                 'noprogress': True,
                 'ratelimit': self.params.get('ratelimit'),
                 'retries': self.params.get('retries', 0),
                 'test': self.params.get('test', False),
-            }
-        )
-        tmpfilename = self.temp_name(ctx['filename'])
-        dest_stream, tmpfilename = sanitize_open(tmpfilename, 'wb')
-        ctx.update({
-            'dl': dl,
+            },
+            'concurrency': max(int(self.params.get('concurrent_fragment_downloads') or 1), 1),
             'dest_stream': dest_stream,
             'tmpfilename': tmpfilename,
+            'resumable': resumable,
+            # State of the last appended fragment not saved yet, and index
+            # and time of the last save
+            'resume_state': None,
+            'resume_state_saved': (fragment_index, time.time()),
+            # Number of fragments already written to dest_stream and their size
+            'fragment_index': fragment_index,
+            'resumed_bytes': byte_offset,
         })
 
     def _start_frag_download(self, ctx):
@@ -66,8 +196,8 @@ class FragmentFD(FileDownloader):
         # hook
         state = {
             'status': 'downloading',
-            'downloaded_bytes': 0,
-            'frag_index': 0,
+            'downloaded_bytes': ctx['resumed_bytes'],
+            'frag_index': ctx['fragment_index'],
             'frag_count': total_frags,
             'filename': ctx['filename'],
             'tmpfilename': ctx['tmpfilename'],
@@ -77,48 +207,182 @@ class FragmentFD(FileDownloader):
         ctx.update({
             'started': start,
             # Total complete fragments downloaded so far in bytes
-            'complete_frags_downloaded_bytes': 0,
-            # Amount of fragment's bytes downloaded by the time of the previous
-            # frag progress hook invocation
-            'prev_frag_downloaded_bytes': 0,
+            'complete_frags_downloaded_bytes': ctx['resumed_bytes'],
         })
+        # Several fragments may report progress at the same time when they
+        # are downloaded concurrently
+        lock = threading.Lock()
 
-        def frag_progress_hook(s):
+        def frag_progress_hook(s, frag_state):
             if s['status'] not in ('downloading', 'finished'):
                 return
 
-            time_now = time.time()
-            state['elapsed'] = time_now - start
-            frag_total_bytes = s.get('total_bytes') or 0
-            if not ctx['live']:
-                estimated_size = (
-                    (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes) /
-                    (state['frag_index'] + 1) * total_frags)
-                state['total_bytes_estimate'] = estimated_size
-
-            if s['status'] == 'finished':
-                state['frag_index'] += 1
-                state['downloaded_bytes'] += frag_total_bytes - ctx['prev_frag_downloaded_bytes']
-                ctx['complete_frags_downloaded_bytes'] = state['downloaded_bytes']
-                ctx['prev_frag_downloaded_bytes'] = 0
-            else:
-                frag_downloaded_bytes = s['downloaded_bytes']
-                state['downloaded_bytes'] += frag_downloaded_bytes - ctx['prev_frag_downloaded_bytes']
+            with lock:
+                time_now = time.time()
+                state['elapsed'] = time_now - start
+                frag_total_bytes = s.get('total_bytes') or 0
                 if not ctx['live']:
-                    state['eta'] = self.calc_eta(
-                        start, time_now, estimated_size,
-                        state['downloaded_bytes'])
-                state['speed'] = s.get('speed') or ctx.get('speed')
-                ctx['speed'] = state['speed']
-                ctx['prev_frag_downloaded_bytes'] = frag_downloaded_bytes
-            self._hook_progress(state)
+                    estimated_size = (
+                        (ctx['complete_frags_downloaded_bytes'] + frag_total_bytes) /
+                        (state['frag_index'] + 1) * total_frags)
+                    state['total_bytes_estimate'] = estimated_size
 
-        ctx['dl'].add_progress_hook(frag_progress_hook)
+                if s['status'] == 'finished':
+                    state['frag_index'] += frag_state['fragment_count']
+                    state['downloaded_bytes'] += frag_total_bytes - frag_state['downloaded_bytes']
+                    ctx['complete_frags_downloaded_bytes'] += frag_total_bytes
+                    frag_state['downloaded_bytes'] = frag_total_bytes
+                else:
+                    frag_downloaded_bytes = s['downloaded_bytes']
+                    state['downloaded_bytes'] += frag_downloaded_bytes - frag_state['downloaded_bytes']
+                    if not ctx['live']:
+                        state['eta'] = self.calc_eta(
+                            start, time_now, estimated_size,
+                            state['downloaded_bytes'])
+                    if ctx['concurrency'] > 1:
+                        state['speed'] = self.calc_speed(start, time_now, state['downloaded_bytes'])
+                    else:
+                        state['speed'] = s.get('speed') or ctx.get('speed')
+                    ctx['speed'] = state['speed']
+                    frag_state['downloaded_bytes'] = frag_downloaded_bytes
+                self._hook_progress(state)
+
+        ctx['frag_progress_hook'] = frag_progress_hook
 
         return start
 
+    def _download_fragment(self, ctx, frag, fragment_retries=None, as_stream=False):
+        """Download a single fragment and return its content
+
+        frag is a dict with the fragment 'url', a 'name' unique within the
+        download and optionally 'http_headers' and 'fragment_count', the
+        number of fragments the download is made of if it covers several of
+        them (e.g. a merged byte range request). HTTP 404 errors are retried
+        fragment_retries times, unless it is None, in which case they are
+        raised right away. Returns None if the download failed.
+
+        With as_stream, the content of a buffered fragment is returned as a
+        file object positioned at its start, so that fragments that spilled
+        over to a temporary file are not read back into memory at once.
+        """
+        frag_filename = '%s-%s' % (ctx['tmpfilename'], frag['name'])
+        frag_info = {
+            'url': frag['url'],
+            'http_headers': frag.get('http_headers'),
+        }
+        buffer_size = self.params.get('fragment_buffer_size', self._DEFAULT_FRAGMENT_BUFFER_SIZE)
+        count = 0
+        while count <= (fragment_retries or 0):
+            # Every fragment gets its own downloader so that progress of
+            # fragments downloaded in parallel can be told apart
+            if buffer_size:
+                dl = FragmentBufferDownloader(self.ydl, dict(
+                    ctx['dl_params'], continuedl=False, nopart=True), buffer_size)
+            else:
+                dl = HttpQuietDownloader(self.ydl, ctx['dl_params'])
+            # The fragments are limited together
+            dl.rate_limiter = self.rate_limiter
+            frag_state = {
+                'downloaded_bytes': 0,
+                'fragment_count': frag.get('fragment_count', 1),
+            }
+            dl.add_progress_hook(
+                lambda s: ctx['frag_progress_hook'](s, frag_state))
+            try:
+                if buffer_size:
+                    if not dl.real_download(frag_filename, frag_info):
+                        return None
+                    return dl.get_stream() if as_stream else dl.get_content()
+                if not dl.download(frag_filename, frag_info):
+                    return None
+                down, frag_sanitized = sanitize_open(frag_filename, 'rb')
+                frag_content = down.read()
+                down.close()
+                os.remove(encodeFilename(frag_sanitized))
+                return frag_content
+            except (compat_urllib_error.HTTPError, ) as err:
+                # YouTube may often return 404 HTTP error for a fragment causing the
+                # whole download to fail. However if the same fragment is immediately
+                # retried with the same request data this usually succeeds (1-2 attemps
+                # is usually enough) thus allowing to download the whole file successfully.
+                # So, we will retry all fragments that fail with 404 HTTP error for now.
+                if err.code != 404 or fragment_retries is None:
+                    raise
+                # Retry fragment
+                count += 1
+                if count <= fragment_retries:
+                    self.report_retry_fragment(frag['name'], count, fragment_retries)
+        self.report_error('giving up after %s fragment retries' % fragment_retries)
+        return None
+
+    def _download_fragments(self, ctx, fragments, fragment_retries=None, as_stream=False):
+        """Download fragments and yield (frag, frag_content) pairs in order
+
+        With concurrent_fragment_downloads > 1 up to that many fragments are
+        fetched at once by a pool of worker threads, while the fragments are
+        still yielded in the order they appear in fragments. Errors raised
+        while downloading a fragment are re-raised when that fragment is due.
+        frag_content is None if the fragment could not be downloaded. With
+        as_stream it may be a file object, see _download_fragment.
+        """
+        concurrency = min(ctx['concurrency'], len(fragments))
+        if concurrency <= 1:
+            for frag in fragments:
+                yield frag, self._download_fragment(ctx, frag, fragment_retries, as_stream)
+            return
+
+        def discard(frag_content):
+            # Buffers of fragments downloaded ahead when the consumer stops
+            if hasattr(frag_content, 'close'):
+                frag_content.close()
+
+        # The window keeps the workers from running too far ahead of the
+        # consumer, otherwise all downloaded fragments could end up held in
+        # memory
+        results = parallel_map(
+            lambda frag: self._download_fragment(ctx, frag, fragment_retries, as_stream),
+            fragments, concurrency, discard=discard)
+        try:
+            for i, (frag_content, err) in enumerate(results):
+                if err is not None:
+                    raise err
+                yield fragments[i], frag_content
+        finally:
+            results.close()
+
+    def _append_fragment(self, ctx, frag, frag_content):
+        """Write the content of a completely downloaded fragment
+
+        frag_content is either bytes or a file object, which is copied in
+        chunks and closed.
+        """
+        if hasattr(frag_content, 'read'):
+            try:
+                shutil.copyfileobj(frag_content, ctx['dest_stream'])
+            finally:
+                frag_content.close()
+        else:
+            ctx['dest_stream'].write(frag_content)
+        ctx['fragment_index'] += 1
+        if not ctx['resumable']:
+            return
+        # The offset is taken now, a fragment interrupted while it is
+        # being written must not be accounted for
+        ctx['resume_state'] = {
+            'fragment_index': ctx['fragment_index'],
+            'byte_offset': ctx['dest_stream'].tell(),
+            'media_sequence': frag.get('media_sequence'),
+        }
+        saved_index, saved_time = ctx['resume_state_saved']
+        if (ctx['fragment_index'] - saved_index >= self._RESUME_STATE_FRAGMENTS or
+                time.time() - saved_time >= self._RESUME_STATE_INTERVAL):
+            self._write_resume_state(ctx)
+
     def _finish_frag_download(self, ctx):
         ctx['dest_stream'].close()
+        state_filename = encodeFilename(self.ytdl_filename(ctx['tmpfilename']))
+        if os.path.isfile(state_filename):
+            os.remove(state_filename)
         elapsed = time.time() - ctx['started']
         self.try_rename(ctx['tmpfilename'], ctx['filename'])
         fsize = os.path.getsize(encodeFilename(ctx['filename']))
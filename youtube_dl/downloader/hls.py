@@ -1,38 +1,44 @@
 from __future__ import unicode_literals
 
-import os.path
 import re
 import binascii
-try:
-    from Crypto.Cipher import AES
-    can_decrypt_frag = True
-except ImportError:
-    can_decrypt_frag = False
+import time
 
 from .fragment import FragmentFD
 from .external import FFmpegFD
 
+from ..aes import aes_cbc_decrypt_bytes
 from ..compat import (
+    compat_urllib_error,
     compat_urlparse,
     compat_struct_pack,
 )
 from ..utils import (
-    encodeFilename,
-    sanitize_open,
+    float_or_none,
     parse_m3u8_attributes,
 )
 
 
 class HlsFD(FragmentFD):
-    """ A limited implementation that does not require ffmpeg """
+    """ A limited implementation that does not require ffmpeg
+
+    Playlists of streams the extractor reports as live (is_live) are
+    refreshed and their new fragments downloaded until the stream ends.
+    """
 
     FD_NAME = 'hlsnative'
 
+    # Used when a live playlist has no #EXT-X-TARGETDURATION
+    _LIVE_DEFAULT_TARGET_DURATION = 10
+    _LIVE_MAX_UNCHANGED_REFRESHES = 6
+    # Adjacent byte ranges of the same resource are merged into requests of
+    # up to this size
+    _MAX_COALESCED_BYTE_RANGE = 10 * 1024 * 1024
+
     @staticmethod
     def can_download(manifest):
         UNSUPPORTED_FEATURES = (
             r'#EXT-X-KEY:METHOD=(?!NONE|AES-128)',  # encrypted streams [1]
-            r'#EXT-X-BYTERANGE',  # playlists composed of byte ranges of media files [2]
 
             # Live streams heuristic does not always work (e.g. geo restricted to Germany
             # http://hls-geo.daserste.de/i/videoportal/Film/c_620000/622873/format,716451,716457,716450,716458,716459,.mp4.csmil/index_4_av.m3u8?null=0)
@@ -45,13 +51,145 @@ class HlsFD(FragmentFD):
             #                                 # event media playlists [4]
 
             # 1. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.4
-            # 2. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.2.2
             # 3. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.3.2
             # 4. https://tools.ietf.org/html/draft-pantos-http-live-streaming-17#section-4.3.3.5
         )
-        check_results = [not re.search(feature, manifest) for feature in UNSUPPORTED_FEATURES]
-        check_results.append(can_decrypt_frag or '#EXT-X-KEY:METHOD=AES-128' not in manifest)
-        return all(check_results)
+        return all(not re.search(feature, manifest) for feature in UNSUPPORTED_FEATURES)
+
+    def _parse_fragments(self, man_url, s, keys):
+        """Parse a media playlist
+
+        Returns the list of its fragments, the target duration and whether
+        the playlist is complete (#EXT-X-ENDLIST). keys caches the AES-128
+        keys by URI, so that they are not downloaded again on every refresh
+        of a live playlist.
+        """
+        fragments = []
+        media_sequence = 0
+        target_duration = None
+        decrypt_info = {'METHOD': 'NONE'}
+        byte_range = None
+        # End of the last byte range of each resource, where a byte range
+        # without an offset starts
+        byte_range_ends = {}
+        for line in s.splitlines():
+            line = line.strip()
+            if line:
+                if not line.startswith('#'):
+                    frag_url = (
+                        line
+                        if re.match(r'^https?://', line)
+                        else compat_urlparse.urljoin(man_url, line))
+                    frag = {
+                        'url': frag_url,
+                        'name': 'Frag%d' % media_sequence,
+                        'decrypt_info': decrypt_info,
+                        'media_sequence': media_sequence,
+                    }
+                    if byte_range is not None:
+                        length, offset = byte_range
+                        if offset is None:
+                            offset = byte_range_ends.get(frag_url, 0)
+                        frag['byte_range'] = {
+                            'start': offset,
+                            'end': offset + length,
+                        }
+                        byte_range_ends[frag_url] = offset + length
+                        byte_range = None
+                    fragments.append(frag)
+                    media_sequence += 1
+                elif line.startswith('#EXT-X-BYTERANGE'):
+                    mobj = re.match(r'#EXT-X-BYTERANGE:(\d+)(?:@(\d+))?', line)
+                    if mobj:
+                        byte_range = (
+                            int(mobj.group(1)),
+                            int(mobj.group(2)) if mobj.group(2) else None)
+                elif line.startswith('#EXT-X-KEY'):
+                    decrypt_info = parse_m3u8_attributes(line[11:])
+                    if decrypt_info['METHOD'] == 'AES-128':
+                        if 'IV' in decrypt_info:
+                            decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:])
+                        if not re.match(r'^https?://', decrypt_info['URI']):
+                            decrypt_info['URI'] = compat_urlparse.urljoin(
+                                man_url, decrypt_info['URI'])
+                        if decrypt_info['URI'] not in keys:
+                            keys[decrypt_info['URI']] = self.ydl.urlopen(decrypt_info['URI']).read()
+                        decrypt_info['KEY'] = keys[decrypt_info['URI']]
+                elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
+                    media_sequence = int(line[22:])
+                elif line.startswith('#EXT-X-TARGETDURATION'):
+                    target_duration = float_or_none(line[22:])
+        return fragments, target_duration, '#EXT-X-ENDLIST' in s
+
+    def _coalesce_byte_ranges(self, fragments):
+        """Group fragments into download requests
+
+        Fragments that are adjacent byte ranges of the same resource are
+        merged into a single range request, all other fragments are
+        downloaded on their own. Each request lists the fragments it covers
+        in 'fragments'.
+        """
+        requests = []
+        for frag in fragments:
+            byte_range = frag.get('byte_range')
+            last = requests[-1] if requests else None
+            if (byte_range and last and last['byte_range'] and
+                    last['url'] == frag['url'] and
+                    last['byte_range']['end'] == byte_range['start'] and
+                    byte_range['end'] - last['byte_range']['start'] <= self._MAX_COALESCED_BYTE_RANGE):
+                last['byte_range'] = {
+                    'start': last['byte_range']['start'],
+                    'end': byte_range['end'],
+                }
+                last['fragments'].append(frag)
+            else:
+                requests.append({
+                    'url': frag['url'],
+                    'name': frag['name'],
+                    'byte_range': byte_range,
+                    'fragments': [frag],
+                })
+        for request in requests:
+            if request['byte_range']:
+                request['http_headers'] = {
+                    'Range': 'bytes=%d-%d' % (
+                        request['byte_range']['start'], request['byte_range']['end'] - 1),
+                }
+            request['fragment_count'] = len(request['fragments'])
+        return requests
+
+    @staticmethod
+    def _split_coalesced(request, content):
+        """Split the content of a download request into its fragments"""
+        byte_range = request['byte_range']
+        if not byte_range:
+            return [(request['fragments'][0], content)]
+        start = byte_range['start']
+        if len(content) != byte_range['end'] - start and len(content) >= byte_range['end']:
+            # The server ignored the Range header and sent the whole resource
+            content = content[start:byte_range['end']]
+        return [
+            (frag, content[frag['byte_range']['start'] - start:frag['byte_range']['end'] - start])
+            for frag in request['fragments']]
+
+    def _download_and_append_fragments(self, ctx, fragments):
+        requests = self._coalesce_byte_ranges(fragments)
+        # Fragments that are neither split nor decrypted are copied to the
+        # output in chunks
+        as_stream = all(
+            not request['byte_range'] and request['fragments'][0]['decrypt_info']['METHOD'] == 'NONE'
+            for request in requests)
+        for request, content in self._download_fragments(ctx, requests, as_stream=as_stream):
+            if content is None:
+                return False
+            for frag, frag_content in self._split_coalesced(request, content):
+                decrypt_info = frag['decrypt_info']
+                if decrypt_info['METHOD'] == 'AES-128':
+                    iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', frag['media_sequence'])
+                    frag_content = aes_cbc_decrypt_bytes(frag_content, decrypt_info['KEY'], iv)
+                self._append_fragment(ctx, frag, frag_content)
+                ctx['last_media_sequence'] = frag['media_sequence']
+        return True
 
     def real_download(self, filename, info_dict):
         man_url = info_dict['url']
@@ -69,64 +207,91 @@ class HlsFD(FragmentFD):
                 fd.add_progress_hook(ph)
             return fd.real_download(filename, info_dict)
 
-        total_frags = 0
-        for line in s.splitlines():
-            line = line.strip()
-            if line and not line.startswith('#'):
-                total_frags += 1
+        keys = {}
+        fragments, target_duration, endlist = self._parse_fragments(man_url, s, keys)
+        # Only trust the extractor on whether the stream is live: playlists
+        # of finished streams may lack #EXT-X-ENDLIST as well
+        live = bool(info_dict.get('is_live')) and not endlist
 
         ctx = {
             'filename': filename,
-            'total_frags': total_frags,
+            'total_frags': len(fragments),
+            'manifest_url': man_url,
+            'fragments': fragments,
+            'live': live,
         }
 
         self._prepare_and_start_frag_download(ctx)
 
-        i = 0
-        media_sequence = 0
-        decrypt_info = {'METHOD': 'NONE'}
-        frags_filenames = []
-        for line in s.splitlines():
-            line = line.strip()
-            if line:
-                if not line.startswith('#'):
-                    frag_url = (
-                        line
-                        if re.match(r'^https?://', line)
-                        else compat_urlparse.urljoin(man_url, line))
-                    frag_filename = '%s-Frag%d' % (ctx['tmpfilename'], i)
-                    success = ctx['dl'].download(frag_filename, {'url': frag_url})
-                    if not success:
-                        return False
-                    down, frag_sanitized = sanitize_open(frag_filename, 'rb')
-                    frag_content = down.read()
-                    down.close()
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        iv = decrypt_info.get('IV') or compat_struct_pack('>8xq', media_sequence)
-                        frag_content = AES.new(
-                            decrypt_info['KEY'], AES.MODE_CBC, iv).decrypt(frag_content)
-                    ctx['dest_stream'].write(frag_content)
-                    frags_filenames.append(frag_sanitized)
-                    # We only download the first fragment during the test
-                    if self.params.get('test', False):
-                        break
-                    i += 1
-                    media_sequence += 1
-                elif line.startswith('#EXT-X-KEY'):
-                    decrypt_info = parse_m3u8_attributes(line[11:])
-                    if decrypt_info['METHOD'] == 'AES-128':
-                        if 'IV' in decrypt_info:
-                            decrypt_info['IV'] = binascii.unhexlify(decrypt_info['IV'][2:])
-                        if not re.match(r'^https?://', decrypt_info['URI']):
-                            decrypt_info['URI'] = compat_urlparse.urljoin(
-                                man_url, decrypt_info['URI'])
-                        decrypt_info['KEY'] = self.ydl.urlopen(decrypt_info['URI']).read()
-                elif line.startswith('#EXT-X-MEDIA-SEQUENCE'):
-                    media_sequence = int(line[22:])
+        # Skip the fragments written before the download was interrupted
+        fragments = fragments[ctx['fragment_index']:]
+        # We only download the first fragment during the test
+        if self.params.get('test', False):
+            fragments = fragments[:1]
+            live = False
 
-        self._finish_frag_download(ctx)
+        try:
+            if live:
+                success = self._download_live(ctx, man_url, fragments, target_duration, keys)
+            else:
+                success = self._download_and_append_fragments(ctx, fragments)
+        finally:
+            self._write_resume_state(ctx)
+        if not success:
+            return False
 
-        for frag_file in frags_filenames:
-            os.remove(encodeFilename(frag_file))
+        self._finish_frag_download(ctx)
 
         return True
+
+    def _download_live(self, ctx, man_url, fragments, target_duration, keys):
+        """Download a live stream, refreshing its playlist for new fragments
+
+        The playlist is refreshed every target duration (half of it when it
+        did not change, as recommended by the HLS specification) until
+        #EXT-X-ENDLIST shows up, the playlist disappears or it stays
+        unchanged for _LIVE_MAX_UNCHANGED_REFRESHES refreshes. Fragments that
+        are already gone from the server are skipped.
+        """
+        ctx['last_media_sequence'] = -1
+        target_duration = target_duration or self._LIVE_DEFAULT_TARGET_DURATION
+        unchanged_refreshes = 0
+        endlist = False
+        last_refresh = ctx['started']
+        while True:
+            new_fragments = [
+                frag for frag in fragments
+                if frag['media_sequence'] > ctx['last_media_sequence']]
+            if new_fragments:
+                unchanged_refreshes = 0
+                missed = new_fragments[0]['media_sequence'] - (ctx['last_media_sequence'] + 1)
+                if ctx['last_media_sequence'] >= 0 and missed > 0:
+                    self.report_warning('Missed %d fragments' % missed)
+                try:
+                    if not self._download_and_append_fragments(ctx, new_fragments):
+                        return False
+                except (compat_urllib_error.HTTPError, ) as err:
+                    if err.code not in (404, 410):
+                        raise
+                    # We didn't keep up with the live window. Continue
+                    # with the next available fragment.
+                    ctx['last_media_sequence'] = max(
+                        ctx['last_media_sequence'] + 1, new_fragments[0]['media_sequence'])
+                    self.report_warning('Fragment %d unavailable' % ctx['last_media_sequence'])
+            else:
+                unchanged_refreshes += 1
+            if endlist or unchanged_refreshes > self._LIVE_MAX_UNCHANGED_REFRESHES:
+                return True
+
+            wait = target_duration if not unchanged_refreshes else target_duration / 2
+            time.sleep(max(last_refresh + wait - time.time(), 0))
+            last_refresh = time.time()
+            try:
+                s = self.ydl.urlopen(man_url).read().decode('utf-8', 'ignore')
+            except (compat_urllib_error.HTTPError, ) as err:
+                if err.code in (404, 410):
+                    # The stream is over
+                    return True
+                raise
+            fragments, new_target_duration, endlist = self._parse_fragments(man_url, s, keys)
+            target_duration = new_target_duration or target_duration
@@ -1,8 +1,12 @@
-from __future__ import unicode_literals
+from __future__ import division, unicode_literals
 
 import errno
+import io
+import json
 import os
 import socket
+import sys
+import threading
 import time
 import re
 
@@ -11,12 +15,79 @@ from ..compat import compat_urllib_error
 from ..utils import (
     ContentTooShortError,
     encodeFilename,
+    RateLimiter,
     sanitize_open,
     sanitized_Request,
+    write_json_file,
 )
 
 
 class HttpFD(FileDownloader):
+    """
+    File downloader for plain HTTP(S) URLs.
+
+    Available options (in addition to those of FileDownloader):
+
+    http_connections:   Number of connections to download a file with. If
+                        the server supports range requests, the file is split
+                        into that many chunks downloaded in parallel into a
+                        preallocated .part file. The progress of each chunk
+                        is kept in a <tmpfilename>.ytdl file for resuming.
+    """
+
+    # Files smaller than twice this size are downloaded with one connection
+    _MIN_CHUNK_SIZE = 1024 * 1024
+    # Interval in seconds the state of the chunks is saved at
+    _CHUNKS_STATE_SAVE_INTERVAL = 1
+    # Lower bound of the automatically resized block size when the rate is
+    # not limited, reading small blocks makes fast downloads CPU bound
+    _MIN_RESIZED_BLOCK_SIZE = 64 * 1024
+
+    @staticmethod
+    def _block_reader(data):
+        """Return a function reading a block of at most n bytes from data
+
+        Where the response supports readinto (Python 3), the blocks are read
+        into a buffer reused between the calls and returned as a memoryview
+        of it, valid until the next call, instead of allocating a new bytes
+        object for every block.
+        """
+        readinto = getattr(data, 'readinto', None) if sys.version_info >= (3, 0) else None
+        if readinto is None:
+            return data.read
+        buf = [None]
+
+        def read(n):
+            if buf[0] is None or len(buf[0]) < n:
+                buf[0] = memoryview(bytearray(n))
+            return buf[0][:readinto(buf[0][:n])]
+        return read
+
+    def _next_block_size(self, elapsed_time, bytes):
+        block_size = self.best_block_size(elapsed_time, bytes)
+        if not self.params.get('ratelimit'):
+            block_size = max(block_size, self._MIN_RESIZED_BLOCK_SIZE)
+        return block_size
+
+    def _open_stream(self, tmpfilename, open_mode):
+        """Open the stream the downloaded data is written to"""
+        return sanitize_open(tmpfilename, open_mode)
+
+    def _close_stream(self, stream, tmpfilename):
+        if tmpfilename != '-':
+            stream.close()
+
+    def _check_filesize(self, data_len):
+        min_data_len = self.params.get('min_filesize')
+        max_data_len = self.params.get('max_filesize')
+        if min_data_len is not None and data_len < min_data_len:
+            self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (data_len, min_data_len))
+            return False
+        if max_data_len is not None and data_len > max_data_len:
+            self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (data_len, max_data_len))
+            return False
+        return True
+
     def real_download(self, filename, info_dict):
         url = info_dict['url']
         tmpfilename = self.temp_name(filename)
@@ -34,6 +105,14 @@ class HttpFD(FileDownloader):
 
         if is_test:
             request.add_header('Range', 'bytes=0-%s' % str(self._TEST_FILE_SIZE - 1))
+        elif tmpfilename != filename and (
+                (self.params.get('http_connections') or 1) > 1 or
+                os.path.isfile(encodeFilename(self.ytdl_filename(tmpfilename)))):
+            # Also take this path for .part files left by a multi connection
+            # download, they are preallocated and can not just be appended to
+            result = self._multi_connection_download(filename, tmpfilename, info_dict, headers)
+            if result is not None:
+                return result
 
         # Establish possible resume length
         if os.path.isfile(encodeFilename(tmpfilename)):
@@ -140,26 +219,21 @@ class HttpFD(FileDownloader):
 
         if data_len is not None:
             data_len = int(data_len) + resume_len
-            min_data_len = self.params.get('min_filesize')
-            max_data_len = self.params.get('max_filesize')
-            if min_data_len is not None and data_len < min_data_len:
-                self.to_screen('\r[download] File is smaller than min-filesize (%s bytes < %s bytes). Aborting.' % (data_len, min_data_len))
-                return False
-            if max_data_len is not None and data_len > max_data_len:
-                self.to_screen('\r[download] File is larger than max-filesize (%s bytes > %s bytes). Aborting.' % (data_len, max_data_len))
+            if not self._check_filesize(data_len):
                 return False
 
         byte_counter = 0 + resume_len
         block_size = self.params.get('buffersize', 1024)
+        read_block = self._block_reader(data)
+        host = RateLimiter.host_of(data.geturl())
         start = time.time()
 
-        # measure time over whole while-loop, so slow_down() and best_block_size() work together properly
-        now = None  # needed for slow_down() in the first loop run
+        # measure time over whole while-loop, so consume_bandwidth() and best_block_size() work together properly
         before = start  # start measuring
         while True:
 
             # Download and write
-            data_block = data.read(block_size if not is_test else min(block_size, data_len - byte_counter))
+            data_block = read_block(block_size if not is_test else min(block_size, data_len - byte_counter))
             byte_counter += len(data_block)
 
             # exit loop when download is finished
@@ -169,7 +243,7 @@ class HttpFD(FileDownloader):
             # Open destination file just in time
             if stream is None:
                 try:
-                    (stream, tmpfilename) = sanitize_open(tmpfilename, open_mode)
+                    (stream, tmpfilename) = self._open_stream(tmpfilename, open_mode)
                     assert stream is not None
                     filename = self.undo_temp_name(tmpfilename)
                     self.report_destination(filename)
@@ -192,7 +266,7 @@ class HttpFD(FileDownloader):
                 return False
 
             # Apply rate limit
-            self.slow_down(start, now, byte_counter - resume_len)
+            self.consume_bandwidth(len(data_block), host)
 
             # end measuring of one loop run
             now = time.time()
@@ -200,7 +274,7 @@ class HttpFD(FileDownloader):
 
             # Adjust block size
             if not self.params.get('noresizebuffer', False):
-                block_size = self.best_block_size(after - before, len(data_block))
+                block_size = self._next_block_size(after - before, len(data_block))
 
             before = after
 
@@ -229,8 +303,7 @@ class HttpFD(FileDownloader):
             self.to_stderr('\n')
             self.report_error('Did not get any data blocks')
             return False
-        if tmpfilename != '-':
-            stream.close()
+        self._close_stream(stream, tmpfilename)
 
         if data_len is not None and byte_counter != data_len:
             raise ContentTooShortError(byte_counter, int(data_len))
@@ -249,3 +322,232 @@ class HttpFD(FileDownloader):
         })
 
         return True
+
+    def _read_chunks_state(self, state_filename, tmpfilename, data_len):
+        if not os.path.isfile(state_filename) or not os.path.isfile(encodeFilename(tmpfilename)):
+            return None
+        try:
+            with io.open(state_filename, 'r', encoding='utf-8') as f:
+                state = json.load(f)['http_chunks']
+            chunks = [{
+                'start': int(chunk['start']),
+                'end': int(chunk['end']),
+                'downloaded': int(chunk['downloaded']),
+            } for chunk in state['chunks']]
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        if (state.get('total_bytes') != data_len or
+                os.path.getsize(encodeFilename(tmpfilename)) != data_len):
+            return None
+        return chunks
+
+    def _multi_connection_download(self, filename, tmpfilename, info_dict, headers):
+        """Download a file with several connections, one per chunk
+
+        Returns None if the server does not support range requests or the
+        file is too small to be split, the file should then be downloaded
+        with a single connection.
+        """
+        url = info_dict['url']
+        host = RateLimiter.host_of(url)
+        connections = max(self.params.get('http_connections') or 1, 1)
+        state_filename = encodeFilename(self.ytdl_filename(tmpfilename))
+
+        # The Content-Range of the reply to a request for the first byte
+        # tells whether ranges are supported and the size of the file
+        data = self.ydl.urlopen(sanitized_Request(url, None, dict(headers, Range='bytes=0-0')))
+        content_range = data.headers.get('Content-Range')
+        last_modified = data.info().get('last-modified')
+        status = data.getcode()
+        data.close()
+        content_range_m = re.search(r'bytes 0-0/(\d+)', content_range or '')
+        data_len = int(content_range_m.group(1)) if status == 206 and content_range_m else None
+
+        chunks = None
+        if data_len is not None and self.params.get('continuedl', True):
+            chunks = self._read_chunks_state(state_filename, tmpfilename, data_len)
+        if chunks is None and os.path.isfile(state_filename):
+            # The partially downloaded file is useless without its state
+            self.report_unable_to_resume()
+            os.remove(state_filename)
+            if os.path.isfile(encodeFilename(tmpfilename)):
+                os.remove(encodeFilename(tmpfilename))
+        if data_len is None or (chunks is None and data_len < 2 * self._MIN_CHUNK_SIZE):
+            return None
+
+        if not self._check_filesize(data_len):
+            return False
+
+        if chunks is None:
+            # A .part file without state was left by a single connection
+            # download, it holds the start of the file
+            resume_len = 0
+            if self.params.get('continuedl', True) and os.path.isfile(encodeFilename(tmpfilename)):
+                resume_len = os.path.getsize(encodeFilename(tmpfilename))
+                if resume_len >= data_len:
+                    return None
+            chunk_size = max(-(-(data_len - resume_len) // connections), self._MIN_CHUNK_SIZE)
+            chunks = [{
+                'start': chunk_start,
+                'end': min(chunk_start + chunk_size, data_len),
+                'downloaded': 0,
+            } for chunk_start in range(resume_len, data_len, chunk_size)]
+            if resume_len:
+                chunks.insert(0, {'start': 0, 'end': resume_len, 'downloaded': resume_len})
+                self.report_resuming_byte(resume_len)
+            try:
+                # Preallocate the file, every connection writes its chunk
+                # at its offset
+                stream, tmpfilename = sanitize_open(tmpfilename, 'r+b' if resume_len else 'wb')
+                stream.truncate(data_len)
+                stream.close()
+            except (OSError, IOError) as err:
+                self.report_error('unable to open for writing: %s' % str(err))
+                return False
+            state_filename = encodeFilename(self.ytdl_filename(tmpfilename))
+        else:
+            resume_len = sum(chunk['downloaded'] for chunk in chunks)
+            self.report_resuming_byte(resume_len)
+        filename = self.undo_temp_name(tmpfilename)
+        self.report_destination(filename)
+
+        if self.params.get('xattr_set_filesize', False):
+            try:
+                import xattr
+                xattr.setxattr(tmpfilename, 'user.ytdl.filesize', str(data_len))
+            except (OSError, IOError, ImportError) as err:
+                self.report_error('unable to set filesize xattr: %s' % str(err))
+
+        lock = threading.Lock()
+        progress = {'downloaded_bytes': resume_len}
+        # Workers stop as soon as one of them fails or on interruption
+        pool_state = {'stop': False, 'errors': [], 'failed': False}
+        start = time.time()
+
+        def save_state():
+            with lock:
+                state = {
+                    'http_chunks': {
+                        'total_bytes': data_len,
+                        'chunks': [dict(chunk) for chunk in chunks],
+                    },
+                }
+            try:
+                write_json_file(state, self.ytdl_filename(tmpfilename))
+            except (IOError, OSError) as err:
+                self.report_warning('Unable to save the download state: %s' % err)
+
+        def download_chunk(chunk):
+            retries = self.params.get('retries', 0)
+            count = 0
+            block_size = self.params.get('buffersize', 1024)
+            stream = io.open(encodeFilename(tmpfilename), 'r+b')
+            try:
+                while not pool_state['stop'] and chunk['start'] + chunk['downloaded'] < chunk['end']:
+                    range_start = chunk['start'] + chunk['downloaded']
+                    request = sanitized_Request(url, None, dict(
+                        headers, Range='bytes=%d-%d' % (range_start, chunk['end'] - 1)))
+                    try:
+                        data = self.ydl.urlopen(request)
+                        if data.getcode() != 206:
+                            self.report_error('server no longer honours range requests')
+                            return False
+                        stream.seek(range_start)
+                        read_block = self._block_reader(data)
+                        before = time.time()
+                        while not pool_state['stop']:
+                            data_block = read_block(block_size)
+                            if not data_block:
+                                break
+                            stream.write(data_block)
+                            with lock:
+                                chunk['downloaded'] += len(data_block)
+                                progress['downloaded_bytes'] += len(data_block)
+                                byte_counter = progress['downloaded_bytes']
+                                now = time.time()
+                                self._hook_progress({
+                                    'status': 'downloading',
+                                    'downloaded_bytes': byte_counter,
+                                    'total_bytes': data_len,
+                                    'tmpfilename': tmpfilename,
+                                    'filename': filename,
+                                    'eta': self.calc_eta(start, now, data_len - resume_len, byte_counter - resume_len),
+                                    'speed': self.calc_speed(start, now, byte_counter - resume_len),
+                                    'elapsed': now - start,
+                                })
+                            self.consume_bandwidth(len(data_block), host)
+                            after = time.time()
+                            if not self.params.get('noresizebuffer', False):
+                                block_size = self._next_block_size(after - before, len(data_block))
+                            before = after
+                        if chunk['start'] + chunk['downloaded'] >= chunk['end']:
+                            break
+                    except (compat_urllib_error.HTTPError, ) as err:
+                        if err.code < 500 or err.code >= 600:
+                            raise
+                    except socket.error as e:
+                        if e.errno != errno.ECONNRESET:
+                            raise
+                    # Retry the rest of the chunk
+                    count += 1
+                    if count > retries:
+                        self.report_error('giving up after %s retries' % retries)
+                        return False
+                    self.report_retry(count, retries)
+                return True
+            finally:
+                stream.close()
+
+        def worker(chunk):
+            try:
+                success = download_chunk(chunk)
+            except Exception as err:
+                pool_state['errors'].append(err)
+                success = False
+            if not success:
+                pool_state['failed'] = True
+                pool_state['stop'] = True
+
+        workers = [
+            threading.Thread(target=worker, args=(chunk,))
+            for chunk in chunks if chunk['downloaded'] < chunk['end'] - chunk['start']]
+        for t in workers:
+            t.daemon = True
+            t.start()
+        try:
+            while True:
+                alive = [t for t in workers if t.is_alive()]
+                if not alive:
+                    break
+                alive[0].join(self._CHUNKS_STATE_SAVE_INTERVAL)
+                save_state()
+        finally:
+            pool_state['stop'] = True
+            for t in workers:
+                t.join()
+            save_state()
+
+        if pool_state['errors']:
+            raise pool_state['errors'][0]
+        if pool_state['failed']:
+            return False
+
+        byte_counter = progress['downloaded_bytes']
+        if byte_counter != data_len:
+            raise ContentTooShortError(byte_counter, data_len)
+        os.remove(state_filename)
+        self.try_rename(tmpfilename, filename)
+
+        # Update file modification time
+        if self.params.get('updatetime', True):
+            info_dict['filetime'] = self.try_utime(filename, last_modified)
+
+        self._hook_progress({
+            'downloaded_bytes': byte_counter,
+            'total_bytes': byte_counter,
+            'filename': filename,
+            'status': 'finished',
+            'elapsed': time.time() - start,
+        })
+
+        return True
@@ -1,6 +1,10 @@
 from __future__ import unicode_literals
 
+import os
+
 try:
+    if os.environ.get('YOUTUBE_DL_NO_LAZY_EXTRACTORS'):
+        raise ImportError('Lazy loading of the extractors is disabled')
     from .lazy_extractors import *
     from .lazy_extractors import _ALL_CLASSES
     _LAZY_LOADER = True
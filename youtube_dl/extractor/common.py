@@ -9,6 +9,7 @@ import os
 import re
 import socket
 import sys
+import threading
 import time
 import math
 
@@ -60,6 +61,9 @@ from ..utils import (
 )
 
 
+_initialize_lock = threading.RLock()
+
+
 class InfoExtractor(object):
     """Information Extractor class.
 
@@ -304,6 +308,11 @@ class InfoExtractor(object):
     _ready = False
     _downloader = None
     _WORKING = True
+    # Number of seconds the responses to the requests of the extractor are
+    # cached for regardless of their headers (0 to never cache them), unless
+    # overridden with the http_cache_ttl parameter. None to follow the
+    # headers.
+    _HTTP_CACHE_TTL = None
 
     def __init__(self, downloader=None):
         """Constructor. Receives an optional downloader."""
@@ -337,8 +346,11 @@ class InfoExtractor(object):
     def initialize(self):
         """Initializes an instance (authentication, etc)."""
         if not self._ready:
-            self._real_initialize()
-            self._ready = True
+            # Extractions may run in parallel, log in only once
+            with _initialize_lock:
+                if not self._ready:
+                    self._real_initialize()
+                    self._ready = True
 
     def extract(self, url):
         """Extracts URL information and returns it in list of dicts."""
@@ -391,6 +403,8 @@ class InfoExtractor(object):
             if data is not None or headers:
                 url_or_request = sanitized_Request(url_or_request, data, headers)
         try:
+            if self._downloader.params.get('http_cache'):
+                return self._downloader.http_cache.urlopen(url_or_request, self._http_cache_ttl())
             return self._downloader.urlopen(url_or_request)
         except (compat_urllib_error.URLError, compat_http_client.HTTPException, socket.error) as err:
             if errnote is False:
@@ -405,6 +419,15 @@ class InfoExtractor(object):
                 self._downloader.report_warning(errmsg)
                 return False
 
+    def _http_cache_ttl(self):
+        ttls = self._downloader.params.get('http_cache_ttl') or {}
+        ttl = ttls.get(self.ie_key().lower())
+        if ttl is None:
+            ttl = self._HTTP_CACHE_TTL
+        if ttl is None:
+            ttl = ttls.get('default')
+        return ttl
+
     def _download_webpage_handle(self, url_or_request, video_id, note=None, errnote=None, fatal=True, encoding=None, data=None, headers={}, query={}):
         """ Returns a tuple (page content as string, URL handle) """
         # Strip hashes from the URL (#1038)
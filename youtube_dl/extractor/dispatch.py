@@ -0,0 +1,380 @@
+from __future__ import unicode_literals
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .common import InfoExtractor
+from ..compat import compat_chr
+
+# Characters ending the host part of a URL
+_SEPARATORS = '/?#'
+# Patterns expanding to more token sequences are not indexed
+_MAX_PATHS = 256
+# The end of a pattern in a sequence of tokens
+_END = object()
+# The keys of the patterns already analysed
+_KEYS_CACHE = {}
+
+
+def _op_name(op):
+    return str(op).upper()
+
+
+class _CharClass(object):
+    """What a single character or a repetition of characters can match"""
+
+    def __init__(self, test, digits_only=False):
+        self.test = test
+        self.digits_only = digits_only
+
+    def union(self, other):
+        return _CharClass(
+            lambda c: self.test(c) or other.test(c),
+            self.digits_only and other.digits_only)
+
+
+_ANY_CHAR = _CharClass(lambda c: True)
+_NO_CHAR = _CharClass(lambda c: False, True)
+
+_CATEGORIES = {
+    'CATEGORY_DIGIT': (r'\d', True),
+    'CATEGORY_NOT_DIGIT': (r'\D', False),
+    'CATEGORY_SPACE': (r'\s', False),
+    'CATEGORY_NOT_SPACE': (r'\S', False),
+    'CATEGORY_WORD': (r'\w', False),
+    'CATEGORY_NOT_WORD': (r'\W', False),
+}
+
+
+def _category_class(category):
+    regex, digits_only = _CATEGORIES.get(_op_name(category), (None, False))
+    if regex is None:
+        return _ANY_CHAR
+    return _CharClass(lambda c: re.match(regex, c) is not None, digits_only)
+
+
+def _set_class(items):
+    negate = False
+    res = _NO_CHAR
+    for op, av in items:
+        name = _op_name(op)
+        if name == 'NEGATE':
+            negate = True
+        elif name == 'LITERAL':
+            res = res.union(_CharClass(
+                lambda c, av=av: ord(c) == av, '0' <= compat_chr(av) <= '9'))
+        elif name == 'RANGE':
+            res = res.union(_CharClass(
+                lambda c, av=av: av[0] <= ord(c) <= av[1],
+                ord('0') <= av[0] and av[1] <= ord('9')))
+        elif name == 'CATEGORY':
+            res = res.union(_category_class(av))
+        else:
+            res = _ANY_CHAR
+    if negate:
+        return _CharClass(lambda c: not res.test(c))
+    return res
+
+
+def _char_class(op, av):
+    """The class of what the element (op, av) can match, None if it is zero width"""
+    name = _op_name(op)
+    if name == 'LITERAL':
+        return _CharClass(lambda c: ord(c) == av, '0' <= compat_chr(av) <= '9')
+    if name == 'NOT_LITERAL':
+        return _CharClass(lambda c: ord(c) != av)
+    if name == 'IN':
+        return _set_class(av)
+    if name == 'CATEGORY':
+        return _category_class(av)
+    if name in ('AT', 'ASSERT', 'ASSERT_NOT'):
+        return None
+    if name == 'SUBPATTERN':
+        return _seq_class(av[-1])
+    if name == 'ATOMIC_GROUP':
+        return _seq_class(av)
+    if name == 'BRANCH':
+        res = _NO_CHAR
+        for alternative in av[1]:
+            res = res.union(_seq_class(alternative))
+        return res
+    if name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+        return _seq_class(av[2])
+    if name == 'GROUPREF_EXISTS':
+        res = _seq_class(av[1])
+        return res if av[2] is None else res.union(_seq_class(av[2]))
+    # ANY, GROUPREF and the rest
+    return _ANY_CHAR
+
+
+def _seq_class(seq):
+    res = _NO_CHAR
+    for op, av in seq:
+        char_class = _char_class(op, av)
+        if char_class is not None:
+            res = res.union(char_class)
+    return res
+
+
+def _is_literal(token):
+    return isinstance(token, type(''))
+
+
+def _host_tokens(tokens):
+    """Get the tokens of the host in a sequence of tokens
+
+    Tokens are characters, _CharClass instances for the parts that are not
+    literal, _END for the end of the pattern and None if it can be followed
+    by anything. Returns False if more tokens are needed and None if the
+    host cannot be known.
+
+    The host starts after a leading "//" (following anything but a "/") and
+    ends at the first "/", "?" or "#", like in url_hosts. Its port is left
+    out.
+    """
+    start = 0
+    for i, t in enumerate(tokens):
+        if t == '/':
+            if i + 1 == len(tokens):
+                return False
+            if tokens[i + 1] == '/':
+                start = i + 2
+            break
+        if t is None or t is _END or (not _is_literal(t) and t.test('/')):
+            break
+    for end in range(start, len(tokens)):
+        term = tokens[end]
+        if term is None:
+            # The host could go on
+            return None
+        if term is _END or (_is_literal(term) and term in _SEPARATORS):
+            break
+    else:
+        return False
+    host = tokens[start:end]
+    if term is not _END and any(not _is_literal(t) and t.test(term) for t in host):
+        return None
+    for i in range(len(host) - 1, -1, -1):
+        t = host[i]
+        if t == ':':
+            return host[:i]
+        if not (t.isdigit() if _is_literal(t) else t.digits_only):
+            break
+    return host
+
+
+def _literal_runs(tokens):
+    run = []
+    for t in tokens + [None]:
+        if _is_literal(t):
+            run.append(t)
+            continue
+        yield ''.join(run).lower(), t is None
+        run = []
+
+
+def _key(tokens):
+    """Get the key of a sequence of tokens, False if more tokens are needed
+
+    A key is ('suffix', s) if the host ends with s, ('label', l) if the host
+    has the complete label l and ('prefix', p) if the URL starts with p.
+    """
+    host = _host_tokens(tokens)
+    if host is False:
+        return False
+    if host is None:
+        prefix = next(_literal_runs(tokens))[0]
+        return ('prefix', prefix) if prefix else None
+    keys = []
+    runs = list(_literal_runs(host))
+    suffix, at_end = runs[-1]
+    if at_end and suffix:
+        keys.append((len(suffix), 'suffix', suffix))
+    for i, (run, at_end) in enumerate(runs):
+        # The first and last labels of a run are complete only at the ends of the host
+        labels = run.split('.')[1 if i else 0:None if at_end else -1]
+        keys.extend((len(label), 'label', label) for label in labels if label)
+    if not keys:
+        return None
+    return max(keys)[1:]
+
+
+def _may_end_host(tokens):
+    """Whether the key of tokens may be known since the last one was added"""
+    if not tokens:
+        return False
+    last = tokens[-1]
+    return (last is None or last is _END or (_is_literal(last) and last in _SEPARATORS) or
+            (len(tokens) > 1 and tokens[-2] == '/'))
+
+
+def _single_char_branches(char_class):
+    """Split a character class into the separators it matches and the rest"""
+    branches = [c for c in _SEPARATORS if char_class.test(c)]
+    if branches:
+        branches.append(_CharClass(
+            lambda c: c not in _SEPARATORS and char_class.test(c),
+            char_class.digits_only))
+    else:
+        branches.append(char_class)
+    return branches
+
+
+def _expand(seq, todo, tokens, keys):
+    """Collect in keys the keys of the sequences of tokens seq + todo can match
+
+    Returns False once the pattern turns out not to be indexable.
+    """
+    if len(keys) > _MAX_PATHS:
+        return False
+    key = _key(tokens) if _may_end_host(tokens) else False
+    if key is None:
+        return False
+    if key is not False:
+        keys.append(key)
+        return True
+    if not seq:
+        if not todo:
+            return _expand([], [], tokens + [None], keys)
+        return _expand(todo[0], todo[1:], tokens, keys)
+    (op, av), rest = seq[0], seq[1:]
+    name = _op_name(op)
+    if name == 'LITERAL':
+        # The following characters at once, up to one that may end the host
+        n = 1
+        if not tokens or tokens[-1] != '/':
+            while (n < len(seq) and _op_name(seq[n][0]) == 'LITERAL' and
+                   compat_chr(seq[n - 1][1]) not in _SEPARATORS):
+                n += 1
+        return _expand(seq[n:], todo, tokens + [compat_chr(c) for _, c in seq[:n]], keys)
+    if name == 'AT':
+        if _op_name(av) in ('AT_END', 'AT_END_STRING'):
+            return _expand([], [], tokens + [_END], keys)
+        return _expand(rest, todo, tokens, keys)
+    if name in ('SUBPATTERN', 'ATOMIC_GROUP'):
+        return _expand(list(av[-1] if name == 'SUBPATTERN' else av), [rest] + todo, tokens, keys)
+    if name == 'BRANCH':
+        return all(
+            _expand(list(alternative), [rest] + todo, tokens, keys)
+            for alternative in av[1])
+    if name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT'):
+        min_count, max_count, item = av
+        if max_count == 1:
+            return ((min_count == 1 or _expand(rest, todo, tokens, keys)) and
+                    _expand(list(item), [rest] + todo, tokens, keys))
+    if name == 'GROUPREF_EXISTS':
+        return all(
+            _expand(list(alternative or []), [rest] + todo, tokens, keys)
+            for alternative in av[1:])
+    char_class = _char_class(op, av)
+    if char_class is None:
+        # Other assertions match no characters
+        return _expand(rest, todo, tokens, keys)
+    if name in ('ANY', 'IN', 'NOT_LITERAL', 'CATEGORY'):
+        # A single character, it matters if it may end the host
+        return all(
+            _expand(rest, todo, tokens + [branch], keys)
+            for branch in _single_char_branches(char_class))
+    return _expand(rest, todo, tokens + [char_class], keys)
+
+
+def pattern_keys(valid_url):
+    """Return the keys of the URLs matching valid_url
+
+    Any URL matching valid_url (with re.match) has one of the returned keys
+    (see _key), in lowercase. Returns None if this cannot be established
+    from the pattern.
+    """
+    try:
+        parsed = sre_parse.parse(valid_url)
+    except Exception:
+        return None
+    keys = []
+    if not _expand(list(parsed), [], [], keys):
+        return None
+    return sorted(set(keys))
+
+
+def url_hosts(url):
+    """Return the strings that could be the host of url in a pattern
+
+    The host of the pattern could start at the beginning or after a "//"
+    and end at the first "/", "?", "#" or at the end of url.
+    """
+    url = url.lower()
+    starts = [0]
+    first_slash = url.find('/')
+    if url.startswith('//', first_slash):
+        starts.append(first_slash + 2)
+    hosts = set()
+    for start in starts:
+        hosts.add(url[start:])
+        for c in _SEPARATORS:
+            end = url.find(c, start)
+            if end != -1:
+                hosts.add(url[start:end])
+    return set(re.sub(r':\d*$', '', host) for host in hosts)
+
+
+class ExtractorIndex(object):
+    """Find the extractors that could be suitable for a URL
+
+    Extractors are indexed by the keys of their _VALID_URL (see _key).
+    Those that override suitable or whose patterns cannot be analysed are
+    always candidates. candidates returns the extractors in their original
+    order, so that the first one whose suitable method accepts the URL is
+    the same as with a scan of all of them.
+    """
+
+    def __init__(self, ies):
+        self._ies = []
+        self._index = {'suffix': {}, 'label': {}, 'prefix': {}}
+        self._fallback = []
+        self._max_prefix = 0
+        for ie in ies:
+            self.add(ie)
+
+    @staticmethod
+    def _get_keys(ie):
+        if getattr(ie.suitable, '__func__', None) is not InfoExtractor.suitable.__func__:
+            return None
+        if isinstance(ie, type) and '_VALID_URL_KEYS' in ie.__dict__:
+            # Computed in advance for the lazy extractors
+            return ie._VALID_URL_KEYS
+        valid_url = getattr(ie, '_VALID_URL', None)
+        if not valid_url:
+            return None
+        if valid_url not in _KEYS_CACHE:
+            _KEYS_CACHE[valid_url] = pattern_keys(valid_url)
+        return _KEYS_CACHE[valid_url]
+
+    def add(self, ie):
+        """Add an extractor at the end of the list"""
+        pos = len(self._ies)
+        self._ies.append(ie)
+        keys = self._get_keys(ie)
+        if keys is None:
+            self._fallback.append(pos)
+            return
+        for kind, key in keys:
+            self._index[kind].setdefault(key, []).append(pos)
+            if kind == 'prefix':
+                self._max_prefix = max(self._max_prefix, len(key))
+
+    def candidates(self, url):
+        positions = set(self._fallback)
+        suffixes, labels = self._index['suffix'], self._index['label']
+        for host in url_hosts(url):
+            for i in range(len(host)):
+                positions.update(suffixes.get(host[i:], ()))
+            for label in host.split('.'):
+                positions.update(labels.get(label, ()))
+        prefixes = self._index['prefix']
+        lower_url = url.lower()
+        for i in range(1, min(len(url), self._max_prefix) + 1):
+            positions.update(prefixes.get(lower_url[:i], ()))
+        return [self._ies[pos] for pos in sorted(positions)]
@@ -1452,6 +1452,16 @@ class GenericIE(InfoExtractor):
             'title': title,
         }
 
+    @staticmethod
+    def _embed_keywords_finder(webpage):
+        """Return a function telling whether any of its arguments is in webpage
+
+        The arguments are lowercase keywords, the search ignores case. It
+        costs much less than the patterns of most embeds.
+        """
+        lower_webpage = webpage.lower()
+        return lambda *keywords: any(keyword in lower_webpage for keyword in keywords)
+
     def _real_extract(self, url):
         if url.startswith('//'):
             return {
@@ -1661,565 +1671,652 @@ class GenericIE(InfoExtractor):
             return self.playlist_result(
                 urlrs, playlist_id=video_id, playlist_title=video_title)
 
+        # The patterns of an embed are only searched for if the page
+        # contains one of its keywords
+        embedded = self._embed_keywords_finder(webpage)
+
         # Look for Brightcove Legacy Studio embeds
-        bc_urls = BrightcoveLegacyIE._extract_brightcove_urls(webpage)
-        if bc_urls:
-            self.to_screen('Brightcove video detected.')
-            entries = [{
-                '_type': 'url',
-                'url': smuggle_url(bc_url, {'Referer': url}),
-                'ie_key': 'BrightcoveLegacy'
-            } for bc_url in bc_urls]
+        if embedded('brightcove', 'custombc.createvideo'):
+            bc_urls = BrightcoveLegacyIE._extract_brightcove_urls(webpage)
+            if bc_urls:
+                self.to_screen('Brightcove video detected.')
+                entries = [{
+                    '_type': 'url',
+                    'url': smuggle_url(bc_url, {'Referer': url}),
+                    'ie_key': 'BrightcoveLegacy'
+                } for bc_url in bc_urls]
 
-            return {
-                '_type': 'playlist',
-                'title': video_title,
-                'id': video_id,
-                'entries': entries,
-            }
+                return {
+                    '_type': 'playlist',
+                    'title': video_title,
+                    'id': video_id,
+                    'entries': entries,
+                }
 
         # Look for Brightcove New Studio embeds
-        bc_urls = BrightcoveNewIE._extract_urls(webpage)
-        if bc_urls:
-            return _playlist_from_matches(bc_urls, ie='BrightcoveNew')
+        if embedded('players.brightcove.net/'):
+            bc_urls = BrightcoveNewIE._extract_urls(webpage)
+            if bc_urls:
+                return _playlist_from_matches(bc_urls, ie='BrightcoveNew')
 
         # Look for ThePlatform embeds
-        tp_urls = ThePlatformIE._extract_urls(webpage)
-        if tp_urls:
-            return _playlist_from_matches(tp_urls, ie='ThePlatform')
+        if embedded('player.theplatform.com/p/'):
+            tp_urls = ThePlatformIE._extract_urls(webpage)
+            if tp_urls:
+                return _playlist_from_matches(tp_urls, ie='ThePlatform')
 
         # Look for Vessel embeds
-        vessel_urls = VesselIE._extract_urls(webpage)
-        if vessel_urls:
-            return _playlist_from_matches(vessel_urls, ie=VesselIE.ie_key())
+        if embedded('vessel.com/embed/'):
+            vessel_urls = VesselIE._extract_urls(webpage)
+            if vessel_urls:
+                return _playlist_from_matches(vessel_urls, ie=VesselIE.ie_key())
 
         # Look for embedded rtl.nl player
-        matches = re.findall(
-            r'<iframe[^>]+?src="((?:https?:)?//(?:www\.)?rtl\.nl/system/videoplayer/[^"]+(?:video_)?embed[^"]+)"',
-            webpage)
-        if matches:
-            return _playlist_from_matches(matches, ie='RtlNl')
-
-        vimeo_url = VimeoIE._extract_vimeo_url(url, webpage)
-        if vimeo_url is not None:
-            return self.url_result(vimeo_url)
-
-        vid_me_embed_url = self._search_regex(
-            r'src=[\'"](https?://vid\.me/[^\'"]+)[\'"]',
-            webpage, 'vid.me embed', default=None)
-        if vid_me_embed_url is not None:
-            return self.url_result(vid_me_embed_url, 'Vidme')
+        if embedded('rtl.nl/system/videoplayer/'):
+            matches = re.findall(
+                r'<iframe[^>]+?src="((?:https?:)?//(?:www\.)?rtl\.nl/system/videoplayer/[^"]+(?:video_)?embed[^"]+)"',
+                webpage)
+            if matches:
+                return _playlist_from_matches(matches, ie='RtlNl')
+
+        if embedded('vimeo.com/'):
+            vimeo_url = VimeoIE._extract_vimeo_url(url, webpage)
+            if vimeo_url is not None:
+                return self.url_result(vimeo_url)
+
+        if embedded('vid.me/'):
+            vid_me_embed_url = self._search_regex(
+                r'src=[\'"](https?://vid\.me/[^\'"]+)[\'"]',
+                webpage, 'vid.me embed', default=None)
+            if vid_me_embed_url is not None:
+                return self.url_result(vid_me_embed_url, 'Vidme')
 
         # Look for embedded YouTube player
-        matches = re.findall(r'''(?x)
-            (?:
-                <iframe[^>]+?src=|
-                data-video-url=|
-                <embed[^>]+?src=|
-                embedSWF\(?:\s*|
-                new\s+SWFObject\(
-            )
-            (["\'])
-                (?P<url>(?:https?:)?//(?:www\.)?youtube(?:-nocookie)?\.com/
-                (?:embed|v|p)/.+?)
-            \1''', webpage)
-        if matches:
-            return _playlist_from_matches(
-                matches, lambda m: unescapeHTML(m[1]))
+        if embedded('youtube'):
+            matches = re.findall(r'''(?x)
+                (?:
+                    <iframe[^>]+?src=|
+                    data-video-url=|
+                    <embed[^>]+?src=|
+                    embedSWF\(?:\s*|
+                    new\s+SWFObject\(
+                )
+                (["\'])
+                    (?P<url>(?:https?:)?//(?:www\.)?youtube(?:-nocookie)?\.com/
+                    (?:embed|v|p)/.+?)
+                \1''', webpage)
+            if matches:
+                return _playlist_from_matches(
+                    matches, lambda m: unescapeHTML(m[1]))
 
         # Look for lazyYT YouTube embed
-        matches = re.findall(
-            r'class="lazyYT" data-youtube-id="([^"]+)"', webpage)
-        if matches:
-            return _playlist_from_matches(matches, lambda m: unescapeHTML(m))
+        if embedded('lazyyt'):
+            matches = re.findall(
+                r'class="lazyYT" data-youtube-id="([^"]+)"', webpage)
+            if matches:
+                return _playlist_from_matches(matches, lambda m: unescapeHTML(m))
 
         # Look for Wordpress "YouTube Video Importer" plugin
-        matches = re.findall(r'''(?x)<div[^>]+
-            class=(?P<q1>[\'"])[^\'"]*\byvii_single_video_player\b[^\'"]*(?P=q1)[^>]+
-            data-video_id=(?P<q2>[\'"])([^\'"]+)(?P=q2)''', webpage)
-        if matches:
-            return _playlist_from_matches(matches, lambda m: m[-1])
-
-        matches = DailymotionIE._extract_urls(webpage)
-        if matches:
-            return _playlist_from_matches(matches)
+        if embedded('yvii_single_video_player'):
+            matches = re.findall(r'''(?x)<div[^>]+
+                class=(?P<q1>[\'"])[^\'"]*\byvii_single_video_player\b[^\'"]*(?P=q1)[^>]+
+                data-video_id=(?P<q2>[\'"])([^\'"]+)(?P=q2)''', webpage)
+            if matches:
+                return _playlist_from_matches(matches, lambda m: m[-1])
+
+        if embedded('dailymotion.com/'):
+            matches = DailymotionIE._extract_urls(webpage)
+            if matches:
+                return _playlist_from_matches(matches)
 
         # Look for embedded Dailymotion playlist player (#3822)
-        m = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//(?:www\.)?dailymotion\.[a-z]{2,3}/widget/jukebox\?.+?)\1', webpage)
-        if m:
-            playlists = re.findall(
-                r'list\[\]=/playlist/([^/]+)/', unescapeHTML(m.group('url')))
-            if playlists:
-                return _playlist_from_matches(
-                    playlists, lambda p: '//dailymotion.com/playlist/%s' % p)
+        if embedded('/widget/jukebox?'):
+            m = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//(?:www\.)?dailymotion\.[a-z]{2,3}/widget/jukebox\?.+?)\1', webpage)
+            if m:
+                playlists = re.findall(
+                    r'list\[\]=/playlist/([^/]+)/', unescapeHTML(m.group('url')))
+                if playlists:
+                    return _playlist_from_matches(
+                        playlists, lambda p: '//dailymotion.com/playlist/%s' % p)
 
         # Look for embedded Wistia player
-        match = re.search(
-            r'<(?:meta[^>]+?content|iframe[^>]+?src)=(["\'])(?P<url>(?:https?:)?//(?:fast\.)?wistia\.net/embed/iframe/.+?)\1', webpage)
-        if match:
-            embed_url = self._proto_relative_url(
-                unescapeHTML(match.group('url')))
-            return {
-                '_type': 'url_transparent',
-                'url': embed_url,
-                'ie_key': 'Wistia',
-                'uploader': video_uploader,
-            }
+        if embedded('wistia.net/embed/iframe/'):
+            match = re.search(
+                r'<(?:meta[^>]+?content|iframe[^>]+?src)=(["\'])(?P<url>(?:https?:)?//(?:fast\.)?wistia\.net/embed/iframe/.+?)\1', webpage)
+            if match:
+                embed_url = self._proto_relative_url(
+                    unescapeHTML(match.group('url')))
+                return {
+                    '_type': 'url_transparent',
+                    'url': embed_url,
+                    'ie_key': 'Wistia',
+                    'uploader': video_uploader,
+                }
 
-        match = re.search(r'(?:id=["\']wistia_|data-wistia-?id=["\']|Wistia\.embed\(["\'])(?P<id>[^"\']+)', webpage)
-        if match:
-            return {
-                '_type': 'url_transparent',
-                'url': 'wistia:%s' % match.group('id'),
-                'ie_key': 'Wistia',
-                'uploader': video_uploader,
-            }
+        if embedded('wistia'):
+            match = re.search(r'(?:id=["\']wistia_|data-wistia-?id=["\']|Wistia\.embed\(["\'])(?P<id>[^"\']+)', webpage)
+            if match:
+                return {
+                    '_type': 'url_transparent',
+                    'url': 'wistia:%s' % match.group('id'),
+                    'ie_key': 'Wistia',
+                    'uploader': video_uploader,
+                }
 
-        match = re.search(
-            r'''(?sx)
-                <script[^>]+src=(["'])(?:https?:)?//fast\.wistia\.com/assets/external/E-v1\.js\1[^>]*>.*?
-                <div[^>]+class=(["']).*?\bwistia_async_(?P<id>[a-z0-9]+)\b.*?\2
-            ''', webpage)
-        if match:
-            return self.url_result(self._proto_relative_url(
-                'wistia:%s' % match.group('id')), 'Wistia')
+        if embedded('fast.wistia.com/assets/external/e-v1.js'):
+            match = re.search(
+                r'''(?sx)
+                    <script[^>]+src=(["'])(?:https?:)?//fast\.wistia\.com/assets/external/E-v1\.js\1[^>]*>.*?
+                    <div[^>]+class=(["']).*?\bwistia_async_(?P<id>[a-z0-9]+)\b.*?\2
+                ''', webpage)
+            if match:
+                return self.url_result(self._proto_relative_url(
+                    'wistia:%s' % match.group('id')), 'Wistia')
 
         # Look for SVT player
-        svt_url = SVTIE._extract_url(webpage)
-        if svt_url:
-            return self.url_result(svt_url, 'SVT')
+        if embedded('svt.se/wd?'):
+            svt_url = SVTIE._extract_url(webpage)
+            if svt_url:
+                return self.url_result(svt_url, 'SVT')
 
         # Look for embedded condenast player
-        matches = re.findall(
-            r'<iframe\s+(?:[a-zA-Z-]+="[^"]+"\s+)*?src="(https?://player\.cnevids\.com/embed/[^"]+")',
-            webpage)
-        if matches:
-            return {
-                '_type': 'playlist',
-                'entries': [{
-                    '_type': 'url',
-                    'ie_key': 'CondeNast',
-                    'url': ma,
-                } for ma in matches],
-                'title': video_title,
-                'id': video_id,
-            }
+        if embedded('player.cnevids.com/embed/'):
+            matches = re.findall(
+                r'<iframe\s+(?:[a-zA-Z-]+="[^"]+"\s+)*?src="(https?://player\.cnevids\.com/embed/[^"]+")',
+                webpage)
+            if matches:
+                return {
+                    '_type': 'playlist',
+                    'entries': [{
+                        '_type': 'url',
+                        'ie_key': 'CondeNast',
+                        'url': ma,
+                    } for ma in matches],
+                    'title': video_title,
+                    'id': video_id,
+                }
 
         # Look for Bandcamp pages with custom domain
-        mobj = re.search(r'<meta property="og:url"[^>]*?content="(.*?bandcamp\.com.*?)"', webpage)
-        if mobj is not None:
-            burl = unescapeHTML(mobj.group(1))
-            # Don't set the extractor because it can be a track url or an album
-            return self.url_result(burl)
+        if embedded('bandcamp.com'):
+            mobj = re.search(r'<meta property="og:url"[^>]*?content="(.*?bandcamp\.com.*?)"', webpage)
+            if mobj is not None:
+                burl = unescapeHTML(mobj.group(1))
+                # Don't set the extractor because it can be a track url or an album
+                return self.url_result(burl)
 
         # Look for embedded Vevo player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//(?:cache\.)?vevo\.com/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('vevo.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//(?:cache\.)?vevo\.com/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for embedded Viddler player
-        mobj = re.search(
-            r'<(?:iframe[^>]+?src|param[^>]+?value)=(["\'])(?P<url>(?:https?:)?//(?:www\.)?viddler\.com/(?:embed|player)/.+?)\1',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('viddler.com/'):
+            mobj = re.search(
+                r'<(?:iframe[^>]+?src|param[^>]+?value)=(["\'])(?P<url>(?:https?:)?//(?:www\.)?viddler\.com/(?:embed|player)/.+?)\1',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for NYTimes player
-        mobj = re.search(
-            r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//graphics8\.nytimes\.com/bcvideo/[^/]+/iframe/embed\.html.+?)\1>',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('graphics8.nytimes.com/bcvideo/'):
+            mobj = re.search(
+                r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//graphics8\.nytimes\.com/bcvideo/[^/]+/iframe/embed\.html.+?)\1>',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for Libsyn player
-        mobj = re.search(
-            r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//html5-player\.libsyn\.com/embed/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('html5-player.libsyn.com/embed/'):
+            mobj = re.search(
+                r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//html5-player\.libsyn\.com/embed/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for Ooyala videos
-        mobj = (re.search(r'player\.ooyala\.com/[^"?]+[?#][^"]*?(?:embedCode|ec)=(?P<ec>[^"&]+)', webpage) or
-                re.search(r'OO\.Player\.create\([\'"].*?[\'"],\s*[\'"](?P<ec>.{32})[\'"]', webpage) or
-                re.search(r'SBN\.VideoLinkset\.ooyala\([\'"](?P<ec>.{32})[\'"]\)', webpage) or
-                re.search(r'data-ooyala-video-id\s*=\s*[\'"](?P<ec>.{32})[\'"]', webpage))
-        if mobj is not None:
-            return OoyalaIE._build_url_result(smuggle_url(mobj.group('ec'), {'domain': url}))
+        if embedded('ooyala', 'oo.player.create('):
+            mobj = (re.search(r'player\.ooyala\.com/[^"?]+[?#][^"]*?(?:embedCode|ec)=(?P<ec>[^"&]+)', webpage) or
+                    re.search(r'OO\.Player\.create\([\'"].*?[\'"],\s*[\'"](?P<ec>.{32})[\'"]', webpage) or
+                    re.search(r'SBN\.VideoLinkset\.ooyala\([\'"](?P<ec>.{32})[\'"]\)', webpage) or
+                    re.search(r'data-ooyala-video-id\s*=\s*[\'"](?P<ec>.{32})[\'"]', webpage))
+            if mobj is not None:
+                return OoyalaIE._build_url_result(smuggle_url(mobj.group('ec'), {'domain': url}))
 
         # Look for multiple Ooyala embeds on SBN network websites
-        mobj = re.search(r'SBN\.VideoLinkset\.entryGroup\((\[.*?\])', webpage)
-        if mobj is not None:
-            embeds = self._parse_json(mobj.group(1), video_id, fatal=False)
-            if embeds:
-                return _playlist_from_matches(
-                    embeds, getter=lambda v: OoyalaIE._url_for_embed_code(smuggle_url(v['provider_video_id'], {'domain': url})), ie='Ooyala')
+        if embedded('sbn.videolinkset.entrygroup('):
+            mobj = re.search(r'SBN\.VideoLinkset\.entryGroup\((\[.*?\])', webpage)
+            if mobj is not None:
+                embeds = self._parse_json(mobj.group(1), video_id, fatal=False)
+                if embeds:
+                    return _playlist_from_matches(
+                        embeds, getter=lambda v: OoyalaIE._url_for_embed_code(smuggle_url(v['provider_video_id'], {'domain': url})), ie='Ooyala')
 
         # Look for Aparat videos
-        mobj = re.search(r'<iframe .*?src="(http://www\.aparat\.com/video/[^"]+)"', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group(1), 'Aparat')
+        if embedded('www.aparat.com/video/'):
+            mobj = re.search(r'<iframe .*?src="(http://www\.aparat\.com/video/[^"]+)"', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group(1), 'Aparat')
 
         # Look for MPORA videos
-        mobj = re.search(r'<iframe .*?src="(http://mpora\.(?:com|de)/videos/[^"]+)"', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group(1), 'Mpora')
+        if embedded('mpora.'):
+            mobj = re.search(r'<iframe .*?src="(http://mpora\.(?:com|de)/videos/[^"]+)"', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group(1), 'Mpora')
 
         # Look for embedded NovaMov-based player
-        mobj = re.search(
-            r'''(?x)<(?:pagespeed_)?iframe[^>]+?src=(["\'])
-                    (?P<url>http://(?:(?:embed|www)\.)?
-                        (?:novamov\.com|
-                           nowvideo\.(?:ch|sx|eu|at|ag|co)|
-                           videoweed\.(?:es|com)|
-                           movshare\.(?:net|sx|ag)|
-                           divxstage\.(?:eu|net|ch|co|at|ag))
-                        /embed\.php.+?)\1''', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('/embed.php'):
+            mobj = re.search(
+                r'''(?x)<(?:pagespeed_)?iframe[^>]+?src=(["\'])
+                        (?P<url>http://(?:(?:embed|www)\.)?
+                            (?:novamov\.com|
+                               nowvideo\.(?:ch|sx|eu|at|ag|co)|
+                               videoweed\.(?:es|com)|
+                               movshare\.(?:net|sx|ag)|
+                               divxstage\.(?:eu|net|ch|co|at|ag))
+                            /embed\.php.+?)\1''', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for embedded Facebook player
-        facebook_url = FacebookIE._extract_url(webpage)
-        if facebook_url is not None:
-            return self.url_result(facebook_url, 'Facebook')
+        if embedded('facebook'):
+            facebook_url = FacebookIE._extract_url(webpage)
+            if facebook_url is not None:
+                return self.url_result(facebook_url, 'Facebook')
 
         # Look for embedded VK player
-        mobj = re.search(r'<iframe[^>]+?src=(["\'])(?P<url>https?://vk\.com/video_ext\.php.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'VK')
+        if embedded('vk.com/video_ext.php'):
+            mobj = re.search(r'<iframe[^>]+?src=(["\'])(?P<url>https?://vk\.com/video_ext\.php.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'VK')
 
         # Look for embedded Odnoklassniki player
-        mobj = re.search(r'<iframe[^>]+?src=(["\'])(?P<url>https?://(?:odnoklassniki|ok)\.ru/videoembed/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Odnoklassniki')
+        if embedded('.ru/videoembed/'):
+            mobj = re.search(r'<iframe[^>]+?src=(["\'])(?P<url>https?://(?:odnoklassniki|ok)\.ru/videoembed/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Odnoklassniki')
 
         # Look for embedded ivi player
-        mobj = re.search(r'<embed[^>]+?src=(["\'])(?P<url>https?://(?:www\.)?ivi\.ru/video/player.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Ivi')
+        if embedded('ivi.ru/video/player'):
+            mobj = re.search(r'<embed[^>]+?src=(["\'])(?P<url>https?://(?:www\.)?ivi\.ru/video/player.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Ivi')
 
         # Look for embedded Huffington Post player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>https?://embed\.live\.huffingtonpost\.com/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'HuffPost')
+        if embedded('embed.live.huffingtonpost.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>https?://embed\.live\.huffingtonpost\.com/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'HuffPost')
 
         # Look for embed.ly
-        mobj = re.search(r'class=["\']embedly-card["\'][^>]href=["\'](?P<url>[^"\']+)', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
-        mobj = re.search(r'class=["\']embedly-embed["\'][^>]src=["\'][^"\']*url=(?P<url>[^&]+)', webpage)
-        if mobj is not None:
-            return self.url_result(compat_urllib_parse_unquote(mobj.group('url')))
+        if embedded('embedly-'):
+            mobj = re.search(r'class=["\']embedly-card["\'][^>]href=["\'](?P<url>[^"\']+)', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
+            mobj = re.search(r'class=["\']embedly-embed["\'][^>]src=["\'][^"\']*url=(?P<url>[^&]+)', webpage)
+            if mobj is not None:
+                return self.url_result(compat_urllib_parse_unquote(mobj.group('url')))
 
         # Look for funnyordie embed
-        matches = re.findall(r'<iframe[^>]+?src="(https?://(?:www\.)?funnyordie\.com/embed/[^"]+)"', webpage)
-        if matches:
-            return _playlist_from_matches(
-                matches, getter=unescapeHTML, ie='FunnyOrDie')
+        if embedded('funnyordie.com/embed/'):
+            matches = re.findall(r'<iframe[^>]+?src="(https?://(?:www\.)?funnyordie\.com/embed/[^"]+)"', webpage)
+            if matches:
+                return _playlist_from_matches(
+                    matches, getter=unescapeHTML, ie='FunnyOrDie')
 
         # Look for BBC iPlayer embed
-        matches = re.findall(r'setPlaylist\("(https?://www\.bbc\.co\.uk/iplayer/[^/]+/[\da-z]{8})"\)', webpage)
-        if matches:
-            return _playlist_from_matches(matches, ie='BBCCoUk')
+        if embedded('bbc.co.uk/iplayer/'):
+            matches = re.findall(r'setPlaylist\("(https?://www\.bbc\.co\.uk/iplayer/[^/]+/[\da-z]{8})"\)', webpage)
+            if matches:
+                return _playlist_from_matches(matches, ie='BBCCoUk')
 
         # Look for embedded RUTV player
-        rutv_url = RUTVIE._extract_url(webpage)
-        if rutv_url:
-            return self.url_result(rutv_url, 'RUTV')
+        if embedded('player.rutv.ru/', 'player.vgtrk.com/'):
+            rutv_url = RUTVIE._extract_url(webpage)
+            if rutv_url:
+                return self.url_result(rutv_url, 'RUTV')
 
         # Look for embedded TVC player
-        tvc_url = TVCIE._extract_url(webpage)
-        if tvc_url:
-            return self.url_result(tvc_url, 'TVC')
+        if embedded('tvc.ru/video/iframe/id/'):
+            tvc_url = TVCIE._extract_url(webpage)
+            if tvc_url:
+                return self.url_result(tvc_url, 'TVC')
 
         # Look for embedded SportBox player
-        sportbox_urls = SportBoxEmbedIE._extract_urls(webpage)
-        if sportbox_urls:
-            return _playlist_from_matches(sportbox_urls, ie='SportBoxEmbed')
+        if embedded('news.sportbox.ru/vdl/player'):
+            sportbox_urls = SportBoxEmbedIE._extract_urls(webpage)
+            if sportbox_urls:
+                return _playlist_from_matches(sportbox_urls, ie='SportBoxEmbed')
 
         # Look for embedded PornHub player
-        pornhub_url = PornHubIE._extract_url(webpage)
-        if pornhub_url:
-            return self.url_result(pornhub_url, 'PornHub')
+        if embedded('pornhub.com/embed/'):
+            pornhub_url = PornHubIE._extract_url(webpage)
+            if pornhub_url:
+                return self.url_result(pornhub_url, 'PornHub')
 
         # Look for embedded XHamster player
-        xhamster_urls = XHamsterEmbedIE._extract_urls(webpage)
-        if xhamster_urls:
-            return _playlist_from_matches(xhamster_urls, ie='XHamsterEmbed')
+        if embedded('xhamster.com/xembed.php?video='):
+            xhamster_urls = XHamsterEmbedIE._extract_urls(webpage)
+            if xhamster_urls:
+                return _playlist_from_matches(xhamster_urls, ie='XHamsterEmbed')
 
         # Look for embedded TNAFlixNetwork player
-        tnaflix_urls = TNAFlixNetworkEmbedIE._extract_urls(webpage)
-        if tnaflix_urls:
-            return _playlist_from_matches(tnaflix_urls, ie=TNAFlixNetworkEmbedIE.ie_key())
+        if embedded('flix.com/video/'):
+            tnaflix_urls = TNAFlixNetworkEmbedIE._extract_urls(webpage)
+            if tnaflix_urls:
+                return _playlist_from_matches(tnaflix_urls, ie=TNAFlixNetworkEmbedIE.ie_key())
 
         # Look for embedded Tvigle player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//cloud\.tvigle\.ru/video/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Tvigle')
+        if embedded('cloud.tvigle.ru/video/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?:)?//cloud\.tvigle\.ru/video/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Tvigle')
 
         # Look for embedded TED player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>https?://embed(?:-ssl)?\.ted\.com/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'TED')
+        if embedded('.ted.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>https?://embed(?:-ssl)?\.ted\.com/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'TED')
 
         # Look for embedded Ustream videos
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>http://www\.ustream\.tv/embed/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Ustream')
+        if embedded('www.ustream.tv/embed/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>http://www\.ustream\.tv/embed/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Ustream')
 
         # Look for embedded arte.tv player
-        mobj = re.search(
-            r'<(?:script|iframe) [^>]*?src="(?P<url>http://www\.arte\.tv/(?:playerv2/embed|arte_vp/index)[^"]+)"',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'ArteTVEmbed')
+        if embedded('www.arte.tv/'):
+            mobj = re.search(
+                r'<(?:script|iframe) [^>]*?src="(?P<url>http://www\.arte\.tv/(?:playerv2/embed|arte_vp/index)[^"]+)"',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'ArteTVEmbed')
 
         # Look for embedded francetv player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?://)?embed\.francetv\.fr/\?ue=.+?)\1',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('embed.francetv.fr/?ue='):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>(?:https?://)?embed\.francetv\.fr/\?ue=.+?)\1',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for embedded smotri.com player
-        smotri_url = SmotriIE._extract_url(webpage)
-        if smotri_url:
-            return self.url_result(smotri_url, 'Smotri')
+        if embedded('smotri.com/'):
+            smotri_url = SmotriIE._extract_url(webpage)
+            if smotri_url:
+                return self.url_result(smotri_url, 'Smotri')
 
         # Look for embedded Myvi.ru player
-        myvi_url = MyviIE._extract_url(webpage)
-        if myvi_url:
-            return self.url_result(myvi_url)
+        if embedded('myvi.'):
+            myvi_url = MyviIE._extract_url(webpage)
+            if myvi_url:
+                return self.url_result(myvi_url)
 
         # Look for embedded soundcloud player
-        mobj = re.search(
-            r'<iframe\s+(?:[a-zA-Z0-9_-]+="[^"]+"\s+)*src="(?P<url>https?://(?:w\.)?soundcloud\.com/player[^"]+)"',
-            webpage)
-        if mobj is not None:
-            url = unescapeHTML(mobj.group('url'))
-            return self.url_result(url)
+        if embedded('soundcloud.com/player'):
+            mobj = re.search(
+                r'<iframe\s+(?:[a-zA-Z0-9_-]+="[^"]+"\s+)*src="(?P<url>https?://(?:w\.)?soundcloud\.com/player[^"]+)"',
+                webpage)
+            if mobj is not None:
+                url = unescapeHTML(mobj.group('url'))
+                return self.url_result(url)
 
         # Look for embedded mtvservices player
-        mtvservices_url = MTVServicesEmbeddedIE._extract_url(webpage)
-        if mtvservices_url:
-            return self.url_result(mtvservices_url, ie='MTVServicesEmbedded')
+        if embedded('mtvnservices'):
+            mtvservices_url = MTVServicesEmbeddedIE._extract_url(webpage)
+            if mtvservices_url:
+                return self.url_result(mtvservices_url, ie='MTVServicesEmbedded')
 
         # Look for embedded yahoo player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>https?://(?:screen|movies)\.yahoo\.com/.+?\.html\?format=embed)\1',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Yahoo')
+        if embedded('yahoo.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>https?://(?:screen|movies)\.yahoo\.com/.+?\.html\?format=embed)\1',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Yahoo')
 
         # Look for embedded sbs.com.au player
-        mobj = re.search(
-            r'''(?x)
-            (?:
-                <meta\s+property="og:video"\s+content=|
-                <iframe[^>]+?src=
-            )
-            (["\'])(?P<url>https?://(?:www\.)?sbs\.com\.au/ondemand/video/.+?)\1''',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'SBS')
+        if embedded('sbs.com.au/ondemand/video/'):
+            mobj = re.search(
+                r'''(?x)
+                (?:
+                    <meta\s+property="og:video"\s+content=|
+                    <iframe[^>]+?src=
+                )
+                (["\'])(?P<url>https?://(?:www\.)?sbs\.com\.au/ondemand/video/.+?)\1''',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'SBS')
 
         # Look for embedded Cinchcast player
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>https?://player\.cinchcast\.com/.+?)\1',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Cinchcast')
-
-        mobj = re.search(
-            r'<iframe[^>]+?src=(["\'])(?P<url>https?://m(?:lb)?\.mlb\.com/shared/video/embed/embed\.html\?.+?)\1',
-            webpage)
-        if not mobj:
+        if embedded('player.cinchcast.com/'):
             mobj = re.search(
-                r'data-video-link=["\'](?P<url>http://m.mlb.com/video/[^"\']+)',
+                r'<iframe[^>]+?src=(["\'])(?P<url>https?://player\.cinchcast\.com/.+?)\1',
                 webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'MLB')
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Cinchcast')
 
-        mobj = re.search(
-            r'<(?:iframe|script)[^>]+?src=(["\'])(?P<url>%s)\1' % CondeNastIE.EMBED_URL,
-            webpage)
-        if mobj is not None:
-            return self.url_result(self._proto_relative_url(mobj.group('url'), scheme='http:'), 'CondeNast')
+        if embedded('mlb.com/shared/video/embed/embed.html?', 'data-video-link='):
+            mobj = re.search(
+                r'<iframe[^>]+?src=(["\'])(?P<url>https?://m(?:lb)?\.mlb\.com/shared/video/embed/embed\.html\?.+?)\1',
+                webpage)
+            if not mobj:
+                mobj = re.search(
+                    r'data-video-link=["\'](?P<url>http://m.mlb.com/video/[^"\']+)',
+                    webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'MLB')
+
+        if embedded('.com/embed'):
+            mobj = re.search(
+                r'<(?:iframe|script)[^>]+?src=(["\'])(?P<url>%s)\1' % CondeNastIE.EMBED_URL,
+                webpage)
+            if mobj is not None:
+                return self.url_result(self._proto_relative_url(mobj.group('url'), scheme='http:'), 'CondeNast')
 
-        mobj = re.search(
-            r'<iframe[^>]+src="(?P<url>https?://(?:new\.)?livestream\.com/[^"]+/player[^"]+)"',
-            webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Livestream')
+        if embedded('livestream.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+src="(?P<url>https?://(?:new\.)?livestream\.com/[^"]+/player[^"]+)"',
+                webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Livestream')
 
         # Look for Zapiks embed
-        mobj = re.search(
-            r'<iframe[^>]+src="(?P<url>https?://(?:www\.)?zapiks\.fr/index\.php\?.+?)"', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'), 'Zapiks')
+        if embedded('zapiks.fr/index.php?'):
+            mobj = re.search(
+                r'<iframe[^>]+src="(?P<url>https?://(?:www\.)?zapiks\.fr/index\.php\?.+?)"', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'), 'Zapiks')
 
         # Look for Kaltura embeds
-        kaltura_url = KalturaIE._extract_url(webpage)
-        if kaltura_url:
-            return self.url_result(smuggle_url(kaltura_url, {'source_url': url}), KalturaIE.ie_key())
+        if embedded('kwidget.', 'kaltura.com/'):
+            kaltura_url = KalturaIE._extract_url(webpage)
+            if kaltura_url:
+                return self.url_result(smuggle_url(kaltura_url, {'source_url': url}), KalturaIE.ie_key())
 
         # Look for Eagle.Platform embeds
-        eagleplatform_url = EaglePlatformIE._extract_url(webpage)
-        if eagleplatform_url:
-            return self.url_result(eagleplatform_url, EaglePlatformIE.ie_key())
+        if embedded('.media.eagleplatform.com/index/player?'):
+            eagleplatform_url = EaglePlatformIE._extract_url(webpage)
+            if eagleplatform_url:
+                return self.url_result(eagleplatform_url, EaglePlatformIE.ie_key())
 
         # Look for ClipYou (uses Eagle.Platform) embeds
-        mobj = re.search(
-            r'<iframe[^>]+src="https?://(?P<host>media\.clipyou\.ru)/index/player\?.*\brecord_id=(?P<id>\d+).*"', webpage)
-        if mobj is not None:
-            return self.url_result('eagleplatform:%(host)s:%(id)s' % mobj.groupdict(), 'EaglePlatform')
+        if embedded('media.clipyou.ru/index/player?'):
+            mobj = re.search(
+                r'<iframe[^>]+src="https?://(?P<host>media\.clipyou\.ru)/index/player\?.*\brecord_id=(?P<id>\d+).*"', webpage)
+            if mobj is not None:
+                return self.url_result('eagleplatform:%(host)s:%(id)s' % mobj.groupdict(), 'EaglePlatform')
 
         # Look for Pladform embeds
-        pladform_url = PladformIE._extract_url(webpage)
-        if pladform_url:
-            return self.url_result(pladform_url)
+        if embedded('out.pladform.ru/player?'):
+            pladform_url = PladformIE._extract_url(webpage)
+            if pladform_url:
+                return self.url_result(pladform_url)
 
         # Look for Videomore embeds
-        videomore_url = VideomoreIE._extract_url(webpage)
-        if videomore_url:
-            return self.url_result(videomore_url)
+        if embedded('videomore'):
+            videomore_url = VideomoreIE._extract_url(webpage)
+            if videomore_url:
+                return self.url_result(videomore_url)
 
         # Look for Playwire embeds
-        mobj = re.search(
-            r'<script[^>]+data-config=(["\'])(?P<url>(?:https?:)?//config\.playwire\.com/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('config.playwire.com/'):
+            mobj = re.search(
+                r'<script[^>]+data-config=(["\'])(?P<url>(?:https?:)?//config\.playwire\.com/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for 5min embeds
-        mobj = re.search(
-            r'<meta[^>]+property="og:video"[^>]+content="https?://embed\.5min\.com/(?P<id>[0-9]+)/?', webpage)
-        if mobj is not None:
-            return self.url_result('5min:%s' % mobj.group('id'), 'FiveMin')
+        if embedded('embed.5min.com/'):
+            mobj = re.search(
+                r'<meta[^>]+property="og:video"[^>]+content="https?://embed\.5min\.com/(?P<id>[0-9]+)/?', webpage)
+            if mobj is not None:
+                return self.url_result('5min:%s' % mobj.group('id'), 'FiveMin')
 
         # Look for Crooks and Liars embeds
-        mobj = re.search(
-            r'<(?:iframe[^>]+src|param[^>]+value)=(["\'])(?P<url>(?:https?:)?//embed\.crooksandliars\.com/(?:embed|v)/.+?)\1', webpage)
-        if mobj is not None:
-            return self.url_result(mobj.group('url'))
+        if embedded('embed.crooksandliars.com/'):
+            mobj = re.search(
+                r'<(?:iframe[^>]+src|param[^>]+value)=(["\'])(?P<url>(?:https?:)?//embed\.crooksandliars\.com/(?:embed|v)/.+?)\1', webpage)
+            if mobj is not None:
+                return self.url_result(mobj.group('url'))
 
         # Look for NBC Sports VPlayer embeds
-        nbc_sports_url = NBCSportsVPlayerIE._extract_url(webpage)
-        if nbc_sports_url:
-            return self.url_result(nbc_sports_url, 'NBCSportsVPlayer')
+        if embedded('vplayer.nbcsports.com/'):
+            nbc_sports_url = NBCSportsVPlayerIE._extract_url(webpage)
+            if nbc_sports_url:
+                return self.url_result(nbc_sports_url, 'NBCSportsVPlayer')
 
         # Look for NBC News embeds
-        nbc_news_embed_url = re.search(
-            r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//www\.nbcnews\.com/widget/video-embed/[^"\']+)\1', webpage)
-        if nbc_news_embed_url:
-            return self.url_result(nbc_news_embed_url.group('url'), 'NBCNews')
+        if embedded('www.nbcnews.com/widget/video-embed/'):
+            nbc_news_embed_url = re.search(
+                r'<iframe[^>]+src=(["\'])(?P<url>(?:https?:)?//www\.nbcnews\.com/widget/video-embed/[^"\']+)\1', webpage)
+            if nbc_news_embed_url:
+                return self.url_result(nbc_news_embed_url.group('url'), 'NBCNews')
 
         # Look for Google Drive embeds
-        google_drive_url = GoogleDriveIE._extract_url(webpage)
-        if google_drive_url:
-            return self.url_result(google_drive_url, 'GoogleDrive')
+        if embedded('google.com/'):
+            google_drive_url = GoogleDriveIE._extract_url(webpage)
+            if google_drive_url:
+                return self.url_result(google_drive_url, 'GoogleDrive')
 
         # Look for UDN embeds
-        mobj = re.search(
-            r'<iframe[^>]+src="(?P<url>%s)"' % UDNEmbedIE._PROTOCOL_RELATIVE_VALID_URL, webpage)
-        if mobj is not None:
-            return self.url_result(
-                compat_urlparse.urljoin(url, mobj.group('url')), 'UDNEmbed')
+        if embedded('video.udn.com/'):
+            mobj = re.search(
+                r'<iframe[^>]+src="(?P<url>%s)"' % UDNEmbedIE._PROTOCOL_RELATIVE_VALID_URL, webpage)
+            if mobj is not None:
+                return self.url_result(
+                    compat_urlparse.urljoin(url, mobj.group('url')), 'UDNEmbed')
 
         # Look for Senate ISVP iframe
-        senate_isvp_url = SenateISVPIE._search_iframe_url(webpage)
-        if senate_isvp_url:
-            return self.url_result(senate_isvp_url, 'SenateISVP')
+        if embedded('www.senate.gov/isvp'):
+            senate_isvp_url = SenateISVPIE._search_iframe_url(webpage)
+            if senate_isvp_url:
+                return self.url_result(senate_isvp_url, 'SenateISVP')
 
         # Look for Dailymotion Cloud videos
-        dmcloud_url = DailymotionCloudIE._extract_dmcloud_url(webpage)
-        if dmcloud_url:
-            return self.url_result(dmcloud_url, 'DailymotionCloud')
+        if embedded('api.dmcloud.net/'):
+            dmcloud_url = DailymotionCloudIE._extract_dmcloud_url(webpage)
+            if dmcloud_url:
+                return self.url_result(dmcloud_url, 'DailymotionCloud')
 
         # Look for OnionStudios embeds
-        onionstudios_url = OnionStudiosIE._extract_url(webpage)
-        if onionstudios_url:
-            return self.url_result(onionstudios_url)
+        if embedded('onionstudios.com/embed'):
+            onionstudios_url = OnionStudiosIE._extract_url(webpage)
+            if onionstudios_url:
+                return self.url_result(onionstudios_url)
 
         # Look for ViewLift embeds
-        viewlift_url = ViewLiftEmbedIE._extract_url(webpage)
-        if viewlift_url:
-            return self.url_result(viewlift_url)
+        if embedded('/embed/player'):
+            viewlift_url = ViewLiftEmbedIE._extract_url(webpage)
+            if viewlift_url:
+                return self.url_result(viewlift_url)
 
         # Look for JWPlatform embeds
-        jwplatform_url = JWPlatformIE._extract_url(webpage)
-        if jwplatform_url:
-            return self.url_result(jwplatform_url, 'JWPlatform')
+        if embedded('jwplatform'):
+            jwplatform_url = JWPlatformIE._extract_url(webpage)
+            if jwplatform_url:
+                return self.url_result(jwplatform_url, 'JWPlatform')
 
         # Look for ScreenwaveMedia embeds
-        mobj = re.search(ScreenwaveMediaIE.EMBED_PATTERN, webpage)
-        if mobj is not None:
-            return self.url_result(unescapeHTML(mobj.group('url')), 'ScreenwaveMedia')
+        if embedded('screenwavemedia.com/'):
+            mobj = re.search(ScreenwaveMediaIE.EMBED_PATTERN, webpage)
+            if mobj is not None:
+                return self.url_result(unescapeHTML(mobj.group('url')), 'ScreenwaveMedia')
 
         # Look for Digiteka embeds
-        digiteka_url = DigitekaIE._extract_url(webpage)
-        if digiteka_url:
-            return self.url_result(self._proto_relative_url(digiteka_url), DigitekaIE.ie_key())
+        if embedded('ultimedia.com/deliver/'):
+            digiteka_url = DigitekaIE._extract_url(webpage)
+            if digiteka_url:
+                return self.url_result(self._proto_relative_url(digiteka_url), DigitekaIE.ie_key())
 
         # Look for Arkena embeds
-        arkena_url = ArkenaIE._extract_url(webpage)
-        if arkena_url:
-            return self.url_result(arkena_url, ArkenaIE.ie_key())
+        if embedded('play.arkena.com/embed/avp/'):
+            arkena_url = ArkenaIE._extract_url(webpage)
+            if arkena_url:
+                return self.url_result(arkena_url, ArkenaIE.ie_key())
 
         # Look for Limelight embeds
-        mobj = re.search(r'LimelightPlayer\.doLoad(Media|Channel|ChannelList)\(["\'](?P<id>[a-z0-9]{32})', webpage)
-        if mobj:
-            lm = {
-                'Media': 'media',
-                'Channel': 'channel',
-                'ChannelList': 'channel_list',
-            }
-            return self.url_result('limelight:%s:%s' % (
-                lm[mobj.group(1)], mobj.group(2)), 'Limelight%s' % mobj.group(1), mobj.group(2))
+        if embedded('limelightplayer.doload'):
+            mobj = re.search(r'LimelightPlayer\.doLoad(Media|Channel|ChannelList)\(["\'](?P<id>[a-z0-9]{32})', webpage)
+            if mobj:
+                lm = {
+                    'Media': 'media',
+                    'Channel': 'channel',
+                    'ChannelList': 'channel_list',
+                }
+                return self.url_result('limelight:%s:%s' % (
+                    lm[mobj.group(1)], mobj.group(2)), 'Limelight%s' % mobj.group(1), mobj.group(2))
 
         # Look for AdobeTVVideo embeds
-        mobj = re.search(
-            r'<iframe[^>]+src=[\'"]((?:https?:)?//video\.tv\.adobe\.com/v/\d+[^"]+)[\'"]',
-            webpage)
-        if mobj is not None:
-            return self.url_result(
-                self._proto_relative_url(unescapeHTML(mobj.group(1))),
-                'AdobeTVVideo')
+        if embedded('video.tv.adobe.com/v/'):
+            mobj = re.search(
+                r'<iframe[^>]+src=[\'"]((?:https?:)?//video\.tv\.adobe\.com/v/\d+[^"]+)[\'"]',
+                webpage)
+            if mobj is not None:
+                return self.url_result(
+                    self._proto_relative_url(unescapeHTML(mobj.group(1))),
+                    'AdobeTVVideo')
 
         # Look for Vine embeds
-        mobj = re.search(
-            r'<iframe[^>]+src=[\'"]((?:https?:)?//(?:www\.)?vine\.co/v/[^/]+/embed/(?:simple|postcard))',
-            webpage)
-        if mobj is not None:
-            return self.url_result(
-                self._proto_relative_url(unescapeHTML(mobj.group(1))), 'Vine')
+        if embedded('vine.co/v/'):
+            mobj = re.search(
+                r'<iframe[^>]+src=[\'"]((?:https?:)?//(?:www\.)?vine\.co/v/[^/]+/embed/(?:simple|postcard))',
+                webpage)
+            if mobj is not None:
+                return self.url_result(
+                    self._proto_relative_url(unescapeHTML(mobj.group(1))), 'Vine')
 
         # Look for Instagram embeds
-        instagram_embed_url = InstagramIE._extract_embed_url(webpage)
-        if instagram_embed_url is not None:
-            return self.url_result(
-                self._proto_relative_url(instagram_embed_url), InstagramIE.ie_key())
+        if embedded('instagram'):
+            instagram_embed_url = InstagramIE._extract_embed_url(webpage)
+            if instagram_embed_url is not None:
+                return self.url_result(
+                    self._proto_relative_url(instagram_embed_url), InstagramIE.ie_key())
 
         # Look for LiveLeak embeds
-        liveleak_url = LiveLeakIE._extract_url(webpage)
-        if liveleak_url:
-            return self.url_result(liveleak_url, 'LiveLeak')
+        if embedded('liveleak.com/ll_embed?'):
+            liveleak_url = LiveLeakIE._extract_url(webpage)
+            if liveleak_url:
+                return self.url_result(liveleak_url, 'LiveLeak')
 
         # Look for 3Q SDN embeds
-        threeqsdn_url = ThreeQSDNIE._extract_url(webpage)
-        if threeqsdn_url:
-            return {
-                '_type': 'url_transparent',
-                'ie_key': ThreeQSDNIE.ie_key(),
-                'url': self._proto_relative_url(threeqsdn_url),
-                'title': video_title,
-                'description': video_description,
-                'thumbnail': video_thumbnail,
-                'uploader': video_uploader,
-            }
+        if embedded('playout.3qsdn.com/'):
+            threeqsdn_url = ThreeQSDNIE._extract_url(webpage)
+            if threeqsdn_url:
+                return {
+                    '_type': 'url_transparent',
+                    'ie_key': ThreeQSDNIE.ie_key(),
+                    'url': self._proto_relative_url(threeqsdn_url),
+                    'title': video_title,
+                    'description': video_description,
+                    'thumbnail': video_thumbnail,
+                    'uploader': video_uploader,
+                }
 
         # Looking for http://schema.org/VideoObject
         json_ld = self._search_json_ld(
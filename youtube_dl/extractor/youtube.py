@@ -3,6 +3,7 @@
 from __future__ import unicode_literals
 
 
+import base64
 import itertools
 import json
 import os.path
@@ -383,6 +384,8 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         '_rtmp': {'protocol': 'rtmp'},
     }
     _SUBTITLE_FORMATS = ('ttml', 'vtt')
+    # Number of players kept in the youtube-players cache section
+    _PLAYER_CACHE_MAX_ENTRIES = 10
 
     IE_NAME = 'youtube'
     _TESTS = [
@@ -907,6 +910,53 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
         if cache_spec is not None:
             return lambda s: ''.join(s[i] for i in cache_spec)
 
+        test_string = ''.join(map(compat_chr, range(len(example_sig))))
+
+        # The player may have been stored for another signature length
+        player_key = '%s_%s' % (player_type, player_id)
+        res = self._load_sig_player(player_type, player_key, test_string)
+        if res is None:
+            res = self._download_sig_player(
+                video_id, player_url, player_type, player_id, player_key, test_string)
+
+        cache_res = res(test_string)
+        cache_spec = [ord(c) for c in cache_res]
+
+        self._downloader.cache.store('youtube-sigfuncs', func_id, cache_spec)
+        return res
+
+    def _load_sig_player(self, player_type, player_key, test_string):
+        """Get the signature function from the youtube-players cache
+
+        The code of the functions extracted from a JS player is tried first,
+        then the whole player. Returns None if the player is not in the
+        cache or its signature function does not work.
+        """
+        player = self._downloader.cache.load('youtube-players', player_key)
+        if player is None:
+            return None
+        try:
+            if player_type == 'js':
+                funcname = player['funcname']
+                sources = [player['functions'], player['source']]
+            else:
+                sources = [base64.b64decode(player['source'].encode('ascii'))]
+        except (KeyError, AttributeError, TypeError, ValueError):
+            return None
+        for source in sources:
+            try:
+                if player_type == 'js':
+                    res = self._sig_js_function(JSInterpreter(source), funcname)
+                else:
+                    res = self._parse_sig_swf(source)
+                res(test_string)
+                return res
+            except Exception:
+                continue
+        return None
+
+    def _download_sig_player(self, video_id, player_url, player_type, player_id, player_key, test_string):
+        """Download the player and store it in the youtube-players cache"""
         download_note = (
             'Downloading player %s' % player_url
             if self._downloader.params.get('verbose') else
@@ -917,7 +967,16 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
                 player_url, video_id,
                 note=download_note,
                 errnote='Download of %s failed' % player_url)
-            res = self._parse_sig_js(code)
+            funcname = self._search_sig_js_funcname(code)
+            jsi = JSInterpreter(code)
+            res = self._sig_js_function(jsi, funcname)
+            # Extract the functions used by the signature function
+            res(test_string)
+            player = {
+                'funcname': funcname,
+                'functions': jsi.extracted_code(),
+                'source': code,
+            }
         elif player_type == 'swf':
             urlh = self._request_webpage(
                 player_url, video_id,
@@ -925,14 +984,14 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
                 errnote='Download of %s failed' % player_url)
             code = urlh.read()
             res = self._parse_sig_swf(code)
+            player = {
+                'source': base64.b64encode(code).decode('ascii'),
+            }
         else:
             assert False, 'Invalid player type %r' % player_type
 
-        test_string = ''.join(map(compat_chr, range(len(example_sig))))
-        cache_res = res(test_string)
-        cache_spec = [ord(c) for c in cache_res]
-
-        self._downloader.cache.store('youtube-sigfuncs', func_id, cache_spec)
+        self._downloader.cache.store('youtube-players', player_key, player)
+        self._downloader.cache.prune('youtube-players', self._PLAYER_CACHE_MAX_ENTRIES)
         return res
 
     def _print_sig_code(self, func, example_sig):
@@ -974,15 +1033,20 @@ class YoutubeIE(YoutubeBaseInfoExtractor):
                 '    return %s\n') % (signature_id_tuple, expr_code)
         self.to_screen('Extracted signature function:\n' + code)
 
-    def _parse_sig_js(self, jscode):
-        funcname = self._search_regex(
+    def _search_sig_js_funcname(self, jscode):
+        return self._search_regex(
             r'\.sig\|\|([a-zA-Z0-9$]+)\(', jscode,
             'Initial JS player signature function name')
 
-        jsi = JSInterpreter(jscode)
+    @staticmethod
+    def _sig_js_function(jsi, funcname):
         initial_function = jsi.extract_function(funcname)
         return lambda s: initial_function([s])
 
+    def _parse_sig_js(self, jscode):
+        return self._sig_js_function(
+            JSInterpreter(jscode), self._search_sig_js_funcname(jscode))
+
     def _parse_sig_swf(self, file_contents):
         swfi = SWFInterpreter(file_contents)
         TARGET_CLASSNAME = 'SignatureDecipher'
@@ -1,30 +1,361 @@
 from __future__ import unicode_literals
 
-import json
 import operator
 import re
 
+from .compat import compat_chr
 from .utils import (
     ExtractorError,
 )
 
+# Binary operators, by increasing precedence
 _OPERATORS = [
-    ('|', operator.or_),
-    ('^', operator.xor),
-    ('&', operator.and_),
-    ('>>', operator.rshift),
-    ('<<', operator.lshift),
-    ('-', operator.sub),
-    ('+', operator.add),
-    ('%', operator.mod),
-    ('/', operator.truediv),
-    ('*', operator.mul),
+    [('|', operator.or_)],
+    [('^', operator.xor)],
+    [('&', operator.and_)],
+    [('>>', operator.rshift), ('<<', operator.lshift)],
+    [('-', operator.sub), ('+', operator.add)],
+    [('%', operator.mod), ('/', operator.truediv), ('*', operator.mul)],
 ]
-_ASSIGN_OPERATORS = [(op + '=', opfunc) for op, opfunc in _OPERATORS]
-_ASSIGN_OPERATORS.append(('=', lambda cur, right: right))
+_BINARY_OPERATORS = dict(
+    (op, (precedence, opfunc))
+    for precedence, level in enumerate(_OPERATORS) for op, opfunc in level)
+_ASSIGN_OPERATORS = dict(
+    (op + '=', opfunc) for level in _OPERATORS for op, opfunc in level)
+# The current value is not needed for a plain assignment
+_ASSIGN_OPERATORS['='] = None
+
+_CONSTANTS = {
+    'true': True,
+    'false': False,
+    'null': None,
+    'undefined': None,
+}
 
 _NAME_RE = r'[a-zA-Z_$][a-zA-Z_$0-9]*'
 
+_TOKEN_RE = re.compile(r'''(?sx)
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)|
+    (?P<number>0[xX][0-9a-fA-F]+|\d+(?:\.\d+)?)|
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|
+    (?P<name>%s)|
+    (?P<op>>>=|<<=|>>|<<|[-+*/%%&|^]=?|[=()\[\]{},;.])
+''' % _NAME_RE)
+
+# Function declarations and values that may be assigned to variables
+_SYMBOL_RE = re.compile(
+    r'function\s+(?P<function>%s)|=\s*(?:(?P<function_value>function\b)|\{)' % _NAME_RE)
+# The variable before the "=" of such an assignment, not a property
+_VARIABLE_RE = re.compile(r'(?<![.a-zA-Z_$0-9])(%s)\s*$' % _NAME_RE)
+_FUNCTION_RE = re.compile(r'\s*\((?P<args>[^)]*)\)\s*\{(?P<code>[^}]+)\}')
+_OBJECT_RE = re.compile(
+    r'\{\s*(?P<fields>([a-zA-Z$0-9]+\s*:\s*function\(.*?\)\s*\{.*?\}(?:,\s*)?)*)\}\s*;')
+
+_ESCAPE_RE = re.compile(r'(?s)\\(?:x([0-9a-fA-F]{2})|u([0-9a-fA-F]{4})|(.))')
+_ESCAPES = {
+    'b': '\b',
+    'f': '\f',
+    'n': '\n',
+    'r': '\r',
+    't': '\t',
+    'v': '\v',
+    '0': '\0',
+}
+
+
+def _unescape(m):
+    if m.group(3) is not None:
+        return _ESCAPES.get(m.group(3), m.group(3))
+    return compat_chr(int(m.group(1) or m.group(2), 16))
+
+
+def _tokenize(code):
+    """Split code into (kind, value) tokens, leaving out spaces and comments"""
+    tokens = []
+    pos = 0
+    while pos < len(code):
+        m = _TOKEN_RE.match(code, pos)
+        if m is None:
+            raise ExtractorError('Unsupported JS code %r' % code[pos:pos + 20])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'space':
+            continue
+        value = m.group(kind)
+        if kind == 'number':
+            if value[:2] in ('0x', '0X'):
+                value = int(value, 16)
+            else:
+                value = float(value) if '.' in value else int(value)
+        elif kind == 'string':
+            value = _ESCAPE_RE.sub(_unescape, value[1:-1])
+        tokens.append((kind, value))
+    return tokens
+
+
+def _call_method(obj, member, argvals):
+    if isinstance(obj, dict):
+        return obj[member](argvals)
+    if member == 'split':
+        assert argvals == ('',)
+        return list(obj)
+    if member == 'join':
+        assert len(argvals) == 1
+        return argvals[0].join(obj)
+    if member == 'reverse':
+        assert len(argvals) == 0
+        obj.reverse()
+        return obj
+    if member == 'slice':
+        assert len(argvals) in (1, 2)
+        return obj[argvals[0]:argvals[1] if len(argvals) == 2 else None]
+    if member == 'splice':
+        assert isinstance(obj, list)
+        index, howMany = argvals
+        res = []
+        for i in range(index, min(index + howMany, len(obj))):
+            res.append(obj.pop(index))
+        return res
+    return obj[member](argvals)
+
+
+def _get_member(obj, member):
+    if member == 'length':
+        return len(obj)
+    return obj[member]
+
+
+class _JSCompiler(object):
+    """Compile JS statements to Python closures
+
+    Expressions are compiled once to functions of the dictionary of local
+    variables returning their value. Parsing methods return these functions
+    along with a reference to what the expression designates, if it can be
+    assigned: ('name', name) or ('index', base, index).
+    """
+
+    def __init__(self, interpreter, code):
+        self._interpreter = interpreter
+        self._code = code
+        self._tokens = _tokenize(code)
+        self._pos = 0
+
+    def _error(self):
+        kind, value = self._peek()
+        return ExtractorError(
+            'Unsupported JS expression %r (at %r)' % (
+                self._code, 'end' if kind is None else value))
+
+    def _peek(self):
+        if self._pos < len(self._tokens):
+            return self._tokens[self._pos]
+        return None, None
+
+    def _accept(self, value, kind='op'):
+        if self._peek() == (kind, value):
+            self._pos += 1
+            return True
+        return False
+
+    def _expect(self, value):
+        if not self._accept(value):
+            raise self._error()
+
+    def _expect_name(self):
+        kind, value = self._peek()
+        if kind != 'name':
+            raise self._error()
+        self._pos += 1
+        return value
+
+    def compile_statements(self):
+        """Return a list of (function, is_return) pairs, one for each statement"""
+        statements = []
+        while self._pos < len(self._tokens):
+            if self._accept(';'):
+                continue
+            statements.append(self._statement())
+            if self._pos < len(self._tokens):
+                self._expect(';')
+        return statements
+
+    def _statement(self):
+        if self._accept('var', 'name'):
+            declarations = [self._declaration()]
+            while self._accept(','):
+                declarations.append(self._declaration())
+
+            def declare(local_vars):
+                for declaration in declarations:
+                    declaration(local_vars)
+            return declare, False
+        if self._accept('return', 'name'):
+            if self._peek() in ((None, None), ('op', ';')):
+                return (lambda local_vars: None), True
+            return self._expression()[0], True
+        return self._expression()[0], False
+
+    def _declaration(self):
+        name = self._expect_name()
+        if not self._accept('='):
+            return lambda local_vars: local_vars.setdefault(name)
+        return self._assignment(('name', name), None, self._expression()[0])
+
+    def _expression(self):
+        evaluate, ref = self._binary(0)
+        kind, value = self._peek()
+        if kind != 'op' or value not in _ASSIGN_OPERATORS:
+            return evaluate, ref
+        if ref is None:
+            raise self._error()
+        self._pos += 1
+        return self._assignment(
+            ref, _ASSIGN_OPERATORS[value], self._expression()[0]), None
+
+    @staticmethod
+    def _assignment(ref, opfunc, right):
+        if ref[0] == 'name':
+            name = ref[1]
+
+            def assign(local_vars):
+                if opfunc is None:
+                    val = right(local_vars)
+                else:
+                    val = opfunc(local_vars.get(name), right(local_vars))
+                local_vars[name] = val
+                return val
+        else:
+            base, index = ref[1:]
+
+            def assign(local_vars):
+                obj = base(local_vars)
+                idx = index(local_vars)
+                if opfunc is None:
+                    val = right(local_vars)
+                else:
+                    val = opfunc(obj[idx], right(local_vars))
+                obj[idx] = val
+                return val
+        return assign
+
+    def _binary(self, min_precedence):
+        evaluate, ref = self._unary()
+        while True:
+            kind, value = self._peek()
+            if kind != 'op' or value not in _BINARY_OPERATORS:
+                break
+            precedence, opfunc = _BINARY_OPERATORS[value]
+            if precedence < min_precedence:
+                break
+            self._pos += 1
+            right = self._binary(precedence + 1)[0]
+            evaluate, ref = self._apply(opfunc, evaluate, right), None
+        return evaluate, ref
+
+    @staticmethod
+    def _apply(opfunc, left, right):
+        return lambda local_vars: opfunc(left(local_vars), right(local_vars))
+
+    def _unary(self):
+        if self._accept('-'):
+            operand = self._unary()[0]
+            return (lambda local_vars: -operand(local_vars)), None
+        return self._postfix()
+
+    def _arguments(self):
+        args = []
+        if not self._accept(')'):
+            args.append(self._expression()[0])
+            while self._accept(','):
+                args.append(self._expression()[0])
+            self._expect(')')
+        return args
+
+    def _postfix(self):
+        evaluate, ref = self._primary()
+        while True:
+            if self._accept('.'):
+                base = evaluate
+                if ref is not None and ref[0] == 'name':
+                    base = self._object(ref[1])
+                member = self._expect_name()
+                if self._accept('('):
+                    evaluate = self._method_call(base, member, self._arguments())
+                else:
+                    evaluate = self._member(base, member)
+                ref = None
+            elif self._accept('['):
+                index = self._expression()[0]
+                self._expect(']')
+                evaluate, ref = self._index(evaluate, index), ('index', evaluate, index)
+            elif self._accept('('):
+                if ref is None or ref[0] != 'name':
+                    raise self._error()
+                evaluate, ref = self._function_call(ref[1], self._arguments()), None
+            else:
+                return evaluate, ref
+
+    def _object(self, name):
+        interpreter = self._interpreter
+
+        def get_object(local_vars):
+            if name in local_vars:
+                return local_vars[name]
+            return interpreter._get_object(name)
+        return get_object
+
+    @staticmethod
+    def _method_call(base, member, args):
+        return lambda local_vars: _call_method(
+            base(local_vars), member, tuple(arg(local_vars) for arg in args))
+
+    @staticmethod
+    def _member(base, member):
+        return lambda local_vars: _get_member(base(local_vars), member)
+
+    @staticmethod
+    def _index(base, index):
+        return lambda local_vars: base(local_vars)[index(local_vars)]
+
+    def _function_call(self, name, args):
+        interpreter = self._interpreter
+        return lambda local_vars: interpreter._get_function(name)(
+            tuple(arg(local_vars) for arg in args))
+
+    def _primary(self):
+        kind, value = self._peek()
+        self._pos += 1
+        if kind in ('number', 'string'):
+            return (lambda local_vars: value), None
+        if kind == 'name':
+            if value in _CONSTANTS:
+                constant = _CONSTANTS[value]
+                return (lambda local_vars: constant), None
+            return self._variable(value), ('name', value)
+        if (kind, value) == ('op', '('):
+            evaluate = self._expression()[0]
+            self._expect(')')
+            return evaluate, None
+        if (kind, value) == ('op', '['):
+            elements = []
+            if not self._accept(']'):
+                elements.append(self._expression()[0])
+                while self._accept(','):
+                    elements.append(self._expression()[0])
+                self._expect(']')
+            return (lambda local_vars: [e(local_vars) for e in elements]), None
+        self._pos -= 1
+        raise self._error()
+
+    @staticmethod
+    def _variable(name):
+        def get_variable(local_vars):
+            try:
+                return local_vars[name]
+            except KeyError:
+                raise ExtractorError('Undefined JS variable %r' % name)
+        return get_variable
+
 
 class JSInterpreter(object):
     def __init__(self, code, objects=None):
@@ -33,190 +364,56 @@ class JSInterpreter(object):
         self.code = code
         self._functions = {}
         self._objects = objects
-
-    def interpret_statement(self, stmt, local_vars, allow_recursion=100):
-        if allow_recursion < 0:
-            raise ExtractorError('Recursion limit reached')
-
-        should_abort = False
-        stmt = stmt.lstrip()
-        stmt_m = re.match(r'var\s', stmt)
-        if stmt_m:
-            expr = stmt[len(stmt_m.group(0)):]
-        else:
-            return_m = re.match(r'return(?:\s+|$)', stmt)
-            if return_m:
-                expr = stmt[len(return_m.group(0)):]
-                should_abort = True
+        # The definitions extracted from the code, by name
+        self._function_code = {}
+        self._object_code = {}
+        self._index_symbols()
+
+    def _index_symbols(self):
+        """Find where the functions and objects of the code are defined
+
+        The code is scanned once. _function_positions and _object_positions
+        map each name to the positions of its definitions, in order: where
+        the arguments of the function or the object literal start.
+        """
+        self._function_positions = {}
+        self._object_positions = {}
+        for m in _SYMBOL_RE.finditer(self.code):
+            name = m.group('function')
+            if name is None:
+                # Looking back is faster than trying every name in the scan
+                var_m = _VARIABLE_RE.search(self.code, max(m.start() - 128, 0), m.start())
+                if var_m is None:
+                    continue
+                name = var_m.group(1)
+            if m.group('function') or m.group('function_value'):
+                self._function_positions.setdefault(name, []).append(m.end())
             else:
-                # Try interpreting it as an expression
-                expr = stmt
+                self._object_positions.setdefault(name, []).append(m.end() - 1)
 
-        v = self.interpret_expression(expr, local_vars, allow_recursion)
-        return v, should_abort
+    def _get_object(self, objname):
+        if objname not in self._objects:
+            self._objects[objname] = self.extract_object(objname)
+        return self._objects[objname]
 
-    def interpret_expression(self, expr, local_vars, allow_recursion):
-        expr = expr.strip()
+    def _get_function(self, funcname):
+        if funcname not in self._functions:
+            self._functions[funcname] = self.extract_function(funcname)
+        return self._functions[funcname]
 
-        if expr == '':  # Empty expression
-            return None
-
-        if expr.startswith('('):
-            parens_count = 0
-            for m in re.finditer(r'[()]', expr):
-                if m.group(0) == '(':
-                    parens_count += 1
-                else:
-                    parens_count -= 1
-                    if parens_count == 0:
-                        sub_expr = expr[1:m.start()]
-                        sub_result = self.interpret_expression(
-                            sub_expr, local_vars, allow_recursion)
-                        remaining_expr = expr[m.end():].strip()
-                        if not remaining_expr:
-                            return sub_result
-                        else:
-                            expr = json.dumps(sub_result) + remaining_expr
-                        break
-            else:
-                raise ExtractorError('Premature end of parens in %r' % expr)
-
-        for op, opfunc in _ASSIGN_OPERATORS:
-            m = re.match(r'''(?x)
-                (?P<out>%s)(?:\[(?P<index>[^\]]+?)\])?
-                \s*%s
-                (?P<expr>.*)$''' % (_NAME_RE, re.escape(op)), expr)
-            if not m:
-                continue
-            right_val = self.interpret_expression(
-                m.group('expr'), local_vars, allow_recursion - 1)
-
-            if m.groupdict().get('index'):
-                lvar = local_vars[m.group('out')]
-                idx = self.interpret_expression(
-                    m.group('index'), local_vars, allow_recursion)
-                assert isinstance(idx, int)
-                cur = lvar[idx]
-                val = opfunc(cur, right_val)
-                lvar[idx] = val
-                return val
-            else:
-                cur = local_vars.get(m.group('out'))
-                val = opfunc(cur, right_val)
-                local_vars[m.group('out')] = val
-                return val
-
-        if expr.isdigit():
-            return int(expr)
-
-        var_m = re.match(
-            r'(?!if|return|true|false)(?P<name>%s)$' % _NAME_RE,
-            expr)
-        if var_m:
-            return local_vars[var_m.group('name')]
-
-        try:
-            return json.loads(expr)
-        except ValueError:
-            pass
-
-        m = re.match(
-            r'(?P<var>%s)\.(?P<member>[^(]+)(?:\(+(?P<args>[^()]*)\))?$' % _NAME_RE,
-            expr)
-        if m:
-            variable = m.group('var')
-            member = m.group('member')
-            arg_str = m.group('args')
-
-            if variable in local_vars:
-                obj = local_vars[variable]
-            else:
-                if variable not in self._objects:
-                    self._objects[variable] = self.extract_object(variable)
-                obj = self._objects[variable]
-
-            if arg_str is None:
-                # Member access
-                if member == 'length':
-                    return len(obj)
-                return obj[member]
-
-            assert expr.endswith(')')
-            # Function call
-            if arg_str == '':
-                argvals = tuple()
-            else:
-                argvals = tuple([
-                    self.interpret_expression(v, local_vars, allow_recursion)
-                    for v in arg_str.split(',')])
-
-            if member == 'split':
-                assert argvals == ('',)
-                return list(obj)
-            if member == 'join':
-                assert len(argvals) == 1
-                return argvals[0].join(obj)
-            if member == 'reverse':
-                assert len(argvals) == 0
-                obj.reverse()
-                return obj
-            if member == 'slice':
-                assert len(argvals) == 1
-                return obj[argvals[0]:]
-            if member == 'splice':
-                assert isinstance(obj, list)
-                index, howMany = argvals
-                res = []
-                for i in range(index, min(index + howMany, len(obj))):
-                    res.append(obj.pop(index))
-                return res
-
-            return obj[member](argvals)
-
-        m = re.match(
-            r'(?P<in>%s)\[(?P<idx>.+)\]$' % _NAME_RE, expr)
-        if m:
-            val = local_vars[m.group('in')]
-            idx = self.interpret_expression(
-                m.group('idx'), local_vars, allow_recursion - 1)
-            return val[idx]
-
-        for op, opfunc in _OPERATORS:
-            m = re.match(r'(?P<x>.+?)%s(?P<y>.+)' % re.escape(op), expr)
-            if not m:
-                continue
-            x, abort = self.interpret_statement(
-                m.group('x'), local_vars, allow_recursion - 1)
-            if abort:
-                raise ExtractorError(
-                    'Premature left-side return of %s in %r' % (op, expr))
-            y, abort = self.interpret_statement(
-                m.group('y'), local_vars, allow_recursion - 1)
-            if abort:
-                raise ExtractorError(
-                    'Premature right-side return of %s in %r' % (op, expr))
-            return opfunc(x, y)
-
-        m = re.match(
-            r'^(?P<func>%s)\((?P<args>[a-zA-Z0-9_$,]+)\)$' % _NAME_RE, expr)
-        if m:
-            fname = m.group('func')
-            argvals = tuple([
-                int(v) if v.isdigit() else local_vars[v]
-                for v in m.group('args').split(',')])
-            if fname not in self._functions:
-                self._functions[fname] = self.extract_function(fname)
-            return self._functions[fname](argvals)
-
-        raise ExtractorError('Unsupported JS expression %r' % expr)
+    def _match_definition(self, regex, positions):
+        for pos in positions:
+            m = regex.match(self.code, pos)
+            if m:
+                return m
 
     def extract_object(self, objname):
         obj = {}
-        obj_m = re.search(
-            (r'(?:var\s+)?%s\s*=\s*\{' % re.escape(objname)) +
-            r'\s*(?P<fields>([a-zA-Z$0-9]+\s*:\s*function\(.*?\)\s*\{.*?\}(?:,\s*)?)*)' +
-            r'\}\s*;',
-            self.code)
+        obj_m = self._match_definition(
+            _OBJECT_RE, self._object_positions.get(objname, []))
+        if obj_m is None:
+            raise ExtractorError('Could not find JS object %r' % objname)
+        self._object_code[objname] = 'var %s=%s' % (objname, obj_m.group(0))
         fields = obj_m.group('fields')
         # Currently, it only supports function definitions
         fields_m = re.finditer(
@@ -230,29 +427,40 @@ class JSInterpreter(object):
         return obj
 
     def extract_function(self, funcname):
-        func_m = re.search(
-            r'''(?x)
-                (?:function\s+%s|[{;,]\s*%s\s*=\s*function|var\s+%s\s*=\s*function)\s*
-                \((?P<args>[^)]*)\)\s*
-                \{(?P<code>[^}]+)\}''' % (
-                re.escape(funcname), re.escape(funcname), re.escape(funcname)),
-            self.code)
+        func_m = self._match_definition(
+            _FUNCTION_RE, self._function_positions.get(funcname, []))
         if func_m is None:
             raise ExtractorError('Could not find JS function %r' % funcname)
-        argnames = func_m.group('args').split(',')
+        self._function_code[funcname] = 'function %s(%s){%s}' % (
+            funcname, func_m.group('args'), func_m.group('code'))
+        argnames = [arg.strip() for arg in func_m.group('args').split(',')]
 
         return self.build_function(argnames, func_m.group('code'))
 
+    def extracted_code(self):
+        """Return the code of the functions and objects extracted so far
+
+        A JSInterpreter of this code can run the functions already called
+        without the rest of the original code.
+        """
+        return '\n'.join(
+            code for _, code in sorted(
+                list(self._object_code.items()) + list(self._function_code.items())))
+
     def call_function(self, funcname, *args):
-        f = self.extract_function(funcname)
-        return f(args)
+        return self._get_function(funcname)(args)
 
     def build_function(self, argnames, code):
+        """Compile code, the body of a JS function, to a Python function
+
+        The returned function takes the tuple of the arguments.
+        """
+        statements = _JSCompiler(self, code).compile_statements()
+
         def resf(args):
             local_vars = dict(zip(argnames, args))
-            for stmt in code.split(';'):
-                res, abort = self.interpret_statement(stmt, local_vars)
-                if abort:
-                    break
-            return res
+            for stmt, is_return in statements:
+                res = stmt(local_vars)
+                if is_return:
+                    return res
         return resf
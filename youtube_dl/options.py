@@ -172,6 +172,11 @@ def parseOpts(overrideArguments=None):
         action='store_const', dest='extract_flat', const='in_playlist',
         default=False,
         help='Do not extract the videos of a playlist, only list them.')
+    general.add_option(
+        '--concurrent-extractions',
+        dest='concurrent_extractions', metavar='N', default=1, type=int,
+        help='Number of the given URLs or of the videos of a playlist to extract the information of in parallel (default is %default). '
+             'The videos are still downloaded one after the other, in order')
     general.add_option(
         '--mark-watched',
         action='store_true', dest='mark_watched', default=False,
@@ -313,6 +318,13 @@ def parseOpts(overrideArguments=None):
         '--download-archive', metavar='FILE',
         dest='download_archive',
         help='Download only videos not listed in the archive file. Record the IDs of all downloaded videos in it.')
+    selection.add_option(
+        '--download-archive-format', metavar='FORMAT',
+        dest='download_archive_format', default='text',
+        help='Format of the archive file: "text" (one video per line, default) or "sqlite" (an SQLite database, '
+             'faster with large archives). The sqlite format records videos in batches of up to 100, '
+             'written at most 5 seconds after the first of them was downloaded. Until then they are '
+             'not seen by other processes and are lost if youtube-dl crashes')
     selection.add_option(
         '--include-ads',
         dest='include_ads', action='store_true',
@@ -404,7 +416,11 @@ def parseOpts(overrideArguments=None):
     downloader.add_option(
         '-r', '--limit-rate', '--rate-limit',
         dest='ratelimit', metavar='RATE',
-        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M)')
+        help='Maximum download rate in bytes per second (e.g. 50K or 4.2M), shared by all the downloads. Not applied to ffmpeg, avconv and httpie')
+    downloader.add_option(
+        '--limit-host-rate',
+        dest='host_ratelimits', metavar='HOST=RATE', action='append', default=[],
+        help='Maximum download rate from HOST and its subdomains (e.g. example.com=1M), can be used multiple times')
     downloader.add_option(
         '-R', '--retries',
         dest='retries', metavar='RETRIES', default=10,
@@ -413,6 +429,14 @@ def parseOpts(overrideArguments=None):
         '--fragment-retries',
         dest='fragment_retries', metavar='RETRIES', default=10,
         help='Number of retries for a fragment (default is %default), or "infinite" (DASH only)')
+    downloader.add_option(
+        '--concurrent-fragments',
+        dest='concurrent_fragment_downloads', metavar='N', default=1, type=int,
+        help='Number of fragments of a DASH, hlsnative or f4m video to download concurrently (default is %default)')
+    downloader.add_option(
+        '--http-connections',
+        dest='http_connections', metavar='N', default=1, type=int,
+        help='Number of connections to download a file over HTTP with, if the server supports range requests (default is %default)')
     downloader.add_option(
         '--buffer-size',
         dest='buffersize', metavar='SIZE', default='1024',
@@ -429,6 +453,18 @@ def parseOpts(overrideArguments=None):
         '--playlist-reverse',
         action='store_true',
         help='Download playlist videos in reverse order')
+    downloader.add_option(
+        '--lazy-playlist',
+        action='store_true', dest='lazy_playlist', default=False,
+        help='Process the videos of a playlist as they are received, without waiting for the whole list. '
+             'The number of videos is unknown then, so %(playlist_index)s is not padded with zeros. Has no effect with --playlist-reverse '
+             'or with --playlist-items not in increasing order')
+    downloader.add_option(
+        '--concurrent-pages',
+        dest='concurrent_pages', metavar='N', default=1, type=int,
+        help='Number of pages of a playlist listed page by page to fetch at a time, '
+             'in the background while the videos are processed (default is %default). '
+             'The messages of the extractor about these pages may then be interleaved with the other ones')
     downloader.add_option(
         '--xattr-set-filesize',
         dest='xattr_set_filesize', action='store_true',
@@ -562,6 +598,10 @@ def parseOpts(overrideArguments=None):
         '--no-progress',
         action='store_true', dest='noprogress', default=False,
         help='Do not print progress bar')
+    verbosity.add_option(
+        '--progress-rate',
+        dest='progress_rate', metavar='N', default=10, type=float,
+        help='Maximum number of progress updates per second, 0 for no limit (default is %default)')
     verbosity.add_option(
         '--console-title',
         action='store_true', dest='consoletitle', default=False,
@@ -688,6 +728,20 @@ def parseOpts(overrideArguments=None):
     filesystem.add_option(
         '--no-cache-dir', action='store_const', const=False, dest='cachedir',
         help='Disable filesystem caching')
+    filesystem.add_option(
+        '--http-cache',
+        action='store_true', dest='http_cache', default=False,
+        help='Cache the web pages and API responses downloaded by the extractors in the cache directory, '
+             'following their Cache-Control, Expires, ETag and Last-Modified headers (experimental)')
+    filesystem.add_option(
+        '--http-cache-ttl',
+        dest='http_cache_ttl', metavar='[EXTRACTOR:]SECONDS', action='append', default=[],
+        help='Use cached responses for SECONDS regardless of their headers, '
+             'for all extractors or only EXTRACTOR (0 disables the cache). Can be used multiple times')
+    filesystem.add_option(
+        '--http-cache-max-size',
+        dest='http_cache_max_size', metavar='SIZE', default=None,
+        help='Maximum size of the HTTP cache (e.g. 50M), the least recently used responses are evicted (default is 100M)')
     filesystem.add_option(
         '--rm-cache-dir',
         action='store_true', dest='rm_cachedir',
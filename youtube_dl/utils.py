@@ -13,7 +13,6 @@ import datetime
 import email.utils
 import errno
 import functools
-import gzip
 import io
 import itertools
 import json
@@ -24,11 +23,14 @@ import os
 import pipes
 import platform
 import re
+import select
 import socket
 import ssl
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
 import xml.etree.ElementTree
 import zlib
@@ -800,9 +802,494 @@ def handle_youtubedl_headers(headers):
         filtered_headers = dict((k, v) for k, v in filtered_headers.items() if k.lower() != 'accept-encoding')
         del filtered_headers['Youtubedl-no-compression']
 
+    if 'Youtubedl-no-cache' in filtered_headers:
+        filtered_headers = dict(filtered_headers)
+        del filtered_headers['Youtubedl-no-cache']
+
     return filtered_headers
 
 
+class _TokenBucket(object):
+    # Part of the rate that is never reserved, so that the transfers
+    # consuming from the bucket are not stalled by reservations
+    _UNRESERVED_SHARE = 1 / 16.0
+
+    def __init__(self, rate):
+        self.rate = rate
+        # Part of the rate reserved for external downloaders
+        self.reserved = 0
+        self.reservations = 0
+        self.tokens = 0
+        self.last_update = time.time()
+        self.last_consumption = 0
+
+    def _refill(self, now):
+        free_rate = self.rate - self.reserved
+        # At most a tenth of a second worth of data may be received at once
+        self.tokens = min(
+            self.tokens + (now - self.last_update) * free_rate, free_rate / 10.0)
+        self.last_update = now
+
+    def take(self, byte_count, now):
+        """Take byte_count tokens, return how long to wait for them"""
+        self._refill(now)
+        self.tokens -= byte_count
+        self.last_consumption = now
+        return max(-self.tokens / (self.rate - self.reserved), 0)
+
+    def available_rate(self, now):
+        """Rate a new reservation gets"""
+        free_rate = self.rate * (1 - self._UNRESERVED_SHARE) - self.reserved
+        if self.reservations or now - self.last_consumption < 1:
+            # Leave half of it to the other transfers
+            free_rate /= 2
+        if free_rate < self.rate * self._UNRESERVED_SHARE:
+            # Too little is left, share what is not reserved yet
+            free_rate = (self.rate - self.reserved) / 4
+        return free_rate
+
+    def reserve(self, rate, now):
+        self._refill(now)
+        self.reserved += rate
+        self.reservations += 1
+
+    def release(self, rate, now):
+        self._refill(now)
+        self.reserved -= rate
+        self.reservations -= 1
+
+
+class RateLimiter(object):
+    """Token bucket limiting the download rate of all the transfers using it
+
+    rate is the overall limit in bytes per second, host_rates maps host names
+    to limits of their own, that also apply to their subdomains. Transfers
+    call consume with the number of bytes they received and sleep until the
+    rate allows it, the time to sleep grows with the debt of the bucket so
+    that concurrent transfers are paced smoothly instead of in bursts.
+
+    Processes outside our control (external downloaders) reserve a part of
+    the rate instead, which is removed from the bucket until they release
+    it: all of it (but a 16th kept for the other transfers) when nothing else
+    is downloading, half of what is left otherwise. When less than a 16th is
+    left, a quarter of the rate that is not reserved is, so that the
+    reservations never add up to the whole rate and never have to wait.
+    """
+
+    def __init__(self, rate=None, host_rates=None):
+        self._lock = threading.Lock()
+        self._bucket = _TokenBucket(rate) if rate else None
+        self._host_buckets = dict(
+            (host.lower(), _TokenBucket(host_rate))
+            for host, host_rate in (host_rates or {}).items())
+
+    @staticmethod
+    def host_of(url):
+        return compat_urllib_parse_urlparse(url).hostname
+
+    def _buckets(self, host):
+        buckets = []
+        if self._bucket:
+            buckets.append(self._bucket)
+        if host:
+            host = host.lower()
+            for bucket_host, bucket in self._host_buckets.items():
+                if host == bucket_host or host.endswith('.' + bucket_host):
+                    buckets.append(bucket)
+        return buckets
+
+    def consume(self, byte_count, host=None):
+        with self._lock:
+            now = time.time()
+            wait = max([0] + [
+                bucket.take(byte_count, now) for bucket in self._buckets(host)])
+        if wait > 0:
+            time.sleep(wait)
+
+    def is_limited(self, host=None):
+        """Whether the transfers from host are limited"""
+        return bool(self._buckets(host))
+
+    def reserve(self, host=None):
+        """Reserve a rate for a transfer, None if it is not limited"""
+        with self._lock:
+            buckets = self._buckets(host)
+            if not buckets:
+                return None
+            now = time.time()
+            rate = min(bucket.available_rate(now) for bucket in buckets)
+            for bucket in buckets:
+                bucket.reserve(rate, now)
+        return rate
+
+    def release(self, rate, host=None):
+        if rate is None:
+            return
+        with self._lock:
+            now = time.time()
+            for bucket in self._buckets(host):
+                bucket.release(rate, now)
+
+
+def parallel_map(func, iterable, concurrency, window=None, discard=None):
+    """Apply func to the items of iterable in a pool of worker threads
+
+    Yields (result, err) pairs in the order of iterable, err being the
+    exception raised by func if any. At most window items (twice the
+    concurrency by default) are processed ahead of the consumer, so that
+    results are not piling up in memory and iterable is consumed lazily.
+    Closing the generator stops the workers once they finished their item,
+    discard is then called with each result that was not yielded.
+    """
+    if window is None:
+        window = concurrency * 2
+    items = iter(iterable)
+    cond = threading.Condition()
+    results = {}
+    # Index of the next item to hand out to a worker, index of the next
+    # result to be yielded, number of items (once iterable is exhausted) and
+    # whether the workers must stop
+    pool_state = {'next': 0, 'consumed': 0, 'count': None, 'stop': False}
+
+    # Held while getting the next item, iterable may be a generator
+    items_lock = threading.Lock()
+
+    def worker():
+        while True:
+            with items_lock:
+                with cond:
+                    while (not pool_state['stop'] and pool_state['count'] is None and
+                            pool_state['next'] >= pool_state['consumed'] + window):
+                        cond.wait()
+                    if pool_state['stop'] or pool_state['count'] is not None:
+                        return
+                    i = pool_state['next']
+                try:
+                    item = next(items)
+                except Exception as err:
+                    with cond:
+                        if isinstance(err, StopIteration):
+                            pool_state['count'] = i
+                        else:
+                            # Let the consumer see the error when it is due
+                            pool_state['count'] = i + 1
+                            results[i] = (None, err)
+                        cond.notify_all()
+                    return
+                with cond:
+                    pool_state['next'] += 1
+            try:
+                result = (func(item), None)
+            except Exception as err:
+                result = (None, err)
+            with cond:
+                results[i] = result
+                cond.notify_all()
+
+    workers = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in workers:
+        t.daemon = True
+        t.start()
+
+    try:
+        i = 0
+        while True:
+            with cond:
+                while i not in results and pool_state['count'] != i:
+                    cond.wait()
+                if i not in results:
+                    return
+                result = results.pop(i)
+                pool_state['consumed'] = i + 1
+                cond.notify_all()
+            yield result
+            i += 1
+    finally:
+        with cond:
+            pool_state['stop'] = True
+            cond.notify_all()
+        for t in workers:
+            t.join()
+        if discard is not None:
+            for result, err in results.values():
+                if err is None:
+                    discard(result)
+
+
+class HTTPConnectionPool(object):
+    """Pool of idle keep-alive HTTP connections
+
+    Connections are kept by key, the scheme, host and port of the server or
+    proxy, the host tunnelled to and the SOCKS proxy used. At most maxsize
+    idle connections are kept per key, connections idle for more than
+    idle_timeout seconds are closed.
+    """
+
+    def __init__(self, maxsize=10, idle_timeout=30):
+        self.maxsize = maxsize
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    @staticmethod
+    def _is_dropped(conn):
+        # An idle connection must not be readable, otherwise the server
+        # closed it (or sent garbage)
+        sock = conn.sock
+        if sock is None:
+            return True
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (socket.error, select.error, ValueError):
+            return True
+
+    def get(self, key):
+        """Return an idle connection for key or None"""
+        now = time.time()
+        while True:
+            with self._lock:
+                idle = self._connections.get(key)
+                if not idle:
+                    return None
+                conn, released = idle.pop()
+            if now - released <= self.idle_timeout and not self._is_dropped(conn):
+                return conn
+            conn.close()
+
+    def put(self, key, conn):
+        """Give back a connection whose last response has been fully read"""
+        now = time.time()
+        expired = []
+        with self._lock:
+            idle = self._connections.setdefault(key, [])
+            idle.append((conn, now))
+            while len(idle) > self.maxsize:
+                expired.append(idle.pop(0)[0])
+            for k, connections in list(self._connections.items()):
+                while connections and now - connections[0][1] > self.idle_timeout:
+                    expired.append(connections.pop(0)[0])
+                if not connections:
+                    del self._connections[k]
+        for c in expired:
+            c.close()
+
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = {}
+        for idle in connections.values():
+            for conn, _ in idle:
+                conn.close()
+
+
+class _PooledHTTPResponse(compat_http_client.HTTPResponse):
+    """HTTP response that gives its connection back to the pool once read"""
+
+    _ytdl_release = None
+    _ytdl_reading_chunks = False
+
+    def _ytdl_release_conn(self, reusable):
+        release, self._ytdl_release = self._ytdl_release, None
+        if release is not None:
+            release(reusable and not self.will_close)
+
+    def _close_conn(self):
+        # Python 3 calls this once the whole body has been read
+        compat_http_client.HTTPResponse._close_conn(self)
+        self._ytdl_release_conn(True)
+
+    def _read_chunked(self, *args, **kwargs):
+        # Python 2 closes the response once the last chunk has been read,
+        # the connection is reusable if that happened without an error
+        self._ytdl_reading_chunks = True
+        try:
+            data = compat_http_client.HTTPResponse._read_chunked(self, *args, **kwargs)
+        except Exception:
+            self._ytdl_release_conn(False)
+            raise
+        finally:
+            self._ytdl_reading_chunks = False
+        if self.fp is None:
+            self._ytdl_release_conn(True)
+        return data
+
+    def close(self):
+        # Unless nothing is left to read, closing a response before its end
+        # leaves unread data on the connection, it can't be reused then.
+        # Python 2 also calls this once the whole body has been read.
+        reusable = self.fp is None or self.length == 0
+        compat_http_client.HTTPResponse.close(self)
+        if not self._ytdl_reading_chunks:
+            self._ytdl_release_conn(reusable)
+
+
+class _DecompressingReader(io.RawIOBase):
+    """File-like object decompressing a gzip or deflate response on the fly
+
+    At most _CHUNK_SIZE bytes of compressed and decompressed data are held in
+    memory at once. Decompression stops at the end of the compressed stream,
+    further gzip members are decompressed as well, anything else is junk
+    that is ignored.
+    """
+
+    _CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, fp, encoding):
+        self._fp = fp
+        self._encoding = encoding
+        # Deflate is supposed to be zlib wrapped but is often sent raw
+        self._decompressor = zlib.decompressobj(
+            16 + zlib.MAX_WBITS if encoding == 'gzip' else -zlib.MAX_WBITS)
+        self._input = b''
+        self._output = b''
+        self._started = False
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def _decompress(self):
+        if not self._input:
+            self._input = self._fp.read(self._CHUNK_SIZE)
+            if not self._input:
+                self._eof = True
+                return self._decompressor.flush()
+        data, self._input = self._input, b''
+        try:
+            output = self._decompressor.decompress(data, self._CHUNK_SIZE)
+        except zlib.error as err:
+            if self._encoding != 'deflate' or self._started:
+                raise IOError('unable to decompress %s response: %s' % (self._encoding, err))
+            self._started = True
+            self._decompressor = zlib.decompressobj()
+            output = self._decompressor.decompress(data, self._CHUNK_SIZE)
+        self._started = True
+        self._input = self._decompressor.unconsumed_tail
+        rest = self._decompressor.unused_data
+        # The magic number of the next gzip member may be split between
+        # two reads
+        while self._encoding == 'gzip' and rest == b'\x1f':
+            more = self._fp.read(self._CHUNK_SIZE)
+            if not more:
+                break
+            rest += more
+        if rest:
+            # End of the compressed stream
+            if self._encoding == 'gzip' and rest.startswith(b'\x1f\x8b'):
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                self._input = rest
+            else:
+                # There may be junk at the end of the response
+                # See http://stackoverflow.com/q/4928560/35070 for details
+                self._eof = True
+        return output
+
+    def readinto(self, b):
+        while not self._output and not self._eof:
+            self._output = self._decompress()
+        if not self._output:
+            return 0
+        n = min(len(b), len(self._output))
+        b[:n] = self._output[:n]
+        self._output = self._output[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        io.RawIOBase.close(self)
+
+
+def _pooled_do_open(ydl_handler, http_class, req, **http_conn_args):
+    """Like AbstractHTTPHandler.do_open, but reusing keep-alive connections"""
+    if not hasattr(compat_http_client.HTTPConnection, 'set_tunnel'):  # Python 2.6
+        # The SOCKS proxy is already part of http_class, the header must not
+        # be sent
+        if 'Ytdl-socks-proxy' in req.headers:
+            del req.headers['Ytdl-socks-proxy']
+        return ydl_handler.do_open(http_class, req, **http_conn_args)
+
+    pool = ydl_handler._connection_pool
+    host = req.get_host() if hasattr(req, 'get_host') else req.host
+    if not host:
+        raise compat_urllib_error.URLError('no host given')
+
+    headers = dict(req.unredirected_hdrs)
+    headers.update(dict(
+        (k, v) for k, v in req.headers.items() if k not in headers))
+    socks_proxy = headers.pop('Ytdl-socks-proxy', None)
+    headers = dict((name.title(), val) for name, val in headers.items())
+    tunnel_headers = {}
+    if req._tunnel_host and 'Proxy-Authorization' in headers:
+        tunnel_headers['Proxy-Authorization'] = headers.pop('Proxy-Authorization')
+    request_kwargs = {}
+    if sys.version_info >= (3, 6):
+        request_kwargs['encode_chunked'] = req.has_header('Transfer-encoding')
+
+    key = (req.get_type() if hasattr(req, 'get_type') else req.type,
+           host, req._tunnel_host, socks_proxy)
+
+    while True:
+        h = pool.get(key)
+        reused = h is not None
+        if not reused:
+            h = http_class(host, timeout=req.timeout, **http_conn_args)
+            h.set_debuglevel(ydl_handler._debuglevel)
+            h.response_class = _PooledHTTPResponse
+            if req._tunnel_host:
+                h.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+        else:
+            h.timeout = req.timeout
+            if type(req.timeout) in (int, float):
+                h.sock.settimeout(req.timeout)
+        try:
+            h.request(req.get_method(), req.get_selector() if hasattr(req, 'get_selector') else req.selector,
+                      req.data, headers, **request_kwargs)
+        except socket.error as err:
+            h.close()
+            if reused and not isinstance(err, socket.timeout):
+                # The server closed the idle connection in the meantime
+                continue
+            raise compat_urllib_error.URLError(err)
+        except Exception:
+            h.close()
+            raise
+        try:
+            r = h.getresponse()
+        except (socket.error, compat_http_client.BadStatusLine) as err:
+            h.close()
+            if reused and not isinstance(err, socket.timeout):
+                continue
+            if sys.version_info < (3, 0) and isinstance(err, socket.error):
+                raise compat_urllib_error.URLError(err)
+            raise
+        except Exception:
+            h.close()
+            raise
+        break
+
+    def release(reusable):
+        if reusable and h.sock is not None:
+            pool.put(key, h)
+        else:
+            h.close()
+    r._ytdl_release = release
+    if r.isclosed():
+        # Nothing to read, e.g. the response to a HEAD request
+        r._ytdl_release_conn(True)
+
+    if sys.version_info < (3, 0):
+        r.recv = r.read
+        fp = socket._fileobject(r, close=True)
+        resp = compat_urllib_request.addinfourl(fp, r.msg, req.get_full_url())
+        resp.code = r.status
+        resp.msg = r.reason
+        return resp
+    r.url = req.get_full_url()
+    r.msg = r.reason
+    return r
+
+
 class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     """Handler for HTTP requests and responses.
 
@@ -824,6 +1311,7 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
     def __init__(self, params, *args, **kwargs):
         compat_urllib_request.HTTPHandler.__init__(self, *args, **kwargs)
         self._params = params
+        self._connection_pool = HTTPConnectionPool()
 
     def http_open(self, req):
         conn_class = compat_http_client.HTTPConnection
@@ -831,9 +1319,8 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
         socks_proxy = req.headers.get('Ytdl-socks-proxy')
         if socks_proxy:
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
-            del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
+        return _pooled_do_open(self, functools.partial(
             _create_http_connection, self, conn_class, False),
             req)
 
@@ -885,33 +1372,13 @@ class YoutubeDLHandler(compat_urllib_request.HTTPHandler):
 
     def http_response(self, req, resp):
         old_resp = resp
-        # gzip
-        if resp.headers.get('Content-encoding', '') == 'gzip':
-            content = resp.read()
-            gz = gzip.GzipFile(fileobj=io.BytesIO(content), mode='rb')
-            try:
-                uncompressed = io.BytesIO(gz.read())
-            except IOError as original_ioerror:
-                # There may be junk add the end of the file
-                # See http://stackoverflow.com/q/4928560/35070 for details
-                for i in range(1, 1024):
-                    try:
-                        gz = gzip.GzipFile(fileobj=io.BytesIO(content[:-i]), mode='rb')
-                        uncompressed = io.BytesIO(gz.read())
-                    except IOError:
-                        continue
-                    break
-                else:
-                    raise original_ioerror
+        # gzip and deflate
+        content_encoding = resp.headers.get('Content-encoding', '')
+        if content_encoding in ('gzip', 'deflate'):
+            uncompressed = io.BufferedReader(_DecompressingReader(resp, content_encoding))
             resp = self.addinfourl_wrapper(uncompressed, old_resp.headers, old_resp.url, old_resp.code)
             resp.msg = old_resp.msg
             del resp.headers['Content-encoding']
-        # deflate
-        if resp.headers.get('Content-encoding', '') == 'deflate':
-            gz = io.BytesIO(self.deflate(resp.read()))
-            resp = self.addinfourl_wrapper(gz, old_resp.headers, old_resp.url, old_resp.code)
-            resp.msg = old_resp.msg
-            del resp.headers['Content-encoding']
         # Percent-encode redirect URL of Location HTTP header to satisfy RFC 3986 (see
         # https://github.com/rg3/youtube-dl/issues/6457).
         if 300 <= resp.code < 400:
@@ -982,6 +1449,7 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
         compat_urllib_request.HTTPSHandler.__init__(self, *args, **kwargs)
         self._https_conn_class = https_conn_class or compat_http_client.HTTPSConnection
         self._params = params
+        self._connection_pool = HTTPConnectionPool()
 
     def https_open(self, req):
         kwargs = {}
@@ -995,9 +1463,8 @@ class YoutubeDLHTTPSHandler(compat_urllib_request.HTTPSHandler):
         socks_proxy = req.headers.get('Ytdl-socks-proxy')
         if socks_proxy:
             conn_class = make_socks_conn_class(conn_class, socks_proxy)
-            del req.headers['Ytdl-socks-proxy']
 
-        return self.do_open(functools.partial(
+        return _pooled_do_open(self, functools.partial(
             _create_http_connection, self, conn_class, True),
             req, **kwargs)
 
@@ -1404,12 +1871,12 @@ else:
 
 class locked_file(object):
     def __init__(self, filename, mode, encoding=None):
-        assert mode in ['r', 'a', 'w']
+        assert mode in ['r', 'rb', 'a', 'w']
         self.f = io.open(filename, mode, encoding=encoding)
         self.mode = mode
 
     def __enter__(self):
-        exclusive = self.mode != 'r'
+        exclusive = self.mode not in ('r', 'rb')
         try:
             _lock_file(self.f, exclusive)
         except IOError:
@@ -1432,6 +1899,9 @@ class locked_file(object):
     def read(self, *args):
         return self.f.read(*args)
 
+    def seek(self, *args):
+        return self.f.seek(*args)
+
 
 def get_filesystem_encoding():
     encoding = sys.getfilesystemencoding()
@@ -1783,30 +2253,129 @@ class PagedList(object):
         # This is only useful for tests
         return len(self.getslice())
 
+    def getslice(self, start=0, end=None):
+        return list(self.iterslice(start, end))
+
+    def iterslice(self, start=0, end=None):
+        """Yield the entries from start to end, fetching pages as needed"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def getitems(self, indices):
+        return list(self.iteritems(indices))
+
+    def iteritems(self, indices):
+        """Yield the entries at the given indices, in that order
+
+        Every page holding some of them is fetched once, in increasing
+        order, when the first entry needed from it is due. Indices out of
+        the list are skipped.
+        """
+        pagenums = sorted(set(i // self._pagesize for i in indices if i >= 0))
+        pages = self._iterpages(pagenums)
+        fetched = {}
+        last_pagenum = -1
+        try:
+            for i in indices:
+                if i < 0:
+                    continue
+                pagenum, offset = divmod(i, self._pagesize)
+                if pagenum > last_pagenum:
+                    for last_pagenum, page in pages:
+                        fetched[last_pagenum] = page
+                        if last_pagenum >= pagenum:
+                            break
+                    else:
+                        # No more pages
+                        last_pagenum = float('inf')
+                page = fetched.get(pagenum)
+                if page is not None and offset < len(page):
+                    yield page[offset]
+        finally:
+            pages.close()
+
+    def _iterpages(self, pagenums):
+        """Yield (pagenum, page) for pagenums, sorted, that exist"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
+    def set_concurrency(self, concurrency):
+        """Fetch the pages ahead of the consumer, up to concurrency at a time"""
+        raise NotImplementedError('This method must be implemented by subclasses')
+
 
 class OnDemandPagedList(PagedList):
-    def __init__(self, pagefunc, pagesize, use_cache=False):
+    """Paged list whose pages are fetched until one is not full
+
+    With prefetch, the next page is fetched in the background while the
+    entries of the current one are consumed. There is no prefetch after a
+    page that is not full, and if the consumer stops the prefetched page is
+    just dropped. pagefunc then runs in another thread, and whatever it
+    writes to the screen interleaves with the output of the consumer.
+    """
+
+    def __init__(self, pagefunc, pagesize, use_cache=False, prefetch=False):
         self._pagefunc = pagefunc
         self._pagesize = pagesize
         self._use_cache = use_cache
+        self._prefetch = prefetch
         if use_cache:
             self._cache = {}
 
-    def getslice(self, start=0, end=None):
-        res = []
+    def set_concurrency(self, concurrency):
+        # Only the next page is known to be needed
+        self._prefetch = concurrency > 1
+
+    def _get_page(self, pagenum):
+        page_results = None
+        if self._use_cache:
+            page_results = self._cache.get(pagenum)
+        if page_results is None:
+            page_results = list(self._pagefunc(pagenum))
+        if self._use_cache:
+            self._cache[pagenum] = page_results
+        return page_results
+
+    def _prefetch_page(self, pagenum):
+        """Start fetching a page, return a function waiting for it"""
+        result = {}
+
+        def fetch():
+            try:
+                result['page'] = self._get_page(pagenum)
+            except Exception as err:
+                result['error'] = err
+
+        t = threading.Thread(target=fetch)
+        t.daemon = True
+        t.start()
+
+        def wait():
+            t.join()
+            if 'error' in result:
+                raise result['error']
+            return result['page']
+        return wait
+
+    def _iterpages(self, pagenums):
+        for pagenum in pagenums:
+            page = self._get_page(pagenum)
+            yield pagenum, page
+            # Nothing after a page that is not full
+            if len(page) < self._pagesize:
+                break
+
+    def iterslice(self, start=0, end=None):
+        prefetched = None
         for pagenum in itertools.count(start // self._pagesize):
             firstid = pagenum * self._pagesize
             nextfirstid = pagenum * self._pagesize + self._pagesize
             if start >= nextfirstid:
                 continue
 
-            page_results = None
-            if self._use_cache:
-                page_results = self._cache.get(pagenum)
-            if page_results is None:
-                page_results = list(self._pagefunc(pagenum))
-            if self._use_cache:
-                self._cache[pagenum] = page_results
+            if prefetched is not None:
+                page_results = prefetched()
+                prefetched = None
+            else:
+                page_results = self._get_page(pagenum)
 
             startv = (
                 start % self._pagesize
@@ -1820,49 +2389,87 @@ class OnDemandPagedList(PagedList):
 
             if startv != 0 or endv is not None:
                 page_results = page_results[startv:endv]
-            res.extend(page_results)
 
             # A little optimization - if current page is not "full", ie. does
             # not contain page_size videos then we can assume that this page
             # is the last one - there are no more ids on further pages -
             # i.e. no need to query again.
-            if len(page_results) + startv < self._pagesize:
-                break
-
             # If we got the whole page, but the next page is not interesting,
             # break out early as well
-            if end == nextfirstid:
+            last_page = (
+                len(page_results) + startv < self._pagesize or
+                end == nextfirstid)
+
+            if self._prefetch and not last_page:
+                prefetched = self._prefetch_page(pagenum + 1)
+            for entry in page_results:
+                yield entry
+
+            if last_page:
                 break
-        return res
 
 
 class InAdvancePagedList(PagedList):
-    def __init__(self, pagefunc, pagecount, pagesize):
+    """Paged list whose number of pages is known
+
+    With a concurrency above 1, the pages of a slice are fetched by up to
+    that many worker threads, ahead of the consumer, with the same caveats
+    as the prefetch of OnDemandPagedList.
+    """
+
+    def __init__(self, pagefunc, pagecount, pagesize, concurrency=1):
         self._pagefunc = pagefunc
         self._pagecount = pagecount
         self._pagesize = pagesize
+        self._concurrency = concurrency
 
-    def getslice(self, start=0, end=None):
-        res = []
+    def set_concurrency(self, concurrency):
+        self._concurrency = concurrency
+
+    def _fetch_pages(self, pagenums):
+        if self._concurrency > 1 and len(pagenums) > 1:
+            return parallel_map(
+                lambda pagenum: list(self._pagefunc(pagenum)),
+                pagenums, self._concurrency)
+        return ((list(self._pagefunc(pagenum)), None) for pagenum in pagenums)
+
+    def _iterpages(self, pagenums):
+        pagenums = [pagenum for pagenum in pagenums if pagenum < self._pagecount]
+        pages = self._fetch_pages(pagenums)
+        try:
+            for i, (page, err) in enumerate(pages):
+                if err is not None:
+                    raise err
+                yield pagenums[i], page
+        finally:
+            pages.close()
+
+    def iterslice(self, start=0, end=None):
         start_page = start // self._pagesize
         end_page = (
-            self._pagecount if end is None else (end // self._pagesize + 1))
+            self._pagecount if end is None
+            else min(end // self._pagesize + 1, self._pagecount))
         skip_elems = start - start_page * self._pagesize
         only_more = None if end is None else end - start
-        for pagenum in range(start_page, end_page):
-            page = list(self._pagefunc(pagenum))
-            if skip_elems:
-                page = page[skip_elems:]
-                skip_elems = None
-            if only_more is not None:
-                if len(page) < only_more:
-                    only_more -= len(page)
-                else:
-                    page = page[:only_more]
-                    res.extend(page)
-                    break
-            res.extend(page)
-        return res
+        pages = self._fetch_pages(range(start_page, end_page))
+        try:
+            for page, err in pages:
+                if err is not None:
+                    raise err
+                if skip_elems:
+                    page = page[skip_elems:]
+                    skip_elems = None
+                if only_more is not None:
+                    if len(page) < only_more:
+                        only_more -= len(page)
+                    else:
+                        for entry in page[:only_more]:
+                            yield entry
+                        break
+                for entry in page:
+                    yield entry
+        finally:
+            pages.close()
 
 
 def uppercase_escape(s):